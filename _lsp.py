@@ -1,16 +1,30 @@
 import sublime
 import sublime_plugin
-import json
 import os
 import threading
 import re
 import time
+import heapq
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-  from . import _lsp_players
-  _has_player_completions = True
-except ImportError:
-  _has_player_completions = False
+from ._lsp_bundle import bundle_path_for, write_bundle
+from ._lsp_cache import LRUCache
+from ._lsp_index import CompletionSession, SymbolIndex, SymbolTable, annotation_for, fold
+from ._lsp_diagnostics import DiagnosticsCache, ERROR
+from ._lsp_document import DocumentParse, FUNC_PATTERN, ParseJob
+from ._lsp_layers import DefinitionLayer, LayerWatcher, check_layers, resolve_layer_path
+from ._lsp_references import extract_references, is_reference_name, offsets_for, rename_in_text
+from ._lsp_rpc import LanguageClient, RpcError, path_to_uri, uri_to_path
+from ._lsp_semantic import TokenCache
+from ._lsp_signature import find_call_context
+from ._lsp_stats import RateCounter, StatsRecorder, format_report
+from ._lsp_syntax import tokenize, STYLE_FOR_SCOPE
+from ._lsp_update import load_meta, update_definitions, write_atomic
+from ._lsp_workspace import WorkspaceIndex, cache_key_for, is_script
+
+from . import _lsp_players
 
 _popup_dimensions_cache = (600, 400, 600, 400)
 _popup_dimensions_last_load = 0
@@ -54,10 +68,15 @@ def get_package_name():
     pass
   return "SublimeRC"
 
+_stats = StatsRecorder()
+timed = _stats.timed
+
 class PopupStyler(object):
   _cache = {}
   _last_gc = 0
-  __slots__ = ('view', 'color_scheme', 'font_size', 'ui_scale', 'font_scale', 'styles')
+  _hits = 0
+  _misses = 0
+  __slots__ = ('view', 'color_scheme', 'font_size', 'ui_scale', 'font_scale', 'styles', 'key')
 
   def __init__(self, view):
     self.view = view
@@ -66,13 +85,16 @@ class PopupStyler(object):
     settings = sublime.load_settings("SublimeRC.sublime-settings")
     self.ui_scale = settings.get("popup_ui_scale", 1.0) if settings else 1.0
     self.font_scale = settings.get("popup_font_scale", 0.92) if settings else 0.92
+    self.key = (self.color_scheme, self.font_size, self.ui_scale, self.font_scale)
     if len(self._cache) > 10 and time.time() - self._last_gc > 60:
       self._cache.clear()
       PopupStyler._last_gc = time.time()
     cache_key = (self.color_scheme, self.ui_scale, self.font_scale)
     if cache_key in self._cache:
+      PopupStyler._hits += 1
       self.styles = self._cache[cache_key]
       return
+    PopupStyler._misses += 1
     styles = view.style()
     base_fg = styles.get("foreground", "#d4d4d4")
     base_bg = styles.get("background", "#1e1e1e")
@@ -130,91 +152,496 @@ class PopupStyler(object):
   def c(self, key):
     return self.styles.get(key, "#d4d4d4")
 
-_highlight_cache = {}
+SEMANTIC_SCOPES = OrderedDict([
+  ('USER', 'region.orangish'),
+  ('GLOBAL', 'region.bluish'),
+  ('CLIENTSIDE', 'region.cyanish'),
+  ('SERVERSIDE', 'region.greenish'),
+])
+SEMANTIC_POLL_MS = 250
+LINE_WINDOW = 1024
+
+_highlight_cache = LRUCache(1024 * 1024)
+_popup_cache = LRUCache(4 * 1024 * 1024)
+_popup_usage = {}
+_escape_table = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
 
 def syntax_highlight_gscript(code, view=None):
   if not code or not view:
-    return code.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-  cache_key = (code[:128], view.settings().get("color_scheme", ""))
+    return code.translate(_escape_table)
+  cache_key = (code, view.settings().get("color_scheme", ""))
   cached = _highlight_cache.get(cache_key)
   if cached is not None:
     return cached
-  window = sublime.active_window()
-  if not window:
-    return code.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-  temp_view = None
+  styles = PopupStyler(view).styles
+  result = []
+  append = result.append
+  pos = 0
+  for start, end, scope in tokenize(code):
+    if start > pos:
+      append(code[pos:start].translate(_escape_table))
+    text = code[start:end].translate(_escape_table)
+    style = STYLE_FOR_SCOPE[scope]
+    if style:
+      append('<span style="color:{0}">{1}</span>'.format(styles[style], text))
+    else:
+      append(text)
+    pos = end
+  if pos < len(code):
+    append(code[pos:].translate(_escape_table))
+  html = ''.join(result)
+  _highlight_cache.put(cache_key, html)
+  return html
+
+def _render_popup(key, info, build):
+  entry = _popup_cache.get(key)
+  if entry is not None and entry[0] is info:
+    return entry[1]
+  html = build()
+  _popup_cache.put(key, (info, html), sys.getsizeof(html))
+  return html
+
+_popup_rate = RateCounter()
+
+def _show_popup(view, html, **kwargs):
+  _popup_rate.hit()
+  view.show_popup(html, **kwargs)
+
+def _update_popup(view, html):
+  _popup_rate.hit()
+  view.update_popup(html)
+
+def _large_file_settings():
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  threshold = settings.get("large_file_threshold_bytes", 1048576)
+  if not isinstance(threshold, int) or threshold <= 0:
+    threshold = 1048576
+  slice_ms = settings.get("parse_slice_ms", 8)
+  if not isinstance(slice_ms, (int, float)) or slice_ms <= 0:
+    slice_ms = 8
+  return threshold, slice_ms / 1000.0
+
+def _apply_popup_cache_settings():
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
   try:
-    temp_view = window.new_file(flags=sublime.TRANSIENT)
-    temp_view.set_scratch(True)
-    temp_view.set_read_only(False)
-    package_name = get_package_name()
-    syntax_path = 'Packages/{}/gscript.sublime-syntax'.format(package_name)
-    temp_view.set_syntax_file(syntax_path)
-    temp_view.run_command('append', {'characters': 'x', 'scroll_to_end': False})
-    temp_view.sel().clear()
-    temp_view.sel().add(sublime.Region(0, 1))
-    start_time = time.time()
-    while time.time() - start_time < 0.1:
-      if 'source.gscript' in temp_view.scope_name(0):
-        break
-      time.sleep(0.005)
-    temp_view.run_command('select_all')
-    temp_view.run_command('right_delete')
-    temp_view.run_command('append', {'characters': code, 'scroll_to_end': False})
-    result = []
-    i = 0
-    n = len(code)
-    append = result.append
-    escape_table = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
-    while i < n:
-      scope = temp_view.scope_name(i)
-      j = i + 1
-      while j < n and j - i < 50:
-        if temp_view.scope_name(j) != scope:
-          break
-        j += 1
-      styler = PopupStyler(view)
-      styles = styler.styles
-      color = None
-      if "comment" in scope:
-        color = styles['comment']
-      elif "string" in scope:
-        color = styles['string']
-      elif "constant.numeric" in scope:
-        color = styles['number']
-      elif "constant" in scope:
-        color = styles['constant']
-      elif "variable.parameter" in scope:
-        color = styles['parameter']
-      elif "variable" in scope:
-        color = styles['variable']
-      elif "keyword" in scope or "storage" in scope:
-        color = styles['keyword']
-      elif "entity.name.function" in scope:
-        color = styles['function']
-      elif "keyword.operator" in scope or "punctuation" in scope:
-        color = styles['operator']
-      text = code[i:j].translate(escape_table)
-      if color:
-        append('<span style="color:{0}">{1}</span>'.format(color, text))
-      else:
-        append(text)
-      i = j
-    html = ''.join(result)
-    if len(_highlight_cache) > 50:
-      first_key = next(iter(_highlight_cache))
-      del _highlight_cache[first_key]
-    _highlight_cache[cache_key] = html
-    return html
-  finally:
-    if temp_view and temp_view.window():
-      window.focus_view(temp_view)
-      window.run_command("close_file")
+    budget = int(settings.get("popup_cache_max_bytes", 4 * 1024 * 1024))
+  except (TypeError, ValueError):
+    budget = 4 * 1024 * 1024
+  _popup_cache.resize(max(0, budget))
+
+_workspaces = {}
+_workspaces_lock = threading.Lock()
+
+def workspace_for_window(window):
+  if window is None:
+    return None
+  folders = tuple(window.folders())
+  if not folders:
+    return None
+  with _workspaces_lock:
+    workspace = _workspaces.get(window.id())
+    if workspace is not None and workspace.folders == folders:
+      return workspace
+    cache_path = os.path.join(sublime.cache_path(), get_package_name(), "workspace-{0}.json".format(cache_key_for(folders)))
+    workspace = WorkspaceIndex(folders, cache_path=cache_path)
+    _workspaces[window.id()] = workspace
+  threading.Thread(target=_scan_workspace, args=(workspace,), daemon=True).start()
+  return workspace
+
+def _scan_workspace(workspace):
+  start = time.time()
+  count = workspace.scan()
+  print("[SublimeRC] Indexed {0} scripts ({1} functions) in {2:.0f} ms, cache {3} hits / {4} misses".format(
+    count, workspace.symbol_count(), (time.time() - start) * 1000, workspace.cache_hits, workspace.cache_misses))
+  _refresh_diagnostics()
+
+_api_layer = None
+_user_layer = None
+_project_layers = {}
+_layers_lock = threading.Lock()
+_layer_watcher = LayerWatcher()
+
+def _log_layers(message):
+  print("[SublimeRC] " + message)
+
+def _upstream_layer(path):
+  global _api_layer
+  with _layers_lock:
+    if _api_layer is None or _api_layer.path != path:
+      _api_layer = DefinitionLayer('upstream', path, bundled=True)
+    return _api_layer
+
+def user_definitions_path():
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  return resolve_layer_path(settings.get("user_definitions_path") or None, sublime.packages_path()) or \
+    os.path.join(sublime.packages_path(), "User", "gscript_definitions.json")
+
+def _project_definitions_path(window):
+  settings = (window.project_data() or {}).get('settings')
+  path = settings.get('gscript_definitions') if isinstance(settings, dict) else None
+  if not path or not isinstance(path, str):
+    return None
+  project_file = window.project_file_name()
+  if project_file:
+    base = os.path.dirname(project_file)
+  else:
+    folders = window.folders()
+    base = folders[0] if folders else None
+  return resolve_layer_path(path, base)
+
+def project_layer_for_window(window):
+  if window is None:
+    return None
+  with _layers_lock:
+    if window.id() in _project_layers:
+      return _project_layers[window.id()]
+  path = _project_definitions_path(window)
+  layer = DefinitionLayer('project', path) if path else None
+  with _layers_lock:
+    _project_layers[window.id()] = layer
+  if layer is not None and not _language_server_wanted():
+    threading.Thread(target=check_layers, args=([layer], _definition_layers_changed, _log_layers), daemon=True).start()
+  return layer
+
+def _forget_project_layer(window, closing=False):
+  with _layers_lock:
+    layer = _project_layers.pop(window.id(), None)
+  if layer is not None:
+    GScriptLspListener.api_version += 1
+    _refresh_diagnostics()
+  _sync_remote_layers(window if closing else None)
+
+def _watched_layers():
+  if _language_server_wanted():
+    return []
+  with _layers_lock:
+    layers = [_user_layer] + list(_project_layers.values())
+    if _api_layer is not None and _api_layer.loaded:
+      layers.append(_api_layer)
+  return layers
+
+def _layer_for_path(path):
+  if not path:
+    return None
+  path = os.path.normcase(os.path.normpath(path))
+  for layer in _watched_layers():
+    if layer is not None and os.path.normcase(layer.path) == path:
+      return layer
+  return None
+
+def _definition_layers_changed(layers):
+  for layer in layers:
+    print("[SublimeRC] Loaded {0} {1} definitions from {2}".format(len(layer), layer.name, layer.path))
+  if _api_layer in layers:
+    GScriptLspListener.install_api_layer(_api_layer)
+  else:
+    GScriptLspListener.api_version += 1
+    _refresh_diagnostics()
+
+def _remote_layers(closing=None):
+  layers = [{'name': 'user', 'path': user_definitions_path()}]
+  for window in sublime.windows():
+    if closing is not None and window.id() == closing.id():
+      continue
+    path = _project_definitions_path(window)
+    if path:
+      layers.append({'name': 'project', 'path': path, 'window': window.id()})
+  return layers
+
+def _sync_remote_layers(closing=None):
+  client = language_client()
+  if client is not None:
+    client.notify('gscript/reloadDefinitions', {'definitionLayers': _remote_layers(closing)})
+
+def _definitions_watch_seconds():
+  interval = sublime.load_settings("SublimeRC.sublime-settings").get("definitions_watch_seconds", 2)
+  if not isinstance(interval, (int, float)) or interval < 0:
+    interval = 2
+  return interval
+
+_layer_config = None
+
+def _apply_definition_layer_settings():
+  global _user_layer, _layer_config
+  path = user_definitions_path()
+  config = (path, _definitions_watch_seconds())
+  if config == _layer_config:
+    return
+  _layer_config = config
+  with _layers_lock:
+    if _user_layer is None or _user_layer.path != path:
+      _user_layer = DefinitionLayer('user', path)
+  _layer_watcher.start(_watched_layers, config[1], _definition_layers_changed, _log_layers)
+  _sync_remote_layers()
+
+_diagnostics_executor = ThreadPoolExecutor(max_workers=1)
+
+def _refresh_diagnostics():
+  for listener in list(GScriptLspListener._instances):
+    listener.schedule_diagnostics()
+
+def _show_diagnostics_panel(window, view, diagnostics):
+  label = view.file_name() or view.name() or "untitled"
+  lines = []
+  for start, end, severity, message in diagnostics:
+    row, col = view.rowcol(start)
+    lines.append("{0}:{1}:{2}: {3}: {4}".format(label, row + 1, col + 1, severity, message))
+  if not lines:
+    lines.append("No problems found in {0}".format(label))
+  panel = window.create_output_panel("rc_diagnostics")
+  panel.settings().set("result_file_regex", r"^(.+?):(\d+):(\d+): ")
+  panel.settings().set("word_wrap", False)
+  panel.run_command("rc_replace_content", {"characters": '\n'.join(lines) + '\n'})
+
+_language_client = None
+_language_client_state = 'off'
+_language_client_lock = threading.Lock()
+_remote_buffers = {}
+_remote_folders = set()
+_remote_infos = {}
+_remote_version = 0
+
+def _language_server_wanted():
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  return bool(settings.get("language_server", False)) and _language_client_state != 'failed'
+
+def language_client():
+  client = _language_client
+  if client is None or _language_client_state != 'ready':
+    return None
+  if not client.is_alive():
+    _language_server_failed("Language server exited")
+    return None
+  return client
+
+def _language_server_failed(reason):
+  global _language_client, _language_client_state
+  print("[SublimeRC] {0}; using in-process analysis".format(reason))
+  _language_client = None
+  _language_client_state = 'failed'
+  _remote_buffers.clear()
+  _remote_folders.clear()
+  GScriptLspListener.load_api_definitions()
+  _resume_local_analysis()
+
+def _resume_local_analysis():
+  with _buffers_lock:
+    states = list(_buffers.values())
+  for state in states:
+    if state.listeners:
+      state.listeners[0].parse_document_functions()
+  for listener in list(GScriptLspListener._instances):
+    workspace_for_window(listener.view.window())
+
+def _workspace_folder(path):
+  return {'uri': path_to_uri(path), 'name': os.path.basename(path)}
+
+def _sync_remote_folders(client, window):
+  added = [folder for folder in (window.folders() if window is not None else []) if folder not in _remote_folders]
+  if added:
+    _remote_folders.update(added)
+    client.notify('workspace/didChangeWorkspaceFolders', {'event': {'added': [_workspace_folder(f) for f in added], 'removed': []}})
+
+def _remote_info(name, info):
+  known = _remote_infos.get(name)
+  if known == info:
+    return known
+  _remote_infos[name] = info
+  return info
+
+def _on_server_notification(method, params):
+  global _remote_version
+  if method == 'gscript/definitionsLoaded':
+    _remote_infos.clear()
+    _remote_version += 1
+    sublime.set_timeout(_refresh_diagnostics, 0)
+    count = (params or {}).get('count', 0)
+    layer = (params or {}).get('layer') or 'API'
+    sublime.set_timeout(lambda: sublime.status_message("Loaded {0} {1} definitions".format(count, layer)), 0)
+
+def _start_language_client():
+  global _language_client, _language_client_state
+  with _language_client_lock:
+    if _language_client_state in ('starting', 'ready'):
+      return
+    _language_client_state = 'starting'
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_lsp_server.py")
+  if not os.path.exists(server_path):
+    _language_server_failed("The language server needs an unpacked package")
+    return
+  command = [settings.get("language_server_python") or "python3", server_path]
+  folders = []
+  for window in sublime.windows():
+    folders.extend(f for f in window.folders() if f not in folders)
+  client = None
+  try:
+    client = LanguageClient(command, on_notification=_on_server_notification, log=lambda line: print("[GScript server] " + line))
+    client.request_sync('initialize', {
+      'processId': os.getpid(),
+      'clientInfo': {'name': 'SublimeRC'},
+      'capabilities': {'general': {'positionEncodings': ['utf-32']}},
+      'workspaceFolders': [_workspace_folder(f) for f in folders],
+      'initializationOptions': {
+        'definitionsPath': GScriptLspListener.api_definitions_path(),
+        'definitionLayers': _remote_layers(),
+        'definitionsWatchSeconds': _definitions_watch_seconds(),
+        'cacheDir': os.path.join(sublime.cache_path(), get_package_name()),
+        'completionMaxResultsShort': settings.get("completion_max_results_short", 50),
+        'completionMaxResultsLong': settings.get("completion_max_results_long", 200),
+      },
+    }, timeout=15)
+    client.notify('initialized', {})
+  except (OSError, RpcError) as e:
+    if client is not None:
+      client.shutdown(0.5)
+    _language_server_failed("Could not start language server: {0}".format(e))
+    return
+  _remote_folders.update(folders)
+  _language_client = client
+  _language_client_state = 'ready'
+  print("[SublimeRC] Language server started: {0}".format(' '.join(command)))
+  for listener in list(GScriptLspListener._instances):
+    listener.open_remote(client)
+    listener.schedule_diagnostics()
+
+def _stop_language_client():
+  global _language_client, _language_client_state
+  client = _language_client
+  _language_client = None
+  _language_client_state = 'off'
+  _remote_buffers.clear()
+  _remote_folders.clear()
+  if client is not None:
+    threading.Thread(target=client.shutdown, daemon=True).start()
+
+def _apply_language_server_settings():
+  enabled = bool(sublime.load_settings("SublimeRC.sublime-settings").get("language_server", False))
+  if enabled and _language_client_state == 'off':
+    sublime.set_timeout_async(_start_language_client, 0)
+  elif not enabled and _language_client_state != 'off':
+    _stop_language_client()
+    GScriptLspListener.load_api_definitions()
+    _resume_local_analysis()
+
+def _completion_item(name, info):
+  params = info.get('params', [])
+  description = info.get('description', '') or ''
+  if name.startswith('$'):
+    insert_text = name
+    kind = sublime.KIND_VARIABLE
+  elif not params:
+    insert_text = "{0}() {{".format(name)
+    kind = sublime.KIND_FUNCTION
+  else:
+    insert_text = "{0}()".format(name)
+    kind = sublime.KIND_FUNCTION
+  return sublime.CompletionItem.snippet_completion(
+    trigger=name,
+    snippet=insert_text,
+    annotation=annotation_for(info),
+    kind=kind,
+    details=description.replace('\n', ' ')[:100] + '...' if len(description) > 100 else description.replace('\n', ' ')
+  )
+
+class BufferState(object):
+  __slots__ = ('buffer_id', 'document', 'functions', 'index', 'indexed_generation', 'parse_timer', 'semantic_tokens', 'listeners',
+    'job', 'job_change_count', 'large')
+
+  def __init__(self, buffer_id):
+    self.buffer_id = buffer_id
+    self.document = DocumentParse()
+    self.functions = {}
+    self.index = SymbolIndex(self.functions)
+    self.indexed_generation = None
+    self.parse_timer = None
+    self.semantic_tokens = TokenCache()
+    self.listeners = []
+    self.job = None
+    self.job_change_count = None
+    self.large = False
+
+  def reset(self, text):
+    self.job = None
+    self.document.reset(text)
+    self._updated()
+
+  def start_parse(self, text, change_count):
+    self.job = ParseJob(text)
+    self.job_change_count = change_count
+    return self.job
+
+  def continue_parse(self, job, budget):
+    start = time.perf_counter()
+    if not job.step(budget) or self.job is not job or time.perf_counter() - start > budget / 2:
+      return False
+    self.job = None
+    self.document.install(job)
+    self._updated()
+    return True
+
+  def apply_changes(self, changes):
+    if not self.document.apply_changes(changes):
+      return False
+    self._updated()
+    return True
+
+  def _updated(self):
+    self.functions = self.document.functions
+    if self.document.generation != self.indexed_generation:
+      self.index = SymbolIndex(self.functions)
+      self.indexed_generation = self.document.generation
+    else:
+      self.index.definitions = self.functions
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+def buffer_state(buffer_id):
+  return _buffers.get(buffer_id)
+
+def _attach_buffer(listener):
+  buffer_id = listener.view.buffer_id()
+  with _buffers_lock:
+    state = _buffers.get(buffer_id)
+    created = state is None
+    if created:
+      state = _buffers[buffer_id] = BufferState(buffer_id)
+    state.listeners.append(listener)
+  return state, created
+
+def _detach_buffer(listener):
+  state = listener.state
+  with _buffers_lock:
+    if listener in state.listeners:
+      state.listeners.remove(listener)
+    if state.listeners:
+      return False
+    if _buffers.get(state.buffer_id) is state:
+      del _buffers[state.buffer_id]
+  if state.parse_timer:
+    try:
+      sublime.cancel_timeout(state.parse_timer)
+    except:
+      pass
+    state.parse_timer = None
+  state.job = None
+  return True
+
+def _reparse_buffer(state):
+  state.parse_timer = None
+  if state.listeners and not _language_server_wanted():
+    state.listeners[0].parse_document_functions()
 
 class GScriptLspListener(sublime_plugin.ViewEventListener):
   api_definitions = None
-  _completion_cache = {}
-  _FUNC_PATTERN = re.compile(r'(?:public\s+|private\s+)?function\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^)]*)\)')
+  api_index = SymbolIndex()
+  api_state = 'unloaded'
+  api_version = 0
+  _api_lock = threading.Lock()
+  _instances = []
+  _views = {}
+  _FUNC_PATTERN = FUNC_PATTERN
   _PARAM_PATTERN = re.compile(r'function\s+[a-zA-Z_][a-zA-Z0-9_]*\s*\(([^)]*)\)')
 
   @classmethod
@@ -222,55 +649,326 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
     syntax = settings.get('syntax')
     return syntax and 'gscript.sublime-syntax' in syntax
 
+  @classmethod
+  def for_view(cls, view):
+    if view is None:
+      return None
+    return cls._views.get(view.id())
+
   def __init__(self, view):
     super(GScriptLspListener, self).__init__(view)
-    self.document_functions = {}
-    self.parse_timer = None
-    self._last_content_hash = None
-    self.parse_document_functions()
+    self._symbol_table = None
+    self._completion_session = CompletionSession()
+    self._prerender_token = 0
+    self._signature = None
+    self._signature_pending = False
+    self._call_contexts = {}
+    self._call_contexts_version = None
+    self._diagnostics = DiagnosticsCache()
+    self._diagnostics_token = 0
+    self.diagnostics = []
+    self._semantic_covered = None
+    self._semantic_polling = False
+    self._instances.append(self)
+    self._views[view.id()] = self
+    self.state, created = _attach_buffer(self)
+    if _language_server_wanted():
+      self._set_large(view.size())
+      client = language_client()
+      if client is not None:
+        self.open_remote(client)
+        self.schedule_diagnostics()
+      return
+    if created:
+      self.parse_document_functions()
+    else:
+      self.schedule_diagnostics()
+    workspace_for_window(self.view.window())
+
+  def remote_uri(self):
+    path = self.view.file_name()
+    if path:
+      return path_to_uri(path)
+    return "buffer:{0}".format(self.view.buffer_id())
+
+  def open_remote(self, client):
+    buffer_id = self.view.buffer_id()
+    if _remote_buffers.get(buffer_id) is not None:
+      return
+    uri = self.remote_uri()
+    _remote_buffers[buffer_id] = uri
+    _sync_remote_folders(client, self.view.window())
+    client.notify('textDocument/didOpen', {'textDocument': {
+      'uri': uri, 'languageId': 'gscript', 'version': self.view.change_count(),
+      'text': self.view.substr(sublime.Region(0, self.view.size()))}})
+
+  def _remote_params(self, point=None):
+    uri = _remote_buffers.get(self.view.buffer_id()) or self.remote_uri()
+    params = {'textDocument': {'uri': uri}}
+    if point is not None:
+      row, col = self.view.rowcol(point)
+      params['position'] = {'line': row, 'character': col}
+    window = self.view.window()
+    if window is not None:
+      params['gscript'] = {'window': window.id()}
+    return params
+
+  def _remote_request(self, method, params, done):
+    client = language_client()
+    if client is None or self.view.buffer_id() not in _remote_buffers:
+      return False
+    client.request(method, params, done)
+    return True
 
+  def sync_remote(self):
+    client = language_client()
+    uri = _remote_buffers.get(self.view.buffer_id())
+    if client is None or uri is None:
+      return
+    client.notify('textDocument/didChange', {
+      'textDocument': {'uri': uri, 'version': self.view.change_count()},
+      'contentChanges': [{'text': self.view.substr(sublime.Region(0, self.view.size()))}]})
+    self.remote_text_changed()
+
+  def remote_text_changed(self):
+    self._set_large(self.view.size())
+    self._buffer_updated()
+
+  @property
+  def document(self):
+    return self.state.document
+
+  @property
+  def document_functions(self):
+    return self.state.functions
+
+  @property
+  def document_index(self):
+    return self.state.index
+
+  @timed('parse_document_functions')
   def parse_document_functions(self):
-    content = self.view.substr(sublime.Region(0, self.view.size()))
-    content_hash = hash(content[:8192])
-    if self._last_content_hash == content_hash:
-      return
-    self._last_content_hash = content_hash
-    self.document_functions.clear()
-    clientside_marker = content.find('//#CLIENTSIDE')
-    for match in self._FUNC_PATTERN.finditer(content):
-      func_name = match.group(1)
-      params_str = match.group(2).strip()
-      params = [p.strip() for p in params_str.split(',') if p.strip()] if params_str else []
-      func_scope = 'clientside' if (clientside_marker != -1 and match.start() > clientside_marker) else ('serverside' if clientside_marker != -1 else 'document')
-      line_num = content[:match.start()].count('\n')
-      self.document_functions[func_name] = {
-        'name': func_name,
-        'params': params,
-        'returns': 'void',
-        'description': 'User-defined function in current script',
-        'scope': func_scope,
-        'is_custom': True,
-        'line': line_num
-      }
+    state = self.state
+    text = self.view.substr(sublime.Region(0, self.view.size()))
+    threshold, _ = _large_file_settings()
+    state.large = len(text) >= threshold
+    self._parse_slice(state.start_parse(text, self.view.change_count()))
+
+  @timed('parse_slice')
+  def _parse_slice(self, job):
+    state = self.state
+    if state.job is not job or not self.view.is_valid():
+      return
+    if self.view.change_count() != state.job_change_count:
+      state.job = None
+      self.schedule_parse()
+      return
+    _, budget = _large_file_settings()
+    if state.continue_parse(job, budget):
+      _stats.count('parse.jobs', 1)
+      _stats.count('parse.slices', job.slices)
+      self._buffer_updated()
+    elif state.job is job:
+      sublime.set_timeout_async(lambda: self._parse_slice(job), 0)
+    self._update_mode_status()
+
+  @timed('apply_text_changes')
+  def apply_text_changes(self, changes):
+    state = self.state
+    if state.job is not None:
+      state.job = None
+      self.schedule_parse()
+    elif state.apply_changes(changes):
+      self._set_large(len(state.document.text))
+      self._buffer_updated()
+    else:
+      self.schedule_parse()
+
+  def _set_large(self, size):
+    threshold, _ = _large_file_settings()
+    large = size >= threshold
+    if large != self.state.large:
+      self.state.large = large
+      self._update_mode_status()
+
+  def _buffer_updated(self):
+    for listener in list(self.state.listeners):
+      listener.schedule_diagnostics()
+
+  def _update_mode_status(self):
+    state = self.state
+    if not state.large:
+      status = None
+    elif state.job is not None:
+      status = "GScript: large file (parsing {0}%)".format(state.job.progress())
+    else:
+      status = "GScript: large file"
+    for listener in list(state.listeners):
+      if status is None:
+        listener.view.erase_status("rc_mode")
+      else:
+        listener.view.set_status("rc_mode", status)
+
+  def schedule_diagnostics(self):
+    settings = sublime.load_settings("SublimeRC.sublime-settings")
+    self._diagnostics_token += 1
+    if not settings.get("diagnostics_enabled", True):
+      if self.diagnostics:
+        self._apply_diagnostics(self._diagnostics_token, self.view.change_count(), [])
+      return
+    delay = settings.get("diagnostics_delay_ms", 500)
+    if not isinstance(delay, int) or delay < 0:
+      delay = 500
+    token = self._diagnostics_token
+    sublime.set_timeout_async(lambda: self._submit_diagnostics(token), delay)
+
+  def _submit_diagnostics(self, token):
+    if token != self._diagnostics_token or not self.view.is_valid():
+      return
+    if _language_server_wanted():
+      self._remote_diagnostics(token)
+      return
+    text = self.document.text
+    if len(text) != self.view.size():
+      return
+    workspace = workspace_for_window(self.view.window())
+    check_unknown = bool(GScriptLspListener.api_definitions)
+    snapshot = (self.view.change_count(), text, list(self.document.matches), self.symbol_table(), self.document_functions,
+      (GScriptLspListener.api_version, workspace.generation if workspace else None, check_unknown))
+    _diagnostics_executor.submit(self._run_diagnostics, token, snapshot)
+
+  def _remote_diagnostics(self, token):
+    def done(result, error):
+      if error is None and result:
+        results = [tuple(item) for item in result.get('diagnostics') or []]
+        sublime.set_timeout(lambda: self._apply_diagnostics(token, result.get('version'), results), 0)
+    self._remote_request('gscript/diagnostics', self._remote_params(), done)
+
+  @timed('diagnostics')
+  def _run_diagnostics(self, token, snapshot):
+    change_count, text, matches, table, functions, key = snapshot
+    if token != self._diagnostics_token:
+      return
+    key += (tuple(sorted((name, tuple(info['params'])) for name, info in functions.items())),)
+    cache = self._diagnostics
+    results = cache.check(text, matches, table.lookup, key, key[2])
+    _stats.count('diagnostics.rescanned', cache.rescanned)
+    _stats.count('diagnostics.reused', cache.reused)
+    sublime.set_timeout(lambda: self._apply_diagnostics(token, change_count, results), 0)
+
+  def _apply_diagnostics(self, token, change_count, results):
+    view = self.view
+    if token != self._diagnostics_token or not view.is_valid() or view.change_count() != change_count:
+      return
+    self.diagnostics = results
+    flags = sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SQUIGGLY_UNDERLINE
+    errors = [sublime.Region(start, end) for start, end, severity, _ in results if severity == ERROR]
+    warnings = [sublime.Region(start, end) for start, end, severity, _ in results if severity != ERROR]
+    view.add_regions("rc_diagnostics_error", errors, "region.redish", "", flags)
+    view.add_regions("rc_diagnostics_warning", warnings, "region.yellowish", "", flags)
+    if results:
+      view.set_status("rc_diagnostics", "GScript: {0} error{1}, {2} warning{3}".format(
+        len(errors), '' if len(errors) == 1 else 's', len(warnings), '' if len(warnings) == 1 else 's'))
+    else:
+      view.erase_status("rc_diagnostics")
+    window = view.window()
+    if window is not None and window.active_panel() == "output.rc_diagnostics" and window.active_view() == view:
+      _show_diagnostics_panel(window, view, results)
+
+  def symbol_table(self):
+    window = self.view.window()
+    layers = [self.document_index]
+    workspace = workspace_for_window(window)
+    if workspace is not None:
+      layers.append(workspace.index)
+    project = project_layer_for_window(window)
+    if project is not None:
+      layers.append(project.index)
+    if _user_layer is not None:
+      layers.append(_user_layer.index)
+    layers.append(GScriptLspListener.api_index)
+    layers = tuple(layers)
+    table = self._symbol_table
+    if table is None or table.layers != layers:
+      table = self._symbol_table = SymbolTable(layers)
+    return table
+
+  def complete_symbols(self, prefix, limit):
+    workspace = workspace_for_window(self.view.window())
+    key = (self.document.generation, GScriptLspListener.api_version, workspace.generation if workspace else None)
+    session = self._completion_session
+    if session is None:
+      session = self._completion_session = CompletionSession()
+    results = session.complete(self.symbol_table(), key, prefix, limit)
+    _stats.count('completion.' + session.outcome)
+    return results
 
   @classmethod
   def load_api_definitions(cls):
+    if _language_server_wanted():
+      return cls.api_definitions
     if cls.api_definitions is None:
-      try:
-        package_path = sublime.packages_path()
-        package_name = get_package_name()
-        json_path = os.path.join(package_path, package_name, "api_definitions.json")
-        if not os.path.exists(json_path):
-          user_data_path = os.path.join(os.path.expanduser("~"), "AppData", "Roaming", "Sublime Text", "Packages", package_name, "api_definitions.json")
-          if os.path.exists(user_data_path):
-            json_path = user_data_path
-        with open(json_path, 'r', encoding='utf-8') as f:
-          cls.api_definitions = json.load(f)
-        sublime.status_message("Loaded {0} API definitions".format(len(cls.api_definitions)))
-      except Exception:
-        cls.api_definitions = {}
+      with cls._api_lock:
+        if cls.api_state == 'unloaded':
+          cls.api_state = 'loading'
+          threading.Thread(target=cls.reload_api_definitions, daemon=True).start()
+      return {}
     return cls.api_definitions
 
+  @classmethod
+  def api_definitions_path(cls):
+    return os.path.join(sublime.packages_path(), get_package_name(), "api_definitions.json")
+
+  @classmethod
+  def install_api_layer(cls, layer):
+    cls.api_index = layer.index
+    cls.api_definitions = layer.definitions
+    cls.api_version += 1
+    cls.api_state = 'ready'
+    _refresh_diagnostics()
+
+  @classmethod
+  @timed('reload_api_definitions')
+  def reload_api_definitions(cls):
+    start = time.time()
+    layer = _upstream_layer(cls.api_definitions_path())
+    layer.refresh(_log_layers, force=True)
+    cls.install_api_layer(layer)
+    definitions = layer.definitions
+    print("[SublimeRC] Loaded {0} API definitions from {1} in {2:.0f} ms".format(len(definitions), layer.source, (time.time() - start) * 1000))
+    if definitions:
+      sublime.set_timeout(lambda: sublime.status_message("Loaded {0} API definitions".format(len(definitions))), 0)
+    return definitions
+
+  def _hover_html(self, info, word):
+    key = ('hover', word, id(info), self.state.large) + PopupStyler(self.view).key
+    return _render_popup(key, info, lambda: self._build_hover_html(info, word, info.get('example', ''), None))
+
+  def _signature_html(self, info, func_name, current_param):
+    key = ('signature', func_name, current_param, id(info)) + PopupStyler(self.view).key
+    return _render_popup(key, info, lambda: self._build_signature_html(info, func_name, current_param))
+
+  def _schedule_prerender(self):
+    settings = sublime.load_settings("SublimeRC.sublime-settings")
+    count = settings.get("popup_prerender_count", 25)
+    if not isinstance(count, int) or count <= 0:
+      return
+    self._prerender_token += 1
+    token = self._prerender_token
+    sublime.set_timeout_async(lambda: self._prerender(token, count), 2000)
+
+  @timed('prerender')
+  def _prerender(self, token, count):
+    if token != self._prerender_token or not self.view.is_valid():
+      return
+    symbols = _remote_infos if _language_server_wanted() else self.symbol_table()
+    for word, _ in heapq.nlargest(count, list(_popup_usage.items()), key=lambda item: item[1]):
+      if token != self._prerender_token:
+        return
+      info = symbols.get(word)
+      if info is not None and not info.get('is_custom', False):
+        self._hover_html(info, word)
+
   def _build_hover_html(self, info, word, example, point):
     styler = PopupStyler(self.view)
     c, fs, px = styler.c, styler.fs, styler.px
@@ -331,7 +1029,7 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
     html_parts.append('<div style="font-size:{0}px;color:{1};margin-bottom:{2}px">Example:</div>'.format(
       fs(11), c('muted'), px(4)))
     if example:
-      highlighted = syntax_highlight_gscript(example.strip(), self.view)
+      highlighted = syntax_highlight_gscript(example.strip(), None if self.state.large else self.view)
       bg_blend = styler._blend(c('background'), c('text'), 0.08)
       html_parts.append('<pre style="background:{0};padding:{1}px;border-radius:4px;margin:0;font-family:Consolas,Monaco,monospace;font-size:{2}px;overflow-x:auto;white-space:pre-wrap">{3}</pre>'.format(
         bg_blend, px(8), fs(14), highlighted))
@@ -341,20 +1039,14 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
     html_parts.append('</div></div>')
     return ''.join(html_parts)
 
+  @timed('on_query_completions')
   def on_query_completions(self, prefix, locations):
     if not self.view.match_selector(locations[0], "source.gscript"):
       return None
-    definitions = self.load_api_definitions()
-    if not definitions:
-      definitions = {}
-    cache_key = (prefix.lower(), len(definitions))
-    cached = self._completion_cache.get(cache_key)
-    if cached is not None:
-      return cached
+    self.load_api_definitions()
     point = locations[0]
-    if self.view.match_selector(point, "string.quoted") and _has_player_completions:
-      line_region = self.view.line(point)
-      line_text = self.view.substr(line_region)
+    if self.view.match_selector(point, "string.quoted") and len(_lsp_players.directory):
+      line_region, line_text = _line_window(self.view, point)
       col = point - line_region.begin()
       start = col
       while start > 0 and (line_text[start - 1].isalnum() or line_text[start - 1] in '_'):
@@ -362,14 +1054,10 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
       prefix_in_string = line_text[start:col]
       player_completions = _lsp_players.get_player_completions(prefix_in_string)
       if player_completions:
-        result = sublime.CompletionList(player_completions, flags=sublime.INHIBIT_WORD_COMPLETIONS | sublime.INHIBIT_EXPLICIT_COMPLETIONS)
-        self._completion_cache[cache_key] = result
-        return result
-    all_definitions = {}
-    all_definitions.update(self.document_functions)
-    all_definitions.update(definitions)
-    line_region = self.view.line(point)
-    line_text = self.view.substr(line_region)
+        return sublime.CompletionList(player_completions, flags=sublime.INHIBIT_WORD_COMPLETIONS | sublime.INHIBIT_EXPLICIT_COMPLETIONS)
+    if _language_server_wanted():
+      return self._remote_completions(point)
+    line_region, line_text = _line_window(self.view, point)
     col = point - line_region.begin()
     start = col
     while start > 0 and (line_text[start - 1].isalnum() or line_text[start - 1] in '$_:'):
@@ -380,61 +1068,30 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
     prefix_lower = prefix.lower()
     settings = sublime.load_settings("SublimeRC.sublime-settings")
     max_results = settings.get("completion_max_results_short", 50) if len(prefix) < 2 else settings.get("completion_max_results_long", 200)
-    completions = []
-    result_count = 0
-    for name, info in all_definitions.items():
-      if result_count >= max_results:
-        break
-      if name.lower().startswith(prefix_lower):
-        result_count += 1
-        params = info.get('params', [])
-        returns = info.get('returns', 'void')
-        description = info.get('description', '')
-        scope = info.get('scope', '')
-        is_custom = info.get('is_custom', False)
-        item_type = info.get('type', '')
-        is_variable = name.startswith('$')
-        annotation = ""
-        if is_custom or scope:
-          if scope == 'document' or is_custom:
-            annotation = 'USER'
-          elif scope == 'global':
-            annotation = 'GLOBAL'
-          elif 'client' in scope.lower():
-            annotation = 'CLIENTSIDE'
-          elif 'server' in scope.lower():
-            annotation = 'SERVERSIDE'
-          else:
-            annotation = 'UNDEFINED'
-        if is_variable:
-          insert_text = name
-          kind = sublime.KIND_VARIABLE
-        elif not params:
-          insert_text = "{0}() {{".format(name)
-          kind = sublime.KIND_FUNCTION
-        else:
-          insert_text = "{0}()".format(name)
-          kind = sublime.KIND_FUNCTION
-        completion_item = sublime.CompletionItem.snippet_completion(
-          trigger=name,
-          snippet=insert_text,
-          annotation=annotation,
-          kind=kind,
-          details=description.replace('\n', ' ')[:100] + '...' if len(description) > 100 else description.replace('\n', ' ')
-        )
-        completions.append(completion_item)
-    result = sublime.CompletionList(completions, flags=sublime.INHIBIT_WORD_COMPLETIONS)
-    self._completion_cache[cache_key] = result
-    return result
+    completions = [_completion_item(name, info) for name, info in self.complete_symbols(prefix_lower, max_results)]
+    return sublime.CompletionList(completions, flags=sublime.INHIBIT_WORD_COMPLETIONS)
 
+  def _remote_completions(self, point):
+    completion_list = sublime.CompletionList()
+    def done(result, error):
+      items = []
+      for item in ((result or {}).get('items') or []) if error is None else []:
+        info = dict(item.get('data') or {})
+        info['description'] = item.get('documentation') or ''
+        items.append(_completion_item(item['label'], info))
+      completion_list.set_completions(items, flags=sublime.INHIBIT_WORD_COMPLETIONS)
+    if not self._remote_request('textDocument/completion', self._remote_params(point), done):
+      return None
+    return completion_list
+
+  @timed('on_hover')
   def on_hover(self, point, hover_zone):
     self.view.erase_regions("rc_hover_underline")
     if hover_zone != sublime.HOVER_TEXT:
       return
     if not self.view.match_selector(point, "source.gscript"):
       return
-    line_region = self.view.line(point)
-    line_text = self.view.substr(line_region)
+    line_region, line_text = _line_window(self.view, point)
     func_match = self._PARAM_PATTERN.search(line_text)
     if func_match:
       param_start = func_match.start(1)
@@ -462,7 +1119,9 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
         border=styler.c('border')
       )
       max_width_main, _, max_height_main, _ = _get_popup_dimensions()
-      self.view.show_popup(
+      self._signature = None
+      _show_popup(
+        self.view,
         html,
         location=point,
         max_width=max_width_main,
@@ -480,17 +1139,17 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
     word = line_text[start:end].strip()
     if not word:
       return
-    if _has_player_completions and word:
-      player_info = _lsp_players.get_player_info(word)
-      if player_info:
-        styler = PopupStyler(self.view)
+    player_info = _lsp_players.get_player_info(word)
+    if player_info:
+      styler = PopupStyler(self.view)
+      def build():
         c, fs, px = styler.c, styler.fs, styler.px
         badges_html = ''.join([
           "<span style='background-color:{0};color:#fff;padding:2px {1}px;border-radius:3px;font-size:{2}px;font-weight:bold;margin-right:{3}px'>{4}</span>".format(
-            '#4caf50' if badge == 'RC' else '#2196f3', px(8), fs(10), px(4), badge
+            '#4caf50' if badge == 'RC' else '#2196f3', px(8), fs(10), px(4), badge.translate(_escape_table)
           ) for badge in player_info['badges']
         ])
-        html = """
+        return """
         <div style="padding:{px10}px;font-family:system-ui,-apple-system,sans-serif;background:{bg};color:{fg}">
           <div style="margin-bottom:{px8}px">{badges}</div>
           <div style="font-family:Consolas,Monaco,monospace;font-size:{fs13}px;color:{keyword};margin-bottom:{px8}px">
@@ -509,41 +1168,45 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
           keyword=styler.c('keyword'),
           border=styler.c('border'),
           badges=badges_html,
-          account=player_info['account'],
-          nick=player_info['nick'],
-          level=player_info['level'],
-          player_id=player_info['id']
+          account=player_info['account'].translate(_escape_table),
+          nick=player_info['nick'].translate(_escape_table),
+          level=player_info['level'].translate(_escape_table),
+          player_id=player_info['id'].translate(_escape_table)
         )
-        _, max_width_compact, _, max_height_compact = _get_popup_dimensions()
-        self.view.show_popup(
-          html,
-          location=point,
-          max_width=max_width_compact,
-          max_height=max_height_compact,
-          flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY
-        )
-        return
-    definitions = self.load_api_definitions()
-    if not definitions:
-      definitions = {}
-    all_definitions = {}
-    all_definitions.update(self.document_functions)
-    all_definitions.update(definitions)
-    word_lower = word.lower()
-    info = None
-    for name, data in all_definitions.items():
-      if name.lower() == word_lower:
-        info = data
-        break
-    if info is None:
+      html = _render_popup(('player', player_info['account']) + styler.key, player_info, build)
+      _, max_width_compact, _, max_height_compact = _get_popup_dimensions()
+      self._signature = None
+      _show_popup(
+        self.view,
+        html,
+        location=point,
+        max_width=max_width_compact,
+        max_height=max_height_compact,
+        flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY
+      )
       return
     word_region = sublime.Region(line_region.begin() + start, line_region.begin() + end)
+    if _language_server_wanted():
+      def done(result, error):
+        remote = (result or {}).get('gscript') if error is None else None
+        if remote:
+          info = _remote_info(remote['name'], remote['info'])
+          sublime.set_timeout(lambda: self._show_hover(point, word, info, word_region), 0)
+      if self._remote_request('textDocument/hover', self._remote_params(point), done):
+        return True
+      return
+    self.load_api_definitions()
+    info = self.symbol_table().get(word)
+    if info is None:
+      return
+    self._show_hover(point, word, info, word_region)
+    return True
+
+  def _show_hover(self, point, word, info, word_region):
     self.view.add_regions("rc_hover_underline", [word_region], "entity.name.function", "",
       sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SOLID_UNDERLINE)
-    example = info.get('example', '')
-    html = self._build_hover_html(info, word, example, point)
-    if not isinstance(html, str) or not html.strip():
-      html = '<div style="padding:10px;color:#f44336;background:#ffebee;font-family:system-ui">Documentation unavailable</div>'
+    if not info.get('is_custom', False):
+      _popup_usage[word] = _popup_usage.get(word, 0) + 1
     self.view.hide_popup()
     max_width_main, _, max_height_main, _ = _get_popup_dimensions()
     try:
@@ -551,225 +1214,661 @@ class GScriptLspListener(sublime_plugin.ViewEventListener):
       max_height_main = int(max_height_main)
     except (TypeError, ValueError):
       max_width_main, max_height_main = 600, 600
-    def show():
-      if not self.view or not self.view.is_valid():
-        return
-      self.view.hide_popup()
-      self.view.show_popup(
-        html,
-        flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY | sublime.COOPERATE_WITH_AUTO_COMPLETE,
-        location=point,
-        max_width=max_width_main,
-        max_height=max_height_main
-      )
-    sublime.set_timeout(show, 10)
-    return True
+    def render():
+      html = self._hover_html(info, word)
+      if not isinstance(html, str) or not html.strip():
+        html = '<div style="padding:10px;color:#f44336;background:#ffebee;font-family:system-ui">Documentation unavailable</div>'
+      def show():
+        if not self.view or not self.view.is_valid():
+          return
+        self.view.hide_popup()
+        self._signature = None
+        _show_popup(
+          self.view,
+          html,
+          flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY | sublime.COOPERATE_WITH_AUTO_COMPLETE,
+          location=point,
+          max_width=max_width_main,
+          max_height=max_height_main
+        )
+      sublime.set_timeout(show, 0)
+      self._schedule_prerender()
+    sublime.set_timeout_async(render, 0)
+
+  def _build_signature_html(self, info, func_name, current_param):
+    params = info.get('params', [])
+    returns = info.get('returns', 'void')
+    description = info.get('description', '')
+    example = info.get('example', '')
+    scope = info.get('scope', '')
+    param_list = []
+    for i, param in enumerate(params):
+      if i == current_param:
+        param_list.append("<strong style='color:#ffd700;text-decoration:underline'>{0}</strong>".format(param))
+      else:
+        param_list.append("<span style='color:#4ec9b0'>{0}</span>".format(param))
+    param_str = ', '.join(param_list)
+    styler = PopupStyler(self.view)
+    c, fs, px = styler.c, styler.fs, styler.px
+    bg_blend = styler._blend(c('background'), c('text'), 0.15)
+    hint_parts = []
+    hint_parts.append('<div style="padding:{0}px;font-family:system-ui,-apple-system,sans-serif;background:{1}">'.format(px(8), c('background')))
+    hint_parts.append('<div style="font-family:Consolas,Monaco,monospace;font-size:{0}px;margin-bottom:{1}px">'.format(fs(13), px(6)))
+    hint_parts.append('<span style="color:{0}">{1}</span><span style="color:{2}">(</span>{3}<span style="color:{2}">)</span>'.format(
+      c('function'), func_name, c('text'), param_str))
+    hint_parts.append('</div>')
+    if scope:
+      badge_map = {
+        'document': ('#b97a00', 'USER'),
+        'global': ('#4a5f6b', 'GLOBAL'),
+        'clientside': ('#3a8fa3', 'CLIENT'),
+        'serverside': ('#5a8f5d', 'SERVER')
+      }
+      bg, text = badge_map.get(scope, ('#81c784', 'UNDEFINED'))
+      hint_parts.append('<div style="margin-bottom:{0}px">'.format(px(6)))
+      hint_parts.append("<span style='background: {}; color: #fff; padding: 2px 6px; border-radius: 3px; font-size: {}px; font-weight: bold;'>{}</span>".format(bg, fs(9), text))
+      hint_parts.append('</div>')
+    hint_parts.append('<div style="font-size:{0}px;color:{1};margin-bottom:{2}px">'.format(fs(11), c('muted'), px(4)))
+    hint_parts.append('Parameter {0}/{1} &bull; Returns: <span style="color:{2}">{3}</span>'.format(
+      current_param + 1, len(params), c('constant'), returns))
+    hint_parts.append('</div>')
+    if description and description != "No matching script function found!":
+      short_desc = description[:100] + '...' if len(description) > 100 else description
+      hint_parts.append('<div style="font-size:{0}px;color:{1};padding-top:{2}px;border-top:1px solid {3}">{4}</div>'.format(
+        fs(11), c('text'), px(6), c('border'), short_desc))
+    hint_parts.append('<div style="margin-top:{0}px;padding-top:{1}px;border-top:1px solid {2}">'.format(px(6), px(6), c('border')))
+    hint_parts.append('<div style="font-size:{0}px;color:{1};margin-bottom:{2}px">Example:</div>'.format(fs(10), c('muted'), px(3)))
+    if example:
+      highlighted = syntax_highlight_gscript(example.strip(), None if self.state.large else self.view)
+      hint_parts.append('<pre style="background:{0};padding:{1}px;border-radius:3px;margin:0;font-family:Consolas,Monaco,monospace;font-size:{2}px;white-space:pre-wrap">{3}</pre>'.format(
+        bg_blend, px(6), fs(11), highlighted))
+    else:
+      hint_parts.append('<div style="color:{0};font-style:italic;font-size:{1}px">(no example)</div>'.format(c('muted'), fs(10)))
+    hint_parts.append('</div></div>')
+    return ''.join(hint_parts)
 
+  def call_context(self, point):
+    change_count = self.view.change_count()
+    if self._call_contexts_version != change_count or len(self._call_contexts) > 256:
+      self._call_contexts = {}
+      self._call_contexts_version = change_count
+    try:
+      return self._call_contexts[point]
+    except KeyError:
+      pass
+    context = find_call_context(lambda a, b: self.view.substr(sublime.Region(a, b)), point)
+    self._call_contexts[point] = context
+    return context
+
+  def signature_state(self, point):
+    if not self.view.match_selector(point, "source.gscript"):
+      return None
+    context = self.call_context(point)
+    if context is None:
+      return None
+    func_name, _, arg_index = context
+    self.load_api_definitions()
+    info = self.symbol_table().get(func_name)
+    if info is None:
+      return None
+    params = info.get('params', [])
+    if not params:
+      return None
+    current_param = arg_index if arg_index < len(params) else len(params) - 1
+    return func_name, info, current_param
+
+  @timed('show_param_hint')
   def show_param_hint(self):
     if not self.view or not self.view.is_valid() or not self.view.sel():
-      self.view.hide_popup()
+      self._clear_signature()
       return
-    if not self.view.match_selector(self.view.sel()[0].begin(), "source.gscript"):
-      self.view.hide_popup()
+    if self.state.large:
+      self._clear_signature()
       return
-    definitions = self.load_api_definitions()
-    if not definitions:
-      definitions = {}
-    all_definitions = {}
-    all_definitions.update(self.document_functions)
-    all_definitions.update(definitions)
     point = self.view.sel()[0].begin()
-    line_region = self.view.line(point)
-    line_text = self.view.substr(line_region)
-    col = point - line_region.begin()
-    if col > 0:
-      paren_pos = line_text.rfind('(', 0, col)
-      if paren_pos != -1:
-        close_pos = line_text.find(')', paren_pos)
-        if close_pos == -1 or close_pos >= col:
-          start = paren_pos - 1
-          while start >= 0 and (line_text[start].isalnum() or line_text[start] == '_'):
-            start -= 1
-          start += 1
-          func_name = line_text[start:paren_pos].strip()
-          if func_name:
-            func_name_lower = func_name.lower()
-            info = None
-            for name, data in all_definitions.items():
-              if name.lower() == func_name_lower:
-                info = data
-                break
-            if info is None:
-              return
-            params = info.get('params', [])
-            returns = info.get('returns', 'void')
-            description = info.get('description', '')
-            example = info.get('example', '')
-            scope = info.get('scope', '')
-            if params:
-              param_text = line_text[paren_pos + 1:col]
-              comma_count = param_text.count(',')
-              current_param = comma_count if comma_count < len(params) else len(params) - 1
-              param_list = []
-              for i, param in enumerate(params):
-                if i == current_param:
-                  param_list.append("<strong style='color:#ffd700;text-decoration:underline'>{0}</strong>".format(param))
-                else:
-                  param_list.append("<span style='color:#4ec9b0'>{0}</span>".format(param))
-              param_str = ', '.join(param_list)
-              styler = PopupStyler(self.view)
-              c, fs, px = styler.c, styler.fs, styler.px
-              bg_blend = styler._blend(c('background'), c('text'), 0.15)
-              hint_parts = []
-              hint_parts.append('<div style="padding:{0}px;font-family:system-ui,-apple-system,sans-serif;background:{1}">'.format(px(8), c('background')))
-              hint_parts.append('<div style="font-family:Consolas,Monaco,monospace;font-size:{0}px;margin-bottom:{1}px">'.format(fs(13), px(6)))
-              hint_parts.append('<span style="color:{0}">{1}</span><span style="color:{2}">(</span>{3}<span style="color:{2}">)</span>'.format(
-                c('function'), func_name, c('text'), param_str))
-              hint_parts.append('</div>')
-              if scope:
-                badge_map = {
-                  'document': ('#b97a00', 'USER'),
-                  'global': ('#4a5f6b', 'GLOBAL'),
-                  'clientside': ('#3a8fa3', 'CLIENT'),
-                  'serverside': ('#5a8f5d', 'SERVER')
-                }
-                bg, text = badge_map.get(scope, ('#81c784', 'UNDEFINED'))
-                hint_parts.append('<div style="margin-bottom:{0}px">'.format(px(6)))
-                hint_parts.append("<span style='background: {}; color: #fff; padding: 2px 6px; border-radius: 3px; font-size: {}px; font-weight: bold;'>{}</span>".format(bg, fs(9), text))
-                hint_parts.append('</div>')
-              hint_parts.append('<div style="font-size:{0}px;color:{1};margin-bottom:{2}px">'.format(fs(11), c('muted'), px(4)))
-              hint_parts.append('Parameter {0}/{1} &bull; Returns: <span style="color:{2}">{3}</span>'.format(
-                current_param + 1, len(params), c('constant'), returns))
-              hint_parts.append('</div>')
-              if description and description != "No matching script function found!":
-                short_desc = description[:100] + '...' if len(description) > 100 else description
-                hint_parts.append('<div style="font-size:{0}px;color:{1};padding-top:{2}px;border-top:1px solid {3}">{4}</div>'.format(
-                  fs(11), c('text'), px(6), c('border'), short_desc))
-              hint_parts.append('<div style="margin-top:{0}px;padding-top:{1}px;border-top:1px solid {2}">'.format(px(6), px(6), c('border')))
-              hint_parts.append('<div style="font-size:{0}px;color:{1};margin-bottom:{2}px">Example:</div>'.format(fs(10), c('muted'), px(3)))
-              if example:
-                highlighted = syntax_highlight_gscript(example.strip(), self.view)
-                hint_parts.append('<pre style="background:{0};padding:{1}px;border-radius:3px;margin:0;font-family:Consolas,Monaco,monospace;font-size:{2}px;white-space:pre-wrap">{3}</pre>'.format(
-                  bg_blend, px(6), fs(11), highlighted))
-              else:
-                hint_parts.append('<div style="color:{0};font-style:italic;font-size:{1}px">(no example)</div>'.format(c('muted'), fs(10)))
-              hint_parts.append('</div></div>')
-              hint = ''.join(hint_parts)
-              max_width_main, _, max_height_main, _ = _get_popup_dimensions()
-              self.view.show_popup(
-                hint,
-                flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY | sublime.COOPERATE_WITH_AUTO_COMPLETE,
-                location=point,
-                max_width=max_width_main,
-                max_height=max_height_main
-              )
-              return
-    self.view.hide_popup()
+    if not _language_server_wanted():
+      self._show_signature(point, self.signature_state(point))
+      return
+    if not self.view.match_selector(point, "source.gscript"):
+      self._clear_signature()
+      return
+    def done(result, error):
+      remote = (result or {}).get('gscript') if error is None else None
+      state = None
+      if remote:
+        state = (remote['name'], _remote_info(remote['name'], remote['info']), remote['activeParameter'])
+      sublime.set_timeout(lambda: self._show_signature(point, state), 0)
+    if not self._remote_request('textDocument/signatureHelp', self._remote_params(point), done):
+      self._clear_signature()
 
-  def on_post_save_async(self):
-    self.parse_document_functions()
+  def _show_signature(self, point, state):
+    if state is None:
+      self._clear_signature()
+      return
+    func_name, info, current_param = state
+    shown = self._signature
+    key = (func_name, id(info), current_param)
+    if key == shown:
+      return
+    hint = self._signature_html(info, func_name, current_param)
+    self._signature = key
+    if shown is not None and shown[:2] == key[:2] and self.view.is_popup_visible():
+      _update_popup(self.view, hint)
+      return
+    max_width_main, _, max_height_main, _ = _get_popup_dimensions()
+    _show_popup(
+      self.view,
+      hint,
+      flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY | sublime.COOPERATE_WITH_AUTO_COMPLETE,
+      location=point,
+      max_width=max_width_main,
+      max_height=max_height_main
+    )
+
+  def _clear_signature(self):
+    if self._signature is None:
+      return
+    self._signature = None
+    if self.view.is_valid() and self.view.is_popup_visible():
+      self.view.hide_popup()
+
+  def _signature_tick(self):
+    self._signature_pending = False
+    if self.view.is_valid():
+      self.show_param_hint()
 
   def schedule_parse(self):
-    if self.parse_timer:
+    state = self.state
+    if state.parse_timer:
       try:
-        sublime.cancel_timeout(self.parse_timer)
+        sublime.cancel_timeout(state.parse_timer)
       except:
         pass
-    self.parse_timer = sublime.set_timeout(lambda: self.parse_document_functions(), 1000)
+    state.parse_timer = sublime.set_timeout_async(lambda: _reparse_buffer(state), 1000)
 
-  def on_modified_async(self):
-    self.schedule_parse()
+  def reload_document(self):
+    if _language_server_wanted():
+      self.sync_remote()
+    else:
+      self.parse_document_functions()
 
+  @timed('on_reload_async')
+  def on_reload_async(self):
+    self.reload_document()
+
+  @timed('on_revert_async')
+  def on_revert_async(self):
+    self.reload_document()
+
+  @timed('on_close')
+  def on_close(self):
+    self._completion_session = None
+    if self in self._instances:
+      self._instances.remove(self)
+    if self._views.get(self.view.id()) is self:
+      del self._views[self.view.id()]
+    if not _detach_buffer(self):
+      return
+    uri = _remote_buffers.pop(self.state.buffer_id, None)
+    client = language_client()
+    if uri is not None and client is not None:
+      client.notify('textDocument/didClose', {'textDocument': {'uri': uri}})
+
+  @timed('on_selection_modified_async')
   def on_selection_modified_async(self):
+    self._prerender_token += 1
     if self.view.window() and self.view.window().active_panel():
       return
-    self.show_param_hint()
+    if self._signature_pending:
+      return
+    self._signature_pending = True
+    delay = sublime.load_settings("SublimeRC.sublime-settings").get("signature_help_delay_ms", 50)
+    if not isinstance(delay, int) or delay < 0:
+      delay = 50
+    sublime.set_timeout_async(self._signature_tick, delay)
 
+  @timed('on_load')
   def on_load(self):
     self.load_api_definitions()
 
+  @timed('on_activated_async')
+  def on_activated_async(self):
+    self.refresh_semantic()
+    if not self._semantic_polling:
+      self._semantic_polling = True
+      sublime.set_timeout_async(self._semantic_poll, SEMANTIC_POLL_MS)
+
+  def _semantic_poll(self):
+    window = self.view.window()
+    if window is None or self not in self._instances or window.active_view() != self.view:
+      self._semantic_polling = False
+      return
+    self.refresh_semantic()
+    sublime.set_timeout_async(self._semantic_poll, SEMANTIC_POLL_MS)
+
+  def refresh_semantic(self):
+    view = self.view
+    if not view.is_valid():
+      return
+    if not sublime.load_settings("SublimeRC.sublime-settings").get("semantic_highlighting", True):
+      if self._semantic_covered is not None:
+        self._semantic_covered = None
+        for annotation in SEMANTIC_SCOPES:
+          view.erase_regions("rc_semantic_" + annotation.lower())
+      return
+    remote = _language_server_wanted()
+    if remote:
+      text = None
+      size = view.size()
+      state = (view.change_count(), 'remote', _remote_version)
+    else:
+      text = self.document.text
+      size = len(text)
+      if size != view.size():
+        return
+      workspace = workspace_for_window(view.window())
+      state = (view.change_count(), GScriptLspListener.api_version, workspace.generation if workspace else None)
+    visible = view.visible_region()
+    margin = max(visible.size(), 4096)
+    wanted = (max(0, visible.begin() - margin // 2), min(size, visible.end() + margin // 2))
+    covered = self._semantic_covered
+    if covered is not None and covered[0] == state and covered[1] <= wanted[0] and wanted[1] <= covered[2]:
+      return
+    begin = max(0, visible.begin() - margin)
+    end = min(size, visible.end() + margin)
+    if remote:
+      if not self._remote_semantic(begin, end):
+        return
+    else:
+      self._highlight_semantic(text, begin, end)
+    self._semantic_covered = (state, begin, end)
+
+  def _remote_semantic(self, begin, end):
+    params = self._remote_params()
+    params['begin'] = begin
+    params['end'] = end
+    def done(result, error):
+      if error is not None or not result:
+        return
+      regions = dict((annotation, []) for annotation in SEMANTIC_SCOPES)
+      for offset, length, annotation in result.get('tokens') or []:
+        found = regions.get(annotation)
+        if found is not None:
+          found.append(sublime.Region(offset, offset + length))
+      def apply():
+        if self.view.is_valid() and self.view.change_count() == result.get('version'):
+          self._add_semantic_regions(regions)
+      sublime.set_timeout(apply, 0)
+    return self._remote_request('gscript/semanticTokens', params, done)
+
+  @timed('semantic_highlight')
+  def _highlight_semantic(self, text, begin, end):
+    table = self.symbol_table()
+    classes = {}
+    regions = dict((annotation, []) for annotation in SEMANTIC_SCOPES)
+    for offset, name in self.state.semantic_tokens.function_tokens(text, self.document.matches, begin, end):
+      key = fold(name)
+      annotation = classes.get(key)
+      if annotation is None:
+        info = table.get(name)
+        annotation = classes[key] = annotation_for(info) if info is not None else ''
+      found = regions.get(annotation)
+      if found is not None:
+        found.append(sublime.Region(offset, offset + len(name)))
+    self._add_semantic_regions(regions)
+
+  def _add_semantic_regions(self, regions):
+    flags = sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SOLID_UNDERLINE
+    for annotation, scope in SEMANTIC_SCOPES.items():
+      self.view.add_regions("rc_semantic_" + annotation.lower(), regions[annotation], scope, "", flags)
+
+class GScriptWorkspaceListener(sublime_plugin.EventListener):
+  @timed('on_post_save_async')
+  def on_post_save_async(self, view):
+    path = view.file_name()
+    window = view.window()
+    layer = _layer_for_path(path)
+    if layer is not None:
+      check_layers([layer], _definition_layers_changed, _log_layers)
+    if window is not None and path and path == window.project_file_name():
+      _forget_project_layer(window)
+    if window is None or not is_script(path):
+      return
+    workspace = _workspaces.get(window.id())
+    if workspace is not None and workspace.contains(path):
+      workspace.update_file(path)
+    client = language_client()
+    if client is not None and view.buffer_id() in _remote_buffers:
+      client.notify('textDocument/didSave', {'textDocument': {'uri': _remote_buffers[view.buffer_id()]}})
+
+  def on_pre_close_window(self, window):
+    with _workspaces_lock:
+      _workspaces.pop(window.id(), None)
+    _forget_project_layer(window, closing=True)
+
+  def on_load_project_async(self, window):
+    _forget_project_layer(window)
+
+  def on_post_save_project_async(self, window):
+    _forget_project_layer(window)
+
+class GScriptTextChangeListener(sublime_plugin.TextChangeListener):
+  @timed('on_text_changed_async')
+  def on_text_changed_async(self, changes):
+    buffer_id = self.buffer.id()
+    state = buffer_state(buffer_id)
+    listeners = list(state.listeners) if state is not None else None
+    if not listeners:
+      return
+    records = [(c.a.pt, c.b.pt, c.str, c.a.row, c.a.col, c.b.row, c.b.col) for c in changes]
+    if not _language_server_wanted():
+      listeners[0].apply_text_changes(records)
+      return
+    uri = _remote_buffers.get(buffer_id)
+    client = language_client()
+    if uri is not None and client is not None:
+      client.notify('textDocument/didChange', {
+        'textDocument': {'uri': uri, 'version': listeners[0].view.change_count()},
+        'contentChanges': [{'range': {'start': {'line': r[3], 'character': r[4]}, 'end': {'line': r[5], 'character': r[6]}}, 'text': r[2]}
+          for r in records]})
+      listeners[0].remote_text_changed()
+
+def _line_window(view, point):
+  line_region = view.line(point)
+  if line_region.size() > 2 * LINE_WINDOW:
+    line_region = sublime.Region(max(line_region.begin(), point - LINE_WINDOW), min(line_region.end(), point + LINE_WINDOW))
+  return line_region, view.substr(line_region)
+
+def _word_at(view, point):
+  line_region, line_text = _line_window(view, point)
+  col = point - line_region.begin()
+  start, end = col, col
+  while start > 0 and (line_text[start - 1].isalnum() or line_text[start - 1] in '$_:'):
+    start -= 1
+  while end < len(line_text) and (line_text[end].isalnum() or line_text[end] in '$_:'):
+    end += 1
+  return line_text[start:end].strip()
+
 class RcGotoDefinitionCommand(sublime_plugin.TextCommand):
+  @timed('rc_goto_definition')
   def run(self, edit):
     point = self.view.sel()[0].begin()
-    line_region = self.view.line(point)
-    line_text = self.view.substr(line_region)
-    col = point - line_region.begin()
-    start, end = col, col
-    while start > 0 and (line_text[start - 1].isalnum() or line_text[start - 1] in '$_:'):
-      start -= 1
-    while end < len(line_text) and (line_text[end].isalnum() or line_text[end] in '$_:'):
-      end += 1
-    word = line_text[start:end].strip()
+    word = _word_at(self.view, point)
     if not word:
       return
-    listener = GScriptLspListener.for_view(self.view) if hasattr(GScriptLspListener, 'for_view') else None
-    doc_funcs = {}
-    for listener_inst in GScriptLspListener._instances if hasattr(GScriptLspListener, '_instances') else []:
-      if listener_inst.view.id() == self.view.id():
-        doc_funcs = listener_inst.document_functions
-        break
-    if not doc_funcs:
-      content = self.view.substr(sublime.Region(0, self.view.size()))
-      pattern = GScriptLspListener._FUNC_PATTERN
-      clientside_marker = content.find('//#CLIENTSIDE')
-      for match in pattern.finditer(content):
-        func_name = match.group(1)
-        line_num = content[:match.start()].count('\n')
-        doc_funcs[func_name] = {'line': line_num}
-    word_lower = word.lower()
-    for name, data in doc_funcs.items():
-      if name.lower() == word_lower and 'line' in data:
-        pt = self.view.text_point(data['line'], 0)
-        self.view.sel().clear()
-        self.view.sel().add(sublime.Region(pt))
-        self.view.show_at_center(pt)
-        line_reg = self.view.line(pt)
-        line_text = self.view.substr(line_reg)
-        m = GScriptLspListener._FUNC_PATTERN.search(line_text)
-        if m:
-          name_start = line_reg.begin() + m.start(1)
-          name_end = line_reg.begin() + m.end(1)
-          dest_region = sublime.Region(name_start, name_end)
-          self.view.add_regions("rc_goto_underline", [dest_region], "entity.name.function", "",
-            sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SOLID_UNDERLINE)
-          sublime.set_timeout(lambda: self.view.erase_regions("rc_goto_underline"), 1500)
+    if _language_server_wanted():
+      self.remote_definition(point, word)
+      return
+    state = buffer_state(self.view.buffer_id())
+    if state is None:
+      state = BufferState(self.view.buffer_id())
+      state.reset(self.view.substr(sublime.Region(0, self.view.size())))
+    data = state.index.get(word)
+    if data is not None and 'line' in data:
+      self.goto_line(data['line'])
+      return
+    window = self.view.window()
+    workspace = workspace_for_window(window)
+    candidates = []
+    if workspace is not None:
+      current = self.view.file_name()
+      candidates = [info for info in workspace.lookup_all(word) if info.get('file') != current]
+    self.choose_definition(window, word, candidates)
+
+  def remote_definition(self, point, word):
+    listener = GScriptLspListener.for_view(self.view)
+    uri = _remote_buffers.get(self.view.buffer_id())
+    def done(result, error):
+      locations = result if error is None and isinstance(result, list) else []
+      sublime.set_timeout(lambda: self.show_locations(uri, word, locations), 0)
+    if listener is None or not listener._remote_request('textDocument/definition', listener._remote_params(point), done):
+      sublime.status_message("No definition found for '{}'".format(word))
+
+  def show_locations(self, uri, word, locations):
+    candidates = []
+    for location in locations:
+      line = ((location.get('range') or {}).get('start') or {}).get('line', 0)
+      if location.get('uri') == uri:
+        self.goto_line(line)
         return
+      candidates.append({'file': uri_to_path(location.get('uri', '')), 'line': line})
+    self.choose_definition(self.view.window(), word, candidates)
+
+  def goto_line(self, line):
+    pt = self.view.text_point(line, 0)
+    self.view.sel().clear()
+    self.view.sel().add(sublime.Region(pt))
+    self.view.show_at_center(pt)
+    line_reg = self.view.line(pt)
+    line_text = self.view.substr(line_reg)
+    m = GScriptLspListener._FUNC_PATTERN.search(line_text)
+    if m:
+      name_start = line_reg.begin() + m.start(1)
+      name_end = line_reg.begin() + m.end(1)
+      dest_region = sublime.Region(name_start, name_end)
+      self.view.add_regions("rc_goto_underline", [dest_region], "entity.name.function", "",
+        sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE | sublime.DRAW_SOLID_UNDERLINE)
+      sublime.set_timeout(lambda: self.view.erase_regions("rc_goto_underline"), 1500)
+
+  def choose_definition(self, window, word, candidates):
+    if window is not None and len(candidates) == 1:
+      self.open_definition(window, candidates[0])
+      return
+    if window is not None and candidates:
+      items = ["{0}:{1}".format(info['file'], info['line'] + 1) for info in candidates]
+      def on_select(i):
+        if i >= 0:
+          self.open_definition(window, candidates[i])
+      window.show_quick_panel(items, on_select)
+      return
     sublime.status_message("No definition found for '{}'".format(word))
 
+  def open_definition(self, window, info):
+    window.open_file("{0}:{1}:1".format(info['file'], info['line'] + 1), sublime.ENCODED_POSITION)
+
+def collect_references(window, word):
+  key = fold(word)
+  workspace = workspace_for_window(window)
+  results = []
+  live = set()
+  for view in window.views():
+    if GScriptLspListener.for_view(view) is None:
+      continue
+    path = view.file_name()
+    if path and not view.is_dirty() and workspace is not None and workspace.contains(path):
+      continue
+    if path:
+      live.add(path)
+    positions = extract_references(view.substr(sublime.Region(0, view.size()))).get(key, ())
+    for i in range(0, len(positions), 2):
+      results.append((path, view, positions[i], positions[i + 1]))
+  if workspace is not None:
+    for path, line, col in workspace.find_references(word):
+      if path not in live:
+        results.append((path, None, line, col))
+  return results
+
+def _reference_label(window, path, view):
+  if path is None:
+    return view.name() or "untitled"
+  for folder in window.folders():
+    if path.startswith(folder.rstrip(os.sep) + os.sep):
+      return os.path.relpath(path, folder)
+  return path
+
+def _open_reference(window, reference, flags=0):
+  path, view, line, col = reference
+  if view is not None and view.is_valid():
+    window.focus_view(view)
+    pt = view.text_point(line, col)
+    view.sel().clear()
+    view.sel().add(sublime.Region(pt))
+    view.show_at_center(pt)
+    return
+  window.open_file("{0}:{1}:{2}".format(path, line + 1, col + 1), sublime.ENCODED_POSITION | flags)
+
+def _reference_word(view):
+  word = _word_at(view, view.sel()[0].begin())
+  if not is_reference_name(word):
+    sublime.status_message("Place the caret on a function name or $variable")
+    return None
+  return word
+
+class RcFindReferencesCommand(sublime_plugin.TextCommand):
+  @timed('rc_find_references')
+  def run(self, edit):
+    word = _reference_word(self.view)
+    window = self.view.window()
+    if word is None or window is None:
+      return
+    references = collect_references(window, word)
+    if not references:
+      sublime.status_message("No references found for '{0}'".format(word))
+      return
+    items = [[_reference_label(window, path, view), "line {0}, column {1}".format(line + 1, col + 1)]
+      for path, view, line, col in references]
+    def on_select(i):
+      if i >= 0:
+        _open_reference(window, references[i])
+    def on_highlight(i):
+      _open_reference(window, references[i], sublime.TRANSIENT)
+    window.show_quick_panel(items, on_select, 0, 0, on_highlight)
+    sublime.status_message("{0} references to '{1}'".format(len(references), word))
+
+class RcRenameSymbolCommand(sublime_plugin.TextCommand):
+  @timed('rc_rename_symbol')
+  def run(self, edit):
+    word = _reference_word(self.view)
+    window = self.view.window()
+    if word is None or window is None:
+      return
+    window.show_input_panel("Rename '{0}' to:".format(word), word, lambda name: self.rename(window, word, name.strip()), None, None)
+
+  @timed('rc_rename_symbol.apply')
+  def rename(self, window, old, new):
+    if new == old:
+      return
+    if not is_reference_name(new) or new.startswith('$') != old.startswith('$'):
+      sublime.status_message("'{0}' is not a valid name".format(new))
+      return
+    targets = OrderedDict()
+    for path, view, line, col in collect_references(window, old):
+      targets.setdefault((path, view), []).append((line, col))
+    replaced = 0
+    files = 0
+    changed = []
+    failed = []
+    for (path, view), positions in targets.items():
+      if view is None:
+        view = window.find_open_file(path)
+      if view is not None:
+        points = [view.text_point(line, col) for line, col in positions]
+        points = [pt for pt in points if _is_reference_at(view, pt, old)]
+        if points:
+          view.run_command("rc_replace_references", {"points": points, "size": len(old), "characters": new})
+          replaced += len(points)
+          files += 1
+        continue
+      try:
+        with open(path, 'rb') as f:
+          text = f.read().decode('utf-8')
+        text, count = rename_in_text(text, offsets_for(text, positions), old, new)
+        if count:
+          write_atomic(path, text.encode('utf-8'))
+          changed.append(path)
+          replaced += count
+          files += 1
+      except (OSError, UnicodeDecodeError) as e:
+        failed.append(path)
+        print("[SublimeRC] Rename skipped {0}: {1}".format(path, e))
+    workspace = workspace_for_window(window)
+    if workspace is not None and changed:
+      threading.Thread(target=workspace.update_files, args=(changed,), daemon=True).start()
+    message = "Renamed {0} references to '{1}' in {2} files".format(replaced, new, files)
+    if failed:
+      message += " ({0} files skipped, see console)".format(len(failed))
+    sublime.status_message(message)
+
+def _is_reference_at(view, pt, name):
+  if fold(view.substr(sublime.Region(pt, pt + len(name)))) != fold(name):
+    return False
+  following = view.substr(pt + len(name))
+  return not following or not (following.isalnum() or following in '_:')
+
+class RcReplaceReferencesCommand(sublime_plugin.TextCommand):
+  @timed('rc_replace_references')
+  def run(self, edit, points, size, characters):
+    for pt in sorted(points, reverse=True):
+      self.view.replace(edit, sublime.Region(pt, pt + size), characters)
+
+_DEFINITIONS_URL = "https://api.gscript.dev"
+_update_lock = threading.Lock()
+
+def download_definitions(quiet=False):
+  if not _update_lock.acquire(False):
+    if not quiet:
+      sublime.set_timeout(lambda: sublime.status_message("LSP definitions update already running"), 0)
+    return
+  try:
+    settings = sublime.load_settings("SublimeRC.sublime-settings")
+    url = (settings.get("definitions_update_url") or _DEFINITIONS_URL).strip()
+    json_path = GScriptLspListener.api_definitions_path()
+    print("[LSP UPDATE] Checking {0}".format(url))
+    definitions, size = update_definitions(url, json_path)
+    if definitions is None:
+      print("[LSP UPDATE] Definitions not modified")
+      if not quiet:
+        sublime.set_timeout(lambda: sublime.status_message("LSP definitions are already up to date"), 0)
+      return
+    print("[LSP UPDATE] Downloaded {0} bytes, saved to: {1}".format(size, json_path))
+    client = language_client()
+    if not write_bundle(bundle_path_for(json_path), definitions):
+      print("[LSP UPDATE] Bundle is in use; it will be rebuilt on next start")
+    if client is None:
+      layer = _upstream_layer(json_path)
+      layer.refresh(_log_layers, force=True)
+      GScriptLspListener.install_api_layer(layer)
+    else:
+      client.notify('gscript/reloadDefinitions', {'definitionsPath': json_path})
+    sublime.set_timeout(lambda: sublime.status_message("LSP definitions updated successfully! {0} definitions loaded".format(len(definitions))), 0)
+  except Exception as e:
+    print("[LSP UPDATE] Error: {0}".format(str(e)))
+    import traceback
+    traceback.print_exc()
+    err_str = str(e)
+    if '403' in err_str or 'Forbidden' in err_str:
+      msg = "Access denied (403). API may require auth or changed."
+    else:
+      msg = err_str
+    if not quiet:
+      sublime.set_timeout(lambda: sublime.status_message("LSP update failed: {0}".format(msg)), 0)
+  finally:
+    _update_lock.release()
+
+def _schedule_definitions_check(delay=30000):
+  def check():
+    settings = sublime.load_settings("SublimeRC.sublime-settings")
+    try:
+      hours = float(settings.get("definitions_update_interval_hours", 0))
+    except (TypeError, ValueError):
+      hours = 0
+    if hours <= 0:
+      return
+    checked_at = load_meta(GScriptLspListener.api_definitions_path()).get('checked_at', 0)
+    if time.time() - checked_at >= hours * 3600:
+      threading.Thread(target=download_definitions, args=(True,), daemon=True).start()
+    _schedule_definitions_check(int(min(hours * 3600, 3600) * 1000))
+  sublime.set_timeout_async(check, delay)
+
 class RcUpdateLspDefinitionsCommand(sublime_plugin.WindowCommand):
+  @timed('rc_update_lsp_definitions')
   def run(self):
     print("[LSP UPDATE] Starting LSP definitions update...")
     sublime.status_message("Downloading LSP definitions...")
-    threading.Thread(target=self.download_definitions).start()
-
-  def download_definitions(self):
-    try:
-      import urllib.request
-      url = "https://api.gscript.dev".strip()
-      req = urllib.request.Request(url, headers={'User-Agent': 'SublimeRC/1.0'})
-      response = urllib.request.urlopen(req, timeout=30)
-      data = response.read()
-      print("[LSP UPDATE] Downloaded {0} bytes".format(len(data)))
-      package_path = sublime.packages_path()
-      json_path = os.path.join(package_path, "SublimeRC", "api_definitions.json")
-      print("[LSP UPDATE] Saving to: {0}".format(json_path))
-      with open(json_path, 'wb') as f:
-        f.write(data)
-      GScriptLspListener.api_definitions = None
-      GScriptLspListener.load_api_definitions()
-      sublime.set_timeout(lambda: sublime.status_message("LSP definitions updated successfully! {0} definitions loaded".format(len(GScriptLspListener.api_definitions))), 0)
-    except Exception as e:
-      print("[LSP UPDATE] Error: {0}".format(str(e)))
-      import traceback
-      traceback.print_exc()
-      err_str = str(e)
-      if '403' in err_str or 'Forbidden' in err_str:
-        msg = "Access denied (403). API may require auth or changed."
-      else:
-        msg = err_str
-      sublime.set_timeout(lambda: sublime.status_message("LSP update failed: {0}".format(msg)), 0)
+    threading.Thread(target=download_definitions).start()
 
 class RcOpenWikiSearchCommand(sublime_plugin.WindowCommand):
+  @timed('rc_open_wiki_search')
   def run(self, name):
     import urllib.parse
     import webbrowser
@@ -796,6 +1895,87 @@ class RcOpenWikiSearchCommand(sublime_plugin.WindowCommand):
       sublime.status_message("Browser error: {0}".format(str(e)[:50]))
       print("[WIKI SEARCH] Error: {0}".format(e))
 
+def performance_report():
+  counters = _stats.counters
+  caches = [
+    ('completion sessions', counters.get('completion.hit', 0) + counters.get('completion.narrowed', 0),
+      counters.get('completion.search', 0), len(GScriptLspListener._instances)),
+    ('popup html', _popup_cache.hits, _popup_cache.misses, len(_popup_cache)),
+    ('highlight', _highlight_cache.hits, _highlight_cache.misses, len(_highlight_cache)),
+    ('popup styler', PopupStyler._hits, PopupStyler._misses, len(PopupStyler._cache)),
+    ('semantic token blocks', sum(state.semantic_tokens.hits for state in list(_buffers.values())),
+      sum(state.semantic_tokens.misses for state in list(_buffers.values())),
+      sum(len(state.semantic_tokens) for state in list(_buffers.values()))),
+    ('diagnostics bodies', counters.get('diagnostics.reused', 0), counters.get('diagnostics.rescanned', 0),
+      sum(len(l._diagnostics._chunks) for l in GScriptLspListener._instances)),
+  ]
+  extra = ["Popup show/update calls: {0} total, {1:.1f}/s over the last {2:.0f} s".format(
+    _popup_rate.total, _popup_rate.rate(), _popup_rate.window)]
+  if counters.get('parse.jobs'):
+    extra.append("Full parses: {0} in {1} slices, {2} large buffer(s) open".format(
+      counters['parse.jobs'], counters.get('parse.slices', 0), sum(1 for state in list(_buffers.values()) if state.large)))
+  layers = [layer for layer in _watched_layers() if layer is not None and layer.loaded]
+  if layers:
+    extra.append("Definition layers: {0}".format(', '.join("{0} {1} (v{2})".format(layer.name, len(layer), layer.version) for layer in layers)))
+  if _lsp_players.directory.source:
+    extra.append("Players: {0} loaded from {1}".format(len(_lsp_players.directory), _lsp_players.directory.source))
+  return format_report(_stats, caches, extra)
+
+class RcShowPerformanceStatsCommand(sublime_plugin.WindowCommand):
+  @timed('rc_show_performance_stats')
+  def run(self, reset=False):
+    report = performance_report()
+    if reset:
+      _stats.reset()
+    panel = self.window.create_output_panel("rc_stats")
+    panel.settings().set("word_wrap", False)
+    panel.run_command("append", {"characters": report, "force": True, "scroll_to_end": False})
+    self.window.run_command("show_panel", {"panel": "output.rc_stats"})
+
+class RcShowDiagnosticsCommand(sublime_plugin.WindowCommand):
+  @timed('rc_show_diagnostics')
+  def run(self):
+    view = self.window.active_view()
+    listener = GScriptLspListener.for_view(view)
+    if listener is None:
+      sublime.status_message("Diagnostics are only available for GScript files")
+      return
+    _show_diagnostics_panel(self.window, view, listener.diagnostics)
+    self.window.run_command("show_panel", {"panel": "output.rc_diagnostics"})
+
+class RcReplaceContentCommand(sublime_plugin.TextCommand):
+  @timed('rc_replace_content')
+  def run(self, edit, characters=""):
+    self.view.set_read_only(False)
+    self.view.replace(edit, sublime.Region(0, self.view.size()), characters)
+    self.view.set_read_only(True)
+
+_player_config = None
+
+def _apply_player_settings():
+  global _player_config
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  path = settings.get("players_path") or None
+  if path:
+    path = os.path.expandvars(os.path.expanduser(path))
+  url = settings.get("players_url") or None
+  interval = settings.get("players_refresh_seconds", 60)
+  if not isinstance(interval, (int, float)) or interval < 0:
+    interval = 60
+  config = (path, url, interval)
+  if config == _player_config:
+    return
+  _player_config = config
+  _lsp_players.directory.configure(path, url, interval, log=lambda message: print("[SublimeRC] " + message))
+
+def _apply_stats_settings():
+  settings = sublime.load_settings("SublimeRC.sublime-settings")
+  _stats.enabled = bool(settings.get("perf_stats_enabled", True))
+  path = settings.get("perf_trace_path") or None
+  if path:
+    path = os.path.expandvars(os.path.expanduser(path))
+  _stats.set_trace(path if _stats.enabled else None)
+
 def _ensure_default_settings():
   settings = sublime.load_settings("SublimeRC.sublime-settings")
   defaults = {
@@ -807,7 +1987,26 @@ def _ensure_default_settings():
     "popup_max_height_compact": 500,
     "completion_max_results_short": 50,
     "completion_max_results_long": 200,
+    "popup_cache_max_bytes": 4194304,
+    "popup_prerender_count": 25,
+    "signature_help_delay_ms": 50,
+    "diagnostics_enabled": True,
+    "semantic_highlighting": True,
+    "diagnostics_delay_ms": 500,
+    "large_file_threshold_bytes": 1048576,
+    "parse_slice_ms": 8,
+    "perf_stats_enabled": True,
+    "perf_trace_path": "",
+    "players_path": "",
+    "players_url": "",
+    "players_refresh_seconds": 60,
+    "user_definitions_path": "",
+    "definitions_watch_seconds": 2,
+    "language_server": False,
+    "language_server_python": "python3",
     "wiki_search_engine": "gscript",
+    "definitions_update_url": _DEFINITIONS_URL,
+    "definitions_update_interval_hours": 0,
   }
   needs_save = False
   for key, default_val in defaults.items():
@@ -821,4 +2020,24 @@ def _ensure_default_settings():
 
 def plugin_loaded():
   _ensure_default_settings()
+  _apply_popup_cache_settings()
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_popup_cache", _apply_popup_cache_settings)
+  _apply_stats_settings()
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_perf_stats", _apply_stats_settings)
+  _apply_language_server_settings()
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_language_server", _apply_language_server_settings)
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_diagnostics", _refresh_diagnostics)
+  _apply_player_settings()
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_players", _apply_player_settings)
+  _apply_definition_layer_settings()
+  sublime.load_settings("SublimeRC.sublime-settings").add_on_change("rc_definition_layers", _apply_definition_layer_settings)
   GScriptLspListener.load_api_definitions()
+  _schedule_definitions_check()
+
+def plugin_unloaded():
+  _stats.set_trace(None)
+  _lsp_players.directory.stop()
+  _layer_watcher.stop()
+  client = _language_client
+  if client is not None:
+    client.shutdown(1.0)
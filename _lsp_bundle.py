@@ -0,0 +1,164 @@
+import json
+import mmap
+import os
+import struct
+
+try:
+  from ._lsp_records import TEXT_FIELDS, compact_definitions, make_definition
+except (ImportError, SystemError, ValueError):
+  from _lsp_records import TEXT_FIELDS, compact_definitions, make_definition
+
+MAGIC = b'GSDB'
+VERSION = 2
+LAZY_FIELDS = TEXT_FIELDS
+_ABSENT = 0xFFFFFFFF
+_HEADER = struct.Struct('<4sIIII')
+_RECORD = struct.Struct('<6I')
+
+def bundle_path_for(json_path):
+  return os.path.splitext(json_path)[0] + '.bundle'
+
+def is_fresh(bundle_path, json_path):
+  try:
+    bundle_mtime = os.path.getmtime(bundle_path)
+  except OSError:
+    return False
+  try:
+    return bundle_mtime >= os.path.getmtime(json_path)
+  except OSError:
+    return True
+
+def build_bundle(definitions):
+  items = sorted(definitions.items(), key=lambda item: (item[0].lower(), item[0]))
+  blob = bytearray()
+  records = []
+  def add(text):
+    if text is None:
+      return 0, _ABSENT
+    data = text.encode('utf-8')
+    offset = len(blob)
+    blob.extend(data)
+    return offset, len(data)
+  for name, info in items:
+    if not isinstance(info, dict):
+      info = {}
+    eager = {}
+    lazy = {}
+    for key, value in info.items():
+      if key in LAZY_FIELDS and isinstance(value, str):
+        lazy[key] = value
+      else:
+        eager[key] = value
+    fields = add(json.dumps(eager, separators=(',', ':')))
+    for key in LAZY_FIELDS:
+      fields += add(lazy.get(key))
+    records.append(_RECORD.pack(*fields))
+  names = '\0'.join(name for name, _ in items).encode('utf-8')
+  names_offset = _HEADER.size + _RECORD.size * len(records)
+  blob_offset = names_offset + len(names)
+  return _HEADER.pack(MAGIC, VERSION, len(records), names_offset, blob_offset) + b''.join(records) + names + bytes(blob)
+
+def write_bundle(path, definitions):
+  temp_path = path + '.tmp'
+  try:
+    with open(temp_path, 'wb') as f:
+      f.write(build_bundle(definitions))
+    os.replace(temp_path, path)
+    return True
+  except OSError:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    return False
+
+def load_definitions(json_path, log=None):
+  bundle_path = bundle_path_for(json_path)
+  if is_fresh(bundle_path, json_path):
+    try:
+      definitions, names = Bundle(bundle_path).load()
+      return definitions, names, 'bundle'
+    except Exception as e:
+      if log:
+        log("Ignoring definitions bundle: {0}".format(e))
+  try:
+    with open(json_path, 'r', encoding='utf-8') as f:
+      definitions = json.load(f)
+  except Exception:
+    definitions = {}
+  if definitions and write_bundle(bundle_path, definitions) and log:
+    log("Wrote definitions bundle: {0}".format(bundle_path))
+  return compact_definitions(definitions), None, 'json'
+
+class BundleEntry(object):
+  __slots__ = ('_bundle', '_index', '_fields')
+
+  def __init__(self, bundle, index):
+    self._bundle = bundle
+    self._index = index
+    self._fields = None
+
+  def _eager(self):
+    fields = self._fields
+    if fields is None:
+      record = self._bundle.record(self._index)
+      fields = make_definition(json.loads(self._bundle.read(record[0], record[1])))
+      fields.texts = self._bundle
+      fields.text_id = self._index
+      self._fields = fields
+    return fields
+
+  def get(self, key, default=None):
+    return self._eager().get(key, default)
+
+  def __getitem__(self, key):
+    return self._eager()[key]
+
+  def __contains__(self, key):
+    return key in self._eager()
+
+  def to_dict(self):
+    return self._eager().to_dict()
+
+class Bundle(object):
+  def __init__(self, path):
+    with open(path, 'rb') as f:
+      self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count, names_offset, blob_offset = _HEADER.unpack_from(self._map, 0)
+    if magic != MAGIC or version != VERSION:
+      self.close()
+      raise ValueError("Unsupported definitions bundle: {0}".format(path))
+    if names_offset != _HEADER.size + _RECORD.size * count or not names_offset <= blob_offset <= len(self._map):
+      self.close()
+      raise ValueError("Corrupt definitions bundle: {0}".format(path))
+    self.count = count
+    self._names_offset = names_offset
+    self._blob_offset = blob_offset
+
+  def record(self, index):
+    return _RECORD.unpack_from(self._map, _HEADER.size + index * _RECORD.size)
+
+  def text(self, index, key):
+    record = self.record(index)
+    slot = 2 + 2 * LAZY_FIELDS.index(key)
+    length = record[slot + 1]
+    return None if length == _ABSENT else self.read(record[slot], length)
+
+  def read(self, offset, length):
+    start = self._blob_offset + offset
+    return self._map[start:start + length].decode('utf-8')
+
+  def load(self):
+    if not self.count:
+      return {}, []
+    names = self._map[self._names_offset:self._blob_offset].decode('utf-8').split('\0')
+    if len(names) != self.count:
+      raise ValueError("Corrupt definitions bundle names")
+    definitions = dict((name, BundleEntry(self, i)) for i, name in enumerate(names))
+    return definitions, names
+
+  def close(self):
+    try:
+      self._map.close()
+    except (BufferError, ValueError):
+      pass
@@ -0,0 +1,58 @@
+import sys
+import threading
+from collections import OrderedDict
+
+class LRUCache(object):
+  def __init__(self, max_bytes, sizeof=sys.getsizeof):
+    self.max_bytes = max_bytes
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self._sizeof = sizeof
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def get(self, key, default=None):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        self.misses += 1
+        return default
+      self._entries.move_to_end(key)
+      self.hits += 1
+      return entry[0]
+
+  def put(self, key, value, size=None):
+    if size is None:
+      size = self._sizeof(value)
+    with self._lock:
+      old = self._entries.pop(key, None)
+      if old is not None:
+        self.total_bytes -= old[1]
+      if size > self.max_bytes:
+        return
+      self._entries[key] = (value, size)
+      self.total_bytes += size
+      self._evict()
+
+  def resize(self, max_bytes):
+    with self._lock:
+      self.max_bytes = max_bytes
+      self._evict()
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.total_bytes = 0
+
+  def _evict(self):
+    entries = self._entries
+    while self.total_bytes > self.max_bytes and entries:
+      _, (_, size) = entries.popitem(last=False)
+      self.total_bytes -= size
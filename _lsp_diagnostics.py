@@ -0,0 +1,151 @@
+import re
+
+try:
+  from ._lsp_signature import NOT_CALLS, code_spans
+except (ImportError, SystemError, ValueError):
+  from _lsp_signature import NOT_CALLS, code_spans
+
+ERROR = 'error'
+WARNING = 'warning'
+
+SKIP_CALLEES = NOT_CALLS | frozenset(('case', 'else', 'do', 'break', 'continue', 'datablock', 'public', 'private',
+  'const', 'enum', 'true', 'false', 'null', 'nil'))
+SKIP_AFTER = frozenset(('function', 'new', 'datablock'))
+
+_CALL = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*(?=\s*\()')
+_STRUCTURE = re.compile(r'[()\[\]{},]')
+_PREVIOUS_WORD = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*$')
+_OPENERS = {')': '(', ']': '[', '}': '{'}
+_arities = {}
+
+def _argument_counts(code, spans):
+  counts = {}
+  stack = []
+  for start, end in spans:
+    for match in _STRUCTURE.finditer(code, start, end):
+      ch = match.group()
+      pos = match.start()
+      if ch in '([{':
+        stack.append([ch, pos, 0])
+      elif ch == ',':
+        if stack:
+          stack[-1][2] += 1
+      else:
+        opener = _OPENERS[ch]
+        while stack and stack[-1][0] != opener:
+          stack.pop()
+        if not stack:
+          continue
+        _, open_pos, commas = stack.pop()
+        if opener == '(':
+          counts[open_pos] = commas + 1 if commas or code[open_pos + 1:pos].strip() else 0
+  return counts
+
+def _skipped(code, start):
+  before = code[max(0, start - 16):start].rstrip()
+  if before.endswith(('.', '$', '::')):
+    return True
+  match = _PREVIOUS_WORD.search(before)
+  return match is not None and match.group(1) in SKIP_AFTER
+
+def scan_calls(code):
+  spans = code_spans(code)
+  counts = _argument_counts(code, spans)
+  calls = []
+  for start, end in spans:
+    for match in _CALL.finditer(code, start, end):
+      name = match.group()
+      if name in SKIP_CALLEES or _skipped(code, match.start()):
+        continue
+      paren = code.find('(', match.end())
+      calls.append((match.start(), match.end(), name, counts.get(paren)))
+  return calls
+
+def arity(params, custom=False):
+  maximum = 0
+  minimum = 0
+  for param in params:
+    param = param.strip()
+    if '...' in param:
+      return minimum, None
+    maximum += 1
+    if not (param.startswith('[') or '=' in param or param.lower().startswith('optional')):
+      minimum = maximum
+  return (0 if custom else minimum), maximum
+
+def check_call(lookup, name, argc, check_unknown=True):
+  hit = lookup(name)
+  if hit is None:
+    if check_unknown:
+      return WARNING, "Unknown function '{0}'".format(name)
+    return None
+  found, info = hit
+  if argc is None or info is None:
+    return None
+  params = info.get('params')
+  if not isinstance(params, (list, tuple)):
+    return None
+  custom = bool(info.get('is_custom', False))
+  if isinstance(params, tuple):
+    bounds = _arities.get((params, custom))
+    if bounds is None:
+      if len(_arities) > 4096:
+        _arities.clear()
+      bounds = _arities[params, custom] = arity(params, custom)
+    minimum, maximum = bounds
+  else:
+    minimum, maximum = arity(params, custom)
+  if maximum is not None and argc > maximum:
+    return ERROR, "'{0}' takes at most {1} argument{2}, got {3}".format(found, maximum, '' if maximum == 1 else 's', argc)
+  if argc < minimum:
+    return ERROR, "'{0}' needs at least {1} argument{2}, got {3}".format(found, minimum, '' if minimum == 1 else 's', argc)
+  return None
+
+def chunk_bounds(text, matches):
+  bounds = []
+  previous = 0
+  for match in matches:
+    if match[0] > previous:
+      bounds.append((previous, match[0]))
+    previous = match[0]
+  bounds.append((previous, len(text)))
+  return bounds
+
+class DiagnosticsCache(object):
+  __slots__ = ('_chunks', 'key', 'rescanned', 'reused')
+
+  def __init__(self):
+    self._chunks = {}
+    self.key = None
+    self.rescanned = 0
+    self.reused = 0
+
+  def check(self, text, matches, lookup, key, check_unknown=True):
+    if key != self.key:
+      self._chunks = dict((body, (calls, None)) for body, (calls, _) in self._chunks.items())
+      self.key = key
+    previous = self._chunks
+    chunks = {}
+    results = []
+    self.rescanned = self.reused = 0
+    for start, end in chunk_bounds(text, matches):
+      body = text[start:end]
+      entry = chunks.get(body) or previous.get(body)
+      if entry is None:
+        entry = (scan_calls(body), None)
+        self.rescanned += 1
+      else:
+        self.reused += 1
+      calls, found = entry
+      if found is None:
+        found = []
+        for call_start, call_end, name, argc in calls:
+          problem = check_call(lookup, name, argc, check_unknown)
+          if problem is not None:
+            found.append((call_start, call_end, problem[0], problem[1]))
+        entry = (calls, found)
+      chunks[body] = entry
+      for call_start, call_end, severity, message in found:
+        results.append((start + call_start, start + call_end, severity, message))
+    self._chunks = chunks
+    return results
@@ -0,0 +1,246 @@
+import bisect
+import re
+import sys
+import time
+
+try:
+  from ._lsp_records import Definition, FixedText
+except (ImportError, SystemError, ValueError):
+  from _lsp_records import Definition, FixedText
+
+FUNC_PATTERN = re.compile(r'(?:public\s+|private\s+)?function\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^)]*)\)')
+CLIENTSIDE_MARKER = '//#CLIENTSIDE'
+USER_FUNCTION_DESCRIPTION = 'User-defined function in current script'
+USER_FUNCTION_TEXTS = FixedText(USER_FUNCTION_DESCRIPTION)
+SLICE_CHARS = 16384
+SLICE_MATCHES = 512
+
+def line_starts_for(text):
+  starts = [0]
+  find = text.find
+  pos = find('\n')
+  while pos != -1:
+    starts.append(pos + 1)
+    pos = find('\n', pos + 1)
+  return starts
+
+def _match_tuple(match):
+  return (match.start(), match.end(), match.group(1), match.group(2))
+
+def _function_info(start, func_name, params_str, marker, starts):
+  params_str = params_str.strip()
+  params = tuple(sys.intern(p.strip()) for p in params_str.split(',') if p.strip()) if params_str else ()
+  func_scope = 'clientside' if (marker != -1 and start > marker) else ('serverside' if marker != -1 else 'document')
+  return Definition(params, 'void', func_scope, True, bisect.bisect_right(starts, start) - 1, None, USER_FUNCTION_TEXTS)
+
+def _same_functions(previous, functions):
+  if previous.keys() != functions.keys():
+    return False
+  for name, info in functions.items():
+    old = previous[name]
+    if old.params != info.params or old.scope != info.scope or old.line != info.line:
+      return False
+  return True
+
+class ParseJob(object):
+  __slots__ = ('text', 'line_starts', 'matches', 'clientside_marker', 'functions', 'slices', '_phase', '_pos')
+
+  def __init__(self, text):
+    self.text = text
+    self.line_starts = [0]
+    self.matches = []
+    self.clientside_marker = text.find(CLIENTSIDE_MARKER)
+    self.functions = {}
+    self.slices = 0
+    self._phase = 0
+    self._pos = 0
+
+  @property
+  def done(self):
+    return self._phase == 3
+
+  def progress(self):
+    if self._phase == 3:
+      return 100
+    total = len(self.matches) if self._phase == 2 else len(self.text)
+    return int((self._phase + float(self._pos) / max(1, total)) * 100 / 3)
+
+  def step(self, budget=None):
+    if self._phase == 3:
+      return True
+    deadline = None if budget is None else time.perf_counter() + budget
+    self.slices += 1
+    steps = (self._scan_lines, self._scan_matches, self._scan_functions)
+    while self._phase < 3:
+      if steps[self._phase]():
+        self._phase += 1
+        self._pos = 0
+      if deadline is not None and time.perf_counter() >= deadline:
+        break
+    return self._phase == 3
+
+  def _scan_lines(self):
+    text = self.text
+    end = min(len(text), self._pos + SLICE_CHARS)
+    starts = self.line_starts
+    find = text.find
+    pos = find('\n', self._pos, end)
+    while pos != -1:
+      starts.append(pos + 1)
+      pos = find('\n', pos + 1, end)
+    self._pos = end
+    return end >= len(text)
+
+  def _scan_matches(self):
+    text = self.text
+    end = text.find(')', self._pos + SLICE_CHARS) + 1 or len(text)
+    self.matches.extend(_match_tuple(m) for m in FUNC_PATTERN.finditer(text, self._pos, end))
+    self._pos = end
+    return end >= len(text)
+
+  def _scan_functions(self):
+    matches = self.matches
+    end = min(len(matches), self._pos + SLICE_MATCHES)
+    marker = self.clientside_marker
+    starts = self.line_starts
+    functions = self.functions
+    for start, _, func_name, params_str in matches[self._pos:end]:
+      functions[func_name] = _function_info(start, func_name, params_str, marker, starts)
+    self._pos = end
+    return end >= len(matches)
+
+class DocumentParse(object):
+  __slots__ = ('text', 'line_starts', 'matches', 'clientside_marker', 'functions', 'generation')
+
+  def __init__(self, text=''):
+    self.generation = 0
+    self.functions = None
+    self.reset(text)
+
+  def reset(self, text):
+    job = ParseJob(text)
+    job.step()
+    self.install(job)
+
+  def install(self, job):
+    self.text = job.text
+    self.line_starts = job.line_starts
+    self.matches = job.matches
+    self.clientside_marker = job.clientside_marker
+    self._set_functions(job.functions)
+
+  def line_for(self, pt):
+    return bisect.bisect_right(self.line_starts, pt) - 1
+
+  def position_matches(self, pt, row, col):
+    if pt < 0 or pt > len(self.text) or row >= len(self.line_starts):
+      return False
+    return self.line_for(pt) == row and pt - self.line_starts[row] == col
+
+  def apply_changes(self, changes):
+    rebuild = False
+    for change in changes:
+      a, b, inserted = change[:3]
+      if len(change) > 3 and not (self.position_matches(a, change[3], change[4]) and self.position_matches(b, change[5], change[6])):
+        return False
+      rebuild = self._apply_change(a, b, inserted) or rebuild
+    if rebuild:
+      self._build_functions()
+    return True
+
+  def _apply_change(self, a, b, inserted):
+    delta = len(inserted) - (b - a)
+    row = self.line_for(a)
+    marker = self.clientside_marker
+    self.text = self.text[:a] + inserted + self.text[b:]
+    lines_delta = self._update_line_starts(a, b, inserted, delta)
+    headers_changed = self._update_matches(a, b, len(inserted), delta)
+    self._update_clientside_marker(a)
+    if headers_changed or self.clientside_marker != (marker + delta if marker >= b else marker):
+      return True
+    return lines_delta != 0 and not self._shift_lines(row, lines_delta)
+
+  def _shift_lines(self, row, lines_delta):
+    if self.functions is None:
+      return False
+    for info in self.functions.values():
+      line = info.line
+      if line == row:
+        return False
+      if line > row:
+        info.line = line + lines_delta
+    return True
+
+  def _update_line_starts(self, a, b, inserted, delta):
+    starts = self.line_starts
+    i = bisect.bisect_right(starts, a)
+    j = bisect.bisect_right(starts, b)
+    added = []
+    pos = inserted.find('\n')
+    while pos != -1:
+      added.append(a + pos + 1)
+      pos = inserted.find('\n', pos + 1)
+    tail = starts[j:]
+    if delta:
+      tail = [s + delta for s in tail]
+    starts[i:] = added + tail
+    return len(added) - (j - i)
+
+  def _update_matches(self, a, b, inserted_len, delta):
+    matches = self.matches
+    keep = bisect.bisect_left(matches, (a,))
+    if keep and matches[keep - 1][1] > a:
+      keep -= 1
+    tail_start = keep
+    while tail_start < len(matches) and matches[tail_start][0] < b:
+      tail_start += 1
+    tail = matches[tail_start:]
+    edit_end = a + inserted_len
+    scan_from = matches[keep - 1][1] if keep else 0
+    rescanned = []
+    resync = None
+    index = 0
+    for match in FUNC_PATTERN.finditer(self.text, scan_from):
+      start = match.start()
+      if start >= edit_end:
+        while index < len(tail) and tail[index][0] + delta < start:
+          index += 1
+        if index < len(tail) and tail[index][0] + delta == start and tail[index][1] + delta == match.end():
+          resync = index
+          break
+      rescanned.append(_match_tuple(match))
+    if resync is None:
+      replaced = matches[keep:]
+      tail = []
+    else:
+      replaced = matches[keep:tail_start + resync]
+      tail = tail[resync:]
+      if delta:
+        tail = [(s + delta, e + delta, name, params) for s, e, name, params in tail]
+    matches[keep:] = rescanned + tail
+    if len(replaced) != len(rescanned):
+      return True
+    for old, new in zip(replaced, rescanned):
+      if a <= old[0] < b or old[2:] != new[2:] or (old[0] + delta if old[0] >= b else old[0]) != new[0]:
+        return True
+    return False
+
+  def _update_clientside_marker(self, a):
+    marker = self.clientside_marker
+    if marker != -1 and marker + len(CLIENTSIDE_MARKER) <= a:
+      return
+    self.clientside_marker = self.text.find(CLIENTSIDE_MARKER, max(0, a - len(CLIENTSIDE_MARKER) + 1))
+
+  def _build_functions(self):
+    marker = self.clientside_marker
+    starts = self.line_starts
+    functions = {}
+    for start, end, func_name, params_str in self.matches:
+      functions[func_name] = _function_info(start, func_name, params_str, marker, starts)
+    self._set_functions(functions)
+
+  def _set_functions(self, functions):
+    previous = self.functions
+    self.functions = functions
+    if previous is None or not _same_functions(previous, functions):
+      self.generation += 1
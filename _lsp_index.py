@@ -0,0 +1,367 @@
+import bisect
+import heapq
+import re
+
+_MASK_BITS = dict((ch, 1 << i) for i, ch in enumerate('abcdefghijklmnopqrstuvwxyz0123456789_:.$'))
+_SEPARATORS = '_:.$'
+
+def fold(name):
+  return name.lower()
+
+def char_mask(key):
+  mask = 0
+  bits = _MASK_BITS
+  for ch in set(key):
+    mask |= bits.get(ch, 0)
+  return mask
+
+def _subsequence_pattern(query):
+  return re.compile('.*?'.join(re.escape(ch) for ch in query))
+
+def _is_boundary(name, i):
+  if i == 0:
+    return True
+  prev = name[i - 1]
+  ch = name[i]
+  return prev in _SEPARATORS or (ch.isupper() and prev.islower()) or (ch.isdigit() and not prev.isdigit())
+
+_ASCII_BOUNDARY = re.compile(r'^.|(?<=[_:.$]).|(?<=[a-z])[A-Z]|(?<![0-9])[0-9]', re.S)
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+def _boundary_chars(name):
+  if _NON_ASCII.search(name) is None:
+    return _ASCII_BOUNDARY.findall(name)
+  return [name[i] for i in range(len(name)) if _is_boundary(name, i)]
+
+_MULTI_SHIFT = 6 + len(_MASK_BITS)
+
+def _starts_info(name):
+  chars = fold(''.join(_boundary_chars(name)))
+  mask = 0
+  multi = 0
+  bits = _MASK_BITS
+  for ch in chars:
+    bit = bits.get(ch, 0)
+    if mask & bit:
+      multi |= bit
+    mask |= bit
+  return (multi << _MULTI_SHIFT) | (mask << 6) | min(len(chars), 63)
+
+def _boundary_budget(query):
+  counts = dict((ch, query.count(ch)) for ch in set(query))
+  bits = char_mask(query) << 6
+  repeated = char_mask([ch for ch, count in counts.items() if count > 1]) << _MULTI_SHIFT
+  spare = sum(count - 2 for count in counts.values() if count > 2) + sum(1 for ch in query if ch not in _MASK_BITS)
+  return bits | repeated, spare
+
+def _match_positions(query, name, key, boundaries_first):
+  positions = []
+  pos = 0
+  for ch in query:
+    found = -1
+    if boundaries_first:
+      probe = key.find(ch, pos)
+      while probe != -1 and not _is_boundary(name, probe):
+        probe = key.find(ch, probe + 1)
+      found = probe
+    if found == -1:
+      found = key.find(ch, pos)
+      if found == -1:
+        return None
+    positions.append(found)
+    pos = found + 1
+  return positions
+
+def fuzzy_score(query, name):
+  key = fold(name)
+  if key.startswith(query):
+    return 1000 - len(key)
+  positions = _match_positions(query, name, key, True) or _match_positions(query, name, key, False)
+  if positions is None:
+    return None
+  score = 0
+  prev = -2
+  for p in positions:
+    if _is_boundary(name, p):
+      score += 8
+    if p == prev + 1:
+      score += 5
+    prev = p
+  score -= positions[0]
+  score -= positions[-1] - positions[0] + 1 - len(query)
+  score -= len(key) // 4
+  return score
+
+def _prefix_upper_bound(prefix):
+  last = ord(prefix[-1])
+  if last >= 0x10FFFF:
+    return None
+  return prefix[:-1] + chr(last + 1)
+
+def annotation_for(info):
+  scope = info.get('scope', '')
+  is_custom = info.get('is_custom', False)
+  if not (is_custom or scope):
+    return ''
+  if scope == 'document' or is_custom:
+    return 'USER'
+  if scope == 'global':
+    return 'GLOBAL'
+  if 'client' in scope.lower():
+    return 'CLIENTSIDE'
+  if 'server' in scope.lower():
+    return 'SERVERSIDE'
+  return 'UNDEFINED'
+
+class SymbolIndex(object):
+  __slots__ = ('definitions', '_keys', '_names', '_by_key', '_masks', '_starts', '_columns')
+
+  def __init__(self, definitions=None, sorted_names=None):
+    self.definitions = definitions if definitions is not None else {}
+    if sorted_names is None:
+      pairs = sorted((fold(name), name) for name in self.definitions)
+    else:
+      pairs = [(fold(name), name) for name in sorted_names]
+    self._keys = [key for key, _ in pairs]
+    self._names = [name for _, name in pairs]
+    by_key = {}
+    for key, name in pairs:
+      if key not in by_key:
+        by_key[key] = name
+    self._by_key = by_key
+    self._masks = None
+    self._starts = None
+    self._columns = None
+
+  def __len__(self):
+    return len(self._keys)
+
+  def name_at(self, i):
+    return self._names[i]
+
+  def _ensure_masks(self):
+    masks = self._masks
+    if masks is None:
+      masks = self._masks = [char_mask(key) for key in self._keys]
+    return masks
+
+  def _ensure_starts(self):
+    starts = self._starts
+    if starts is None:
+      starts = self._starts = [None] * len(self._names)
+    return starts
+
+  def _ensure_columns(self):
+    columns = self._columns
+    if columns is None:
+      masks = self._ensure_masks()
+      columns = {}
+      for ch, bit in _MASK_BITS.items():
+        columns[ch] = int(''.join(['1' if mask & bit else '0' for mask in reversed(masks)]) or '0', 2)
+      self._columns = columns
+    return columns
+
+  def prepare_fuzzy(self):
+    self._ensure_columns()
+
+  def _mask_candidates(self, query):
+    columns = self._ensure_columns()
+    selected = None
+    for ch in set(query):
+      column = columns.get(ch)
+      if column is not None:
+        selected = column if selected is None else selected & column
+    if selected is None:
+      return range(len(self._keys))
+    bits = bin(selected)
+    top = len(bits) - 1
+    indices = []
+    pos = bits.find('1', 2)
+    while pos != -1:
+      indices.append(top - pos)
+      pos = bits.find('1', pos + 1)
+    indices.reverse()
+    return indices
+
+  def fuzzy_matches(self, query, candidates=None):
+    keys = self._keys
+    if candidates is None:
+      candidates = self._mask_candidates(query)
+    else:
+      qmask = char_mask(query)
+      masks = self._ensure_masks()
+      candidates = [i for i in candidates if masks[i] & qmask == qmask]
+    names = self._names
+    starts = self._ensure_starts()
+    search = _subsequence_pattern(query).search
+    extra = len(query)
+    bonus = 6 * extra - 5
+    qbits, spare = _boundary_budget(query)
+    bounds = []
+    found = []
+    for i in candidates:
+      key = keys[i]
+      m = search(key)
+      if m is None:
+        continue
+      start, end = m.span()
+      if start == 0 and end == extra:
+        bounds.append(1000 - len(key))
+      else:
+        info = starts[i]
+        if info is None:
+          info = starts[i] = _starts_info(names[i])
+        bounds.append(bonus + 8 * min(extra, info & 63, bin(info & qbits).count('1') + spare) - end - len(key) // 4)
+      found.append(i)
+    return bounds, found
+
+  def bound_refiner(self, query):
+    keys = self._keys
+    bigrams = [query[j:j + 2] for j in range(len(query) - 1)]
+    def refine(i, bound):
+      key = keys[i]
+      if bound >= 1000 - len(key):
+        return bound
+      for bigram in bigrams:
+        if bigram not in key:
+          bound -= 5
+      return bound
+    return refine
+
+  def name_for_key(self, key):
+    return self._by_key.get(key)
+
+  def get(self, word, default=None):
+    name = self._by_key.get(fold(word))
+    if name is None:
+      return default
+    return self.definitions[name]
+
+  def prefix_range(self, prefix):
+    keys = self._keys
+    if not prefix:
+      return 0, len(keys)
+    lo = bisect.bisect_left(keys, prefix)
+    upper = _prefix_upper_bound(prefix)
+    hi = len(keys) if upper is None else bisect.bisect_left(keys, upper, lo)
+    return lo, hi
+
+  def iter_prefix(self, prefix, limit=None):
+    lo, hi = self.prefix_range(fold(prefix))
+    if limit is not None:
+      hi = min(hi, lo + max(0, limit))
+    names = self._names
+    definitions = self.definitions
+    for i in range(lo, hi):
+      name = names[i]
+      yield name, definitions[name]
+
+class SymbolTable(object):
+  __slots__ = ('layers',)
+
+  def __init__(self, layers):
+    self.layers = tuple(layers)
+
+  def lookup(self, word):
+    key = fold(word)
+    for layer in self.layers:
+      name = layer.name_for_key(key)
+      if name is not None:
+        return name, layer.definitions[name]
+    return None
+
+  def get(self, word, default=None):
+    hit = self.lookup(word)
+    return default if hit is None else hit[1]
+
+  def iter_prefix(self, prefix, limit=None):
+    remaining = limit
+    for i, layer in enumerate(self.layers):
+      if remaining is not None and remaining <= 0:
+        return
+      higher = self.layers[:i]
+      for name, info in layer.iter_prefix(prefix):
+        if remaining is not None and remaining <= 0:
+          return
+        key = fold(name)
+        if any(other.name_for_key(key) is not None for other in higher):
+          continue
+        if remaining is not None:
+          remaining -= 1
+        yield name, info
+
+  def fuzzy(self, prefix, limit):
+    return self.fuzzy_search(fold(prefix), limit)[0]
+
+  def fuzzy_search(self, query, limit, candidates=None):
+    if len(query) < 2:
+      return list(self.iter_prefix(query, limit)), None
+    pool = []
+    order = 0
+    matched = []
+    for layer_no, layer in enumerate(self.layers):
+      higher = self.layers[:layer_no]
+      refine = layer.bound_refiner(query)
+      bounds, found = layer.fuzzy_matches(query, None if candidates is None else candidates[layer_no])
+      for p in sorted(range(len(found)), key=bounds.__getitem__, reverse=True):
+        bound = bounds[p]
+        i = found[p]
+        rank = -(order + p)
+        if len(pool) >= limit:
+          if not pool:
+            break
+          floor = pool[0]
+          if bound < floor[0]:
+            break
+          if (bound, -layer_no, rank) < floor[:3] or (refine(i, bound), -layer_no, rank) < floor[:3]:
+            continue
+        name = layer.name_at(i)
+        if higher:
+          key = fold(name)
+          if any(other.name_for_key(key) is not None for other in higher):
+            continue
+        score = fuzzy_score(query, name)
+        if score is None:
+          continue
+        entry = (score, -layer_no, rank, name, layer)
+        if len(pool) < limit:
+          heapq.heappush(pool, entry)
+        elif entry[:3] > pool[0][:3]:
+          heapq.heapreplace(pool, entry)
+      order += len(found)
+      matched.append(found)
+    return [(name, layer.definitions[name]) for _, _, _, name, layer in sorted(pool, reverse=True)], matched
+
+class CompletionSession(object):
+  __slots__ = ('key', 'query', 'limit', 'candidates', 'results', 'outcome')
+
+  def __init__(self):
+    self.outcome = None
+    self.reset(None)
+
+  def reset(self, key):
+    self.key = key
+    self.query = None
+    self.limit = None
+    self.candidates = None
+    self.results = None
+
+  def complete(self, table, key, prefix, limit):
+    query = fold(prefix)
+    key = (key, table.layers)
+    if key != self.key:
+      self.reset(key)
+    elif query == self.query and limit == self.limit:
+      self.outcome = 'hit'
+      return self.results
+    candidates = None
+    self.outcome = 'search'
+    if self.candidates is not None and query.startswith(self.query):
+      candidates = self.candidates
+      self.outcome = 'narrowed'
+    results, matched = table.fuzzy_search(query, limit, candidates)
+    self.query = query
+    self.limit = limit
+    self.candidates = matched
+    self.results = results
+    return results
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+
+try:
+  from ._lsp_bundle import bundle_path_for, load_definitions
+  from ._lsp_index import SymbolIndex
+  from ._lsp_records import compact_definitions
+except (ImportError, SystemError, ValueError):
+  from _lsp_bundle import bundle_path_for, load_definitions
+  from _lsp_index import SymbolIndex
+  from _lsp_records import compact_definitions
+
+def _stat_stamp(path):
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return (stat.st_mtime, stat.st_size)
+
+def load_layer_file(path):
+  with open(path, 'r', encoding='utf-8') as f:
+    definitions = json.load(f)
+  if not isinstance(definitions, dict):
+    raise ValueError("expected an object mapping names to definitions")
+  return compact_definitions(definitions)
+
+def resolve_layer_path(path, base=None):
+  if not path:
+    return None
+  path = os.path.expanduser(os.path.expandvars(path))
+  if base and not os.path.isabs(path):
+    path = os.path.join(base, path)
+  return os.path.normpath(path)
+
+class DefinitionLayer(object):
+  __slots__ = ('name', 'path', 'bundled', 'index', 'version', 'source', 'loaded', '_stamp', '_lock')
+
+  def __init__(self, name, path, bundled=False):
+    self.name = name
+    self.path = path
+    self.bundled = bundled
+    self.index = SymbolIndex()
+    self.version = 0
+    self.source = None
+    self.loaded = False
+    self._stamp = None
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.index)
+
+  @property
+  def definitions(self):
+    return self.index.definitions
+
+  def stamp(self):
+    stamp = _stat_stamp(self.path)
+    if self.bundled:
+      return (stamp, _stat_stamp(bundle_path_for(self.path)))
+    return stamp
+
+  def refresh(self, log=None, force=False):
+    with self._lock:
+      stamp = self.stamp()
+      if self.loaded and stamp == self._stamp and not force:
+        return False
+      self.loaded = True
+      try:
+        if self.bundled:
+          definitions, names, source = load_definitions(self.path, log)
+        elif stamp is None:
+          definitions, names, source = {}, None, None
+        else:
+          definitions, names, source = load_layer_file(self.path), None, 'json'
+      except (OSError, ValueError) as e:
+        self._stamp = stamp
+        if log is not None:
+          log("Cannot load {0} definitions from {1}: {2}".format(self.name, self.path, e))
+        return False
+      index = SymbolIndex(definitions, names)
+      index.prepare_fuzzy()
+      self.index = index
+      self.source = source
+      self._stamp = self.stamp()
+      self.version += 1
+      return True
+
+class LayerWatcher(object):
+  def __init__(self):
+    self._stop = None
+
+  def start(self, layers, interval, on_change, log=None):
+    self.stop()
+    stop = self._stop = threading.Event()
+    threading.Thread(target=self._watch, args=(stop, layers, interval, on_change, log), daemon=True).start()
+
+  def stop(self):
+    if self._stop is not None:
+      self._stop.set()
+      self._stop = None
+
+  def _watch(self, stop, layers, interval, on_change, log):
+    while not stop.is_set():
+      check_layers(layers(), on_change, log)
+      if not interval or stop.wait(max(1, interval)):
+        return
+
+def check_layers(layers, on_change, log=None, force=False):
+  changed = [layer for layer in layers if layer is not None and layer.refresh(log, force)]
+  if changed:
+    on_change(changed)
+  return changed
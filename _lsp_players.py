@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+from collections import OrderedDict
+
+try:
+  from ._lsp_index import SymbolIndex, fold
+  from ._lsp_update import fetch
+except (ImportError, SystemError, ValueError):
+  from _lsp_index import SymbolIndex, fold
+  from _lsp_update import fetch
+
+MAX_COMPLETIONS = 50
+INFO_CACHE_SIZE = 256
+
+def _badges(value):
+  if not value:
+    return ()
+  if isinstance(value, str):
+    value = value.replace(';', ',').split(',')
+  return tuple(str(badge).strip() for badge in value if str(badge).strip())
+
+def _record(row):
+  if not isinstance(row, dict):
+    return None, None
+  account = str(row.get('account') or '').strip()
+  if not account:
+    return None, None
+  level = row.get('level')
+  player_id = row.get('id')
+  return account, (str(row.get('nick') or ''), '' if level is None else str(level), '' if player_id is None else str(player_id),
+    _badges(row.get('badges')))
+
+def _rows(text):
+  stripped = text.lstrip()
+  if stripped.startswith('['):
+    return json.loads(text)
+  if stripped.startswith('{'):
+    try:
+      payload = json.loads(text)
+    except ValueError:
+      return [json.loads(line) for line in text.splitlines() if line.strip()]
+    players = payload.get('players') if isinstance(payload, dict) else None
+    if isinstance(players, list):
+      return players
+    return [payload]
+  return csv.DictReader(io.StringIO(text))
+
+def parse_players(data):
+  players = {}
+  for row in _rows(data.decode('utf-8-sig', 'replace')):
+    account, record = _record(row)
+    if account is not None:
+      players[account] = record
+  return players
+
+class PlayerDirectory(object):
+  def __init__(self):
+    self.index = SymbolIndex()
+    self.version = 0
+    self.source = None
+    self.log = None
+    self._infos = OrderedDict()
+    self._stamp = None
+    self._stop = None
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.index)
+
+  def install(self, players, source=None):
+    index = SymbolIndex(players)
+    with self._lock:
+      self.index = index
+      self._infos = OrderedDict()
+      self.source = source
+      self.version += 1
+
+  def completions(self, prefix, limit=MAX_COMPLETIONS):
+    if not prefix:
+      return []
+    return [["{0}\t{1}".format(account, record[0] or 'Player'), account]
+      for account, record in self.index.iter_prefix(prefix, limit)]
+
+  def info(self, word):
+    index = self.index
+    account = index.name_for_key(fold(word))
+    if account is None:
+      return None
+    with self._lock:
+      infos = self._infos
+      info = infos.get(account)
+      if info is not None:
+        infos.move_to_end(account)
+        return info
+      nick, level, player_id, badges = index.definitions[account]
+      info = infos[account] = {'account': account, 'nick': nick, 'level': level, 'id': player_id, 'badges': list(badges)}
+      while len(infos) > INFO_CACHE_SIZE:
+        infos.popitem(last=False)
+    return info
+
+  def configure(self, path=None, url=None, interval=60, log=None):
+    self.stop()
+    self.log = log
+    self._stamp = None
+    if not (path or url):
+      if self.source is not None:
+        self.install({})
+      return
+    stop = self._stop = threading.Event()
+    threading.Thread(target=self._watch, args=(stop, path, url, interval), daemon=True).start()
+
+  def stop(self):
+    if self._stop is not None:
+      self._stop.set()
+      self._stop = None
+
+  def _watch(self, stop, path, url, interval):
+    while not stop.is_set():
+      try:
+        self.refresh(path, url, stop)
+      except (OSError, ValueError, csv.Error, urllib.error.URLError) as e:
+        self._log("Cannot load players from {0}: {1}".format(url or path, e))
+      if not interval or stop.wait(max(1, interval)):
+        return
+
+  def refresh(self, path=None, url=None, stop=None):
+    start = time.time()
+    if url:
+      etag, last_modified = self._stamp or (None, None)
+      status, data, headers = fetch(url, etag, last_modified)
+      if status == 304:
+        return False
+      stamp = (headers.get('ETag'), headers.get('Last-Modified'))
+    else:
+      stat = os.stat(path)
+      stamp = (stat.st_mtime, stat.st_size)
+      if stamp == self._stamp:
+        return False
+      with open(path, 'rb') as f:
+        data = f.read()
+    players = parse_players(data)
+    if stop is not None and stop.is_set():
+      return False
+    self.install(players, url or path)
+    self._stamp = stamp
+    self._log("Loaded {0} players from {1} in {2:.0f} ms".format(len(players), url or path, (time.time() - start) * 1000))
+    return True
+
+  def _log(self, message):
+    if self.log is not None:
+      self.log(message)
+
+directory = PlayerDirectory()
+
+def get_player_completions(prefix):
+  return directory.completions(prefix)
+
+def get_player_info(word):
+  return directory.info(word)
@@ -0,0 +1,125 @@
+import sys
+
+FIELDS = ('params', 'returns', 'scope', 'is_custom', 'line', 'file')
+TEXT_FIELDS = ('description', 'example')
+_FIELD_SET = frozenset(FIELDS)
+_TEXT_SET = frozenset(TEXT_FIELDS)
+_MISSING = object()
+
+def intern_value(value):
+  if type(value) is str:
+    return sys.intern(value)
+  return value
+
+def intern_params(params):
+  if isinstance(params, (list, tuple)):
+    return tuple(intern_value(param) for param in params)
+  return params
+
+class TextTable(object):
+  __slots__ = ('descriptions', 'examples')
+
+  def __init__(self):
+    self.descriptions = []
+    self.examples = []
+
+  def __len__(self):
+    return len(self.descriptions)
+
+  def add(self, description, example):
+    self.descriptions.append(description)
+    self.examples.append(example)
+    return len(self.descriptions) - 1
+
+  def text(self, index, key):
+    return self.descriptions[index] if key == 'description' else self.examples[index]
+
+class FixedText(object):
+  __slots__ = ('description',)
+
+  def __init__(self, description):
+    self.description = description
+
+  def text(self, index, key):
+    return self.description if key == 'description' else None
+
+class Definition(object):
+  __slots__ = FIELDS + ('texts', 'text_id', 'extra')
+
+  def __init__(self, params=None, returns=None, scope=None, is_custom=None, line=None, file=None, texts=None, text_id=0, extra=None):
+    self.params = params
+    self.returns = returns
+    self.scope = scope
+    self.is_custom = is_custom
+    self.line = line
+    self.file = file
+    self.texts = texts
+    self.text_id = text_id
+    self.extra = extra
+
+  def get(self, key, default=None):
+    if key in _FIELD_SET:
+      value = getattr(self, key)
+      return default if value is None else value
+    extra = self.extra
+    if extra is not None and key in extra:
+      return extra[key]
+    if key in _TEXT_SET and self.texts is not None:
+      value = self.texts.text(self.text_id, key)
+      if value is not None:
+        return value
+    return default
+
+  def __getitem__(self, key):
+    value = self.get(key, _MISSING)
+    if value is _MISSING:
+      raise KeyError(key)
+    return value
+
+  def __contains__(self, key):
+    return self.get(key, _MISSING) is not _MISSING
+
+  def __setitem__(self, key, value):
+    if key == 'params':
+      self.params = intern_params(value)
+    elif key in _FIELD_SET:
+      setattr(self, key, intern_value(value))
+    else:
+      if self.extra is None:
+        self.extra = {}
+      self.extra[key] = value
+
+  def fields(self):
+    result = dict((key, getattr(self, key)) for key in FIELDS if getattr(self, key) is not None)
+    if result.get('params') is not None:
+      result['params'] = list(result['params'])
+    if self.extra:
+      result.update((key, value) for key, value in self.extra.items() if key not in _TEXT_SET)
+    return result
+
+  def to_dict(self):
+    result = self.fields()
+    for key in TEXT_FIELDS:
+      value = self.get(key)
+      if value is not None:
+        result[key] = value
+    return result
+
+def make_definition(info, texts=None):
+  if not isinstance(info, dict):
+    info = {}
+  extra = None
+  for key, value in info.items():
+    if key not in _FIELD_SET and (texts is None or key not in _TEXT_SET):
+      if extra is None:
+        extra = {}
+      extra[key] = value
+  text_id = 0
+  if texts is not None:
+    text_id = texts.add(info.get('description'), info.get('example'))
+  return Definition(intern_params(info.get('params')), intern_value(info.get('returns')), intern_value(info.get('scope')),
+    info.get('is_custom'), info.get('line'), intern_value(info.get('file')), texts, text_id, extra)
+
+def compact_definitions(definitions):
+  texts = TextTable()
+  return dict((name, make_definition(info, texts)) for name, info in definitions.items())
@@ -0,0 +1,150 @@
+import bisect
+import re
+import threading
+from array import array
+
+try:
+  from ._lsp_document import line_starts_for
+  from ._lsp_index import fold
+  from ._lsp_signature import code_spans
+  from ._lsp_syntax import IDENTIFIER, VARIABLE, tokenize
+except (ImportError, SystemError, ValueError):
+  from _lsp_document import line_starts_for
+  from _lsp_index import fold
+  from _lsp_signature import code_spans
+  from _lsp_syntax import IDENTIFIER, VARIABLE, tokenize
+
+FUNCTION_SCOPE = 'entity.name.function.gscript'
+VARIABLE_SCOPE = 'variable.parameter.gscript'
+
+_REFERENCE = re.compile(r'(?P<v>' + VARIABLE + r')|\b(?P<f>' + IDENTIFIER + r')(?=\()')
+_function_tokens = {}
+
+def _is_function_token(name):
+  found = _function_tokens.get(name)
+  if found is None:
+    token = next(tokenize(name + '('), None)
+    found = _function_tokens[name] = token is not None and token[2] == FUNCTION_SCOPE and token[1] == len(name)
+  return found
+
+def iter_references(code):
+  for start, end in code_spans(code):
+    for match in _REFERENCE.finditer(code, start, end):
+      name = match.group()
+      if match.lastgroup == 'v' or _is_function_token(name):
+        yield match.start(), name
+
+def extract_references(text):
+  starts = line_starts_for(text)
+  refs = {}
+  for offset, name in iter_references(text):
+    line = bisect.bisect_right(starts, offset) - 1
+    positions = refs.get(fold(name))
+    if positions is None:
+      positions = refs[fold(name)] = array('I')
+    positions.append(line)
+    positions.append(offset - starts[line])
+  return refs
+
+def serialize_references(refs):
+  return dict((key, positions.tolist()) for key, positions in refs.items())
+
+def deserialize_references(data):
+  if not isinstance(data, dict):
+    return None
+  try:
+    return dict((key, array('I', positions)) for key, positions in data.items())
+  except (TypeError, OverflowError):
+    return None
+
+class ReferenceIndex(object):
+  def __init__(self):
+    self.files = {}
+    self._postings = {}
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._postings)
+
+  def set_file(self, path, refs):
+    with self._lock:
+      self._remove(path)
+      self.files[path] = refs
+      postings = self._postings
+      for key, positions in refs.items():
+        files = postings.get(key)
+        if files is None:
+          files = postings[key] = {}
+        files[path] = positions
+
+  def remove_file(self, path):
+    with self._lock:
+      self._remove(path)
+
+  def replace(self, files):
+    postings = {}
+    for path, refs in files.items():
+      for key, positions in refs.items():
+        found = postings.get(key)
+        if found is None:
+          found = postings[key] = {}
+        found[path] = positions
+    with self._lock:
+      self.files = dict(files)
+      self._postings = postings
+
+  def _remove(self, path):
+    refs = self.files.pop(path, None)
+    if refs is None:
+      return
+    postings = self._postings
+    for key in refs:
+      files = postings.get(key)
+      if files is None:
+        continue
+      files.pop(path, None)
+      if not files:
+        del postings[key]
+
+  def lookup(self, word):
+    with self._lock:
+      files = self._postings.get(fold(word))
+      files = sorted(files.items()) if files else ()
+    results = []
+    for path, positions in files:
+      for i in range(0, len(positions), 2):
+        results.append((path, positions[i], positions[i + 1]))
+    return results
+
+def is_reference_name(name):
+  pattern = VARIABLE if name.startswith('$') else IDENTIFIER
+  if re.match('(?:' + pattern + r')\Z', name) is None:
+    return False
+  return name.startswith('$') or _is_function_token(name)
+
+def offsets_for(text, positions):
+  starts = line_starts_for(text)
+  offsets = []
+  for line, col in positions:
+    if line < len(starts):
+      offsets.append(starts[line] + col)
+  return offsets
+
+def _continues(text, end):
+  return end < len(text) and (text[end].isalnum() or text[end] in '_:')
+
+def rename_in_text(text, offsets, old, new):
+  key = fold(old)
+  size = len(old)
+  parts = []
+  last = len(text)
+  replaced = 0
+  for offset in sorted(set(offsets), reverse=True):
+    if offset + size > last or fold(text[offset:offset + size]) != key or _continues(text, offset + size):
+      continue
+    parts.append(text[offset + size:last])
+    parts.append(new)
+    last = offset
+    replaced += 1
+  parts.append(text[:last])
+  return ''.join(reversed(parts)), replaced
@@ -0,0 +1,173 @@
+import json
+import os
+import subprocess
+import threading
+from urllib.parse import unquote, urlparse
+from urllib.request import pathname2url, url2pathname
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_NOT_INITIALIZED = -32002
+SERVER_EXITED = -32099
+
+class RpcError(Exception):
+  def __init__(self, code, message):
+    super(RpcError, self).__init__(message)
+    self.code = code
+    self.message = message
+
+  def to_dict(self):
+    return {'code': self.code, 'message': self.message}
+
+def uri_to_path(uri):
+  parsed = urlparse(uri)
+  if parsed.scheme != 'file':
+    return None
+  return url2pathname(unquote(parsed.path))
+
+def path_to_uri(path):
+  return 'file:' + pathname2url(os.path.abspath(path))
+
+def read_message(stream):
+  length = None
+  while True:
+    line = stream.readline()
+    if not line:
+      return None
+    line = line.strip()
+    if not line:
+      if length is not None:
+        break
+      continue
+    name, _, value = line.partition(b':')
+    if name.strip().lower() == b'content-length':
+      try:
+        length = int(value.strip())
+      except ValueError:
+        raise RpcError(PARSE_ERROR, "Invalid Content-Length header")
+  chunks = []
+  remaining = length
+  while remaining > 0:
+    chunk = stream.read(remaining)
+    if not chunk:
+      return None
+    chunks.append(chunk)
+    remaining -= len(chunk)
+  try:
+    return json.loads(b''.join(chunks).decode('utf-8'))
+  except ValueError:
+    raise RpcError(PARSE_ERROR, "Invalid JSON body")
+
+def write_message(stream, payload):
+  body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+  stream.write('Content-Length: {0}\r\n\r\n'.format(len(body)).encode('ascii') + body)
+  stream.flush()
+
+def _startupinfo():
+  if os.name != 'nt':
+    return None
+  info = subprocess.STARTUPINFO()
+  info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+  return info
+
+class LanguageClient(object):
+  def __init__(self, command, cwd=None, on_notification=None, log=None):
+    self.command = command
+    self.on_notification = on_notification
+    self.log = log
+    self.alive = True
+    self._next_id = 0
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._write_lock = threading.Lock()
+    self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+      cwd=cwd, startupinfo=_startupinfo())
+    threading.Thread(target=self._read_loop, daemon=True).start()
+    threading.Thread(target=self._read_stderr, daemon=True).start()
+
+  def is_alive(self):
+    return self.alive and self.process.poll() is None
+
+  def request(self, method, params, callback=None):
+    with self._lock:
+      self._next_id += 1
+      request_id = self._next_id
+      self._pending[request_id] = callback
+    if not self._send({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}):
+      self._finish(request_id, None, {'code': SERVER_EXITED, 'message': "Language server is not running"})
+    return request_id
+
+  def request_sync(self, method, params, timeout=None):
+    done = threading.Event()
+    box = []
+    def callback(result, error):
+      box.append((result, error))
+      done.set()
+    self.request(method, params, callback)
+    if not done.wait(timeout):
+      raise RpcError(INTERNAL_ERROR, "Timed out waiting for {0}".format(method))
+    result, error = box[0]
+    if error is not None:
+      raise RpcError(error.get('code', INTERNAL_ERROR), error.get('message', ''))
+    return result
+
+  def notify(self, method, params):
+    return self._send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+  def shutdown(self, timeout=2.0):
+    if self.is_alive():
+      try:
+        self.request_sync('shutdown', None, timeout)
+        self.notify('exit', None)
+        self.process.wait(timeout)
+      except (RpcError, OSError, subprocess.TimeoutExpired):
+        pass
+    if self.process.poll() is None:
+      self.process.kill()
+    self.alive = False
+
+  def _send(self, payload):
+    if not self.alive:
+      return False
+    try:
+      with self._write_lock:
+        write_message(self.process.stdin, payload)
+      return True
+    except (OSError, ValueError):
+      self.alive = False
+      return False
+
+  def _finish(self, request_id, result, error):
+    with self._lock:
+      callback = self._pending.pop(request_id, None)
+    if callback is not None:
+      callback(result, error)
+
+  def _read_loop(self):
+    try:
+      while True:
+        message = read_message(self.process.stdout)
+        if message is None:
+          break
+        if 'id' in message and 'method' not in message:
+          self._finish(message['id'], message.get('result'), message.get('error'))
+        elif 'id' in message:
+          self._send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': METHOD_NOT_FOUND, 'message': message['method']}})
+        elif self.on_notification is not None:
+          self.on_notification(message.get('method'), message.get('params'))
+    except (OSError, ValueError, RpcError) as e:
+      if self.log:
+        self.log("Connection error: {0}".format(e))
+    self.alive = False
+    with self._lock:
+      pending = list(self._pending.keys())
+    for request_id in pending:
+      self._finish(request_id, None, {'code': SERVER_EXITED, 'message': "Language server exited"})
+
+  def _read_stderr(self):
+    for line in iter(self.process.stderr.readline, b''):
+      if self.log:
+        self.log(line.decode('utf-8', 'replace').rstrip())
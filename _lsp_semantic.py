@@ -0,0 +1,65 @@
+import bisect
+from collections import OrderedDict
+
+try:
+  from ._lsp_references import iter_references
+except (ImportError, SystemError, ValueError):
+  from _lsp_references import iter_references
+
+BLOCK_SIZE = 16384
+_AFTER = float('inf')
+
+def iter_blocks(text, matches, begin, end):
+  i = bisect.bisect_right(matches, (begin, _AFTER)) - 1
+  chunk_start = matches[i][0] if i >= 0 else 0
+  while chunk_start < end:
+    i += 1
+    chunk_end = matches[i][0] if i < len(matches) else len(text)
+    if chunk_end > chunk_start:
+      pos = chunk_start
+      while chunk_end - pos > BLOCK_SIZE:
+        cut = text.find('\n', pos + BLOCK_SIZE, chunk_end)
+        if cut == -1:
+          break
+        if cut + 1 > begin:
+          yield pos, cut + 1
+        pos = cut + 1
+        if pos >= end:
+          return
+      yield pos, chunk_end
+    chunk_start = chunk_end
+    if i >= len(matches):
+      return
+
+class TokenCache(object):
+  __slots__ = ('max_blocks', 'hits', 'misses', '_blocks')
+
+  def __init__(self, max_blocks=256):
+    self.max_blocks = max_blocks
+    self.hits = 0
+    self.misses = 0
+    self._blocks = OrderedDict()
+
+  def __len__(self):
+    return len(self._blocks)
+
+  def block_tokens(self, block):
+    blocks = self._blocks
+    tokens = blocks.get(block)
+    if tokens is not None:
+      blocks.move_to_end(block)
+      self.hits += 1
+      return tokens
+    self.misses += 1
+    tokens = [(offset, name) for offset, name in iter_references(block) if name[0] != '$']
+    blocks[block] = tokens
+    while len(blocks) > self.max_blocks:
+      blocks.popitem(last=False)
+    return tokens
+
+  def function_tokens(self, text, matches, begin, end):
+    for start, stop in iter_blocks(text, matches, begin, end):
+      for offset, name in self.block_tokens(text[start:stop]):
+        offset += start
+        if begin <= offset < end:
+          yield offset, name
@@ -0,0 +1,482 @@
+import os
+import sys
+import threading
+import time
+
+try:
+  from ._lsp_diagnostics import DiagnosticsCache
+  from ._lsp_document import DocumentParse
+  from ._lsp_layers import DefinitionLayer, LayerWatcher, check_layers
+  from ._lsp_index import CompletionSession, SymbolIndex, SymbolTable, annotation_for, fold
+  from ._lsp_rpc import INTERNAL_ERROR, INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, SERVER_NOT_INITIALIZED, RpcError, path_to_uri, read_message, uri_to_path, write_message
+  from ._lsp_semantic import TokenCache
+  from ._lsp_signature import find_call_context
+  from ._lsp_workspace import WorkspaceIndex, cache_key_for, is_script
+except (ImportError, SystemError, ValueError):
+  from _lsp_diagnostics import DiagnosticsCache
+  from _lsp_document import DocumentParse
+  from _lsp_layers import DefinitionLayer, LayerWatcher, check_layers
+  from _lsp_index import CompletionSession, SymbolIndex, SymbolTable, annotation_for, fold
+  from _lsp_rpc import INTERNAL_ERROR, INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, SERVER_NOT_INITIALIZED, RpcError, path_to_uri, read_message, uri_to_path, write_message
+  from _lsp_semantic import TokenCache
+  from _lsp_signature import find_call_context
+  from _lsp_workspace import WorkspaceIndex, cache_key_for, is_script
+
+SERVER_NAME = 'gscript-language-server'
+SERVER_VERSION = '1.0'
+WORD_CHARS = '$_:'
+KIND_FUNCTION = 3
+KIND_VARIABLE = 6
+INSERT_SNIPPET = 2
+SYNC_INCREMENTAL = 2
+
+def log(message):
+  sys.stderr.write("[{0}] {1}\n".format(SERVER_NAME, message))
+  sys.stderr.flush()
+
+def request_window(params):
+  return (params.get('gscript') or {}).get('window')
+
+def plain_info(info):
+  if hasattr(info, 'to_dict'):
+    return info.to_dict()
+  return dict(info)
+
+def signature_label(name, info):
+  return '{0}({1})'.format(name, ', '.join(info.get('params', [])))
+
+class Document(object):
+  __slots__ = ('uri', 'path', 'version', 'parse', 'index', 'indexed_generation', 'session', 'diagnostics', 'tokens')
+
+  def __init__(self, uri, text, version):
+    self.uri = uri
+    self.path = uri_to_path(uri)
+    self.version = version
+    self.parse = DocumentParse(text)
+    self.index = None
+    self.indexed_generation = None
+    self.session = CompletionSession()
+    self.diagnostics = DiagnosticsCache()
+    self.tokens = TokenCache()
+    self.refresh_index()
+
+  def refresh_index(self):
+    if self.parse.generation != self.indexed_generation:
+      self.index = SymbolIndex(self.parse.functions)
+      self.indexed_generation = self.parse.generation
+    else:
+      self.index.definitions = self.parse.functions
+
+  def offset_at(self, position):
+    starts = self.parse.line_starts
+    line = position.get('line', 0)
+    if line < 0:
+      return 0
+    if line >= len(starts):
+      return len(self.parse.text)
+    end = starts[line + 1] - 1 if line + 1 < len(starts) else len(self.parse.text)
+    return min(starts[line] + max(0, position.get('character', 0)), end)
+
+  def position_at(self, offset):
+    line = self.parse.line_for(offset)
+    return {'line': line, 'character': offset - self.parse.line_starts[line]}
+
+  def apply_change(self, change):
+    if 'range' not in change:
+      self.parse.reset(change.get('text', ''))
+      return
+    a = self.offset_at(change['range']['start'])
+    b = self.offset_at(change['range']['end'])
+    self.parse.apply_changes([(a, max(a, b), change.get('text', ''))])
+
+  def word_range(self, offset):
+    text = self.parse.text
+    start = end = offset
+    while start > 0 and (text[start - 1].isalnum() or text[start - 1] in WORD_CHARS):
+      start -= 1
+    while end < len(text) and (text[end].isalnum() or text[end] in WORD_CHARS):
+      end += 1
+    return start, end
+
+class GScriptServer(object):
+  def __init__(self, reader, writer):
+    self.reader = reader
+    self.writer = writer
+    self.documents = {}
+    self.api_index = SymbolIndex()
+    self.api_version = 0
+    self.workspace = None
+    self.definitions_path = None
+    self.api_layer = None
+    self.layers = []
+    self.layer_watcher = LayerWatcher()
+    self.watch_seconds = 2
+    self.cache_dir = None
+    self.max_results_short = 50
+    self.max_results_long = 200
+    self.initialized = False
+    self.shutdown_requested = False
+    self._write_lock = threading.Lock()
+    self._handlers = {
+      'initialize': self.initialize,
+      'initialized': self.on_initialized,
+      'shutdown': self.shutdown,
+      'exit': self.exit,
+      'textDocument/didOpen': self.did_open,
+      'textDocument/didChange': self.did_change,
+      'textDocument/didClose': self.did_close,
+      'textDocument/didSave': self.did_save,
+      'textDocument/completion': self.completion,
+      'textDocument/hover': self.hover,
+      'textDocument/signatureHelp': self.signature_help,
+      'textDocument/definition': self.definition,
+      'workspace/didChangeWorkspaceFolders': self.did_change_workspace_folders,
+      'gscript/reloadDefinitions': self.reload_definitions,
+      'gscript/diagnostics': self.diagnostics,
+      'gscript/semanticTokens': self.semantic_tokens,
+    }
+
+  def serve(self):
+    while True:
+      try:
+        message = read_message(self.reader)
+      except RpcError as e:
+        self.send({'jsonrpc': '2.0', 'id': None, 'error': e.to_dict()})
+        continue
+      if message is None:
+        return 0 if self.shutdown_requested else 1
+      exit_code = self.dispatch(message)
+      if exit_code is not None:
+        return exit_code
+
+  def dispatch(self, message):
+    method = message.get('method')
+    request_id = message.get('id')
+    is_request = 'id' in message
+    try:
+      if not isinstance(method, str):
+        raise RpcError(INVALID_REQUEST, "Missing method")
+      if method == 'exit':
+        return 0 if self.shutdown_requested else 1
+      handler = self._handlers.get(method)
+      if handler is None:
+        if is_request:
+          raise RpcError(METHOD_NOT_FOUND, "Unknown method: {0}".format(method))
+        return None
+      if not self.initialized and method != 'initialize':
+        if is_request:
+          raise RpcError(SERVER_NOT_INITIALIZED, "Server not initialized")
+        return None
+      result = handler(message.get('params') or {})
+      if is_request:
+        self.send({'jsonrpc': '2.0', 'id': request_id, 'result': result})
+    except RpcError as e:
+      if is_request:
+        self.send({'jsonrpc': '2.0', 'id': request_id, 'error': e.to_dict()})
+    except Exception as e:
+      log("Error handling {0}: {1!r}".format(method, e))
+      if is_request:
+        self.send({'jsonrpc': '2.0', 'id': request_id, 'error': {'code': INTERNAL_ERROR, 'message': str(e)}})
+    return None
+
+  def send(self, payload):
+    with self._write_lock:
+      write_message(self.writer, payload)
+
+  def notify(self, method, params):
+    self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+  def initialize(self, params):
+    options = params.get('initializationOptions') or {}
+    self.definitions_path = options.get('definitionsPath')
+    self.watch_seconds = options.get('definitionsWatchSeconds', self.watch_seconds)
+    self.set_layers(options.get('definitionLayers'))
+    self.cache_dir = options.get('cacheDir')
+    self.max_results_short = options.get('completionMaxResultsShort', self.max_results_short)
+    self.max_results_long = options.get('completionMaxResultsLong', self.max_results_long)
+    folders = [uri_to_path(folder.get('uri', '')) for folder in params.get('workspaceFolders') or []]
+    self.set_workspace([folder for folder in folders if folder])
+    self.start_definitions_load()
+    self.initialized = True
+    encodings = ((params.get('capabilities') or {}).get('general') or {}).get('positionEncodings') or []
+    capabilities = {
+      'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL, 'save': {'includeText': False}},
+      'completionProvider': {'triggerCharacters': ['.', ':', '$']},
+      'hoverProvider': True,
+      'signatureHelpProvider': {'triggerCharacters': ['(', ','], 'retriggerCharacters': [',']},
+      'definitionProvider': True,
+      'workspace': {'workspaceFolders': {'supported': True, 'changeNotifications': True}},
+    }
+    if 'utf-32' in encodings:
+      capabilities['positionEncoding'] = 'utf-32'
+    return {'capabilities': capabilities, 'serverInfo': {'name': SERVER_NAME, 'version': SERVER_VERSION}}
+
+  def on_initialized(self, params):
+    return None
+
+  def shutdown(self, params):
+    self.shutdown_requested = True
+    self.layer_watcher.stop()
+    return None
+
+  def exit(self, params):
+    return None
+
+  def start_definitions_load(self):
+    threading.Thread(target=self.load_definitions, daemon=True).start()
+
+  def load_definitions(self):
+    if self.definitions_path:
+      start = time.time()
+      if self.api_layer is None or self.api_layer.path != self.definitions_path:
+        self.api_layer = DefinitionLayer('upstream', self.definitions_path, bundled=True)
+      layer = self.api_layer
+      layer.refresh(log, force=True)
+      self.api_index = layer.index
+      self.api_version += 1
+      log("Loaded {0} API definitions from {1} in {2:.0f} ms".format(len(layer), layer.source, (time.time() - start) * 1000))
+      self.notify('gscript/definitionsLoaded', {'count': len(layer), 'source': layer.source})
+    self.layer_watcher.start(self.watched_layers, self.watch_seconds, self.on_layers_changed, log)
+
+  def watched_layers(self):
+    layers = []
+    for layer, _ in self.layers:
+      if layer not in layers:
+        layers.append(layer)
+    return layers + [self.api_layer]
+
+  def on_layers_changed(self, layers):
+    if self.api_layer in layers:
+      self.api_index = self.api_layer.index
+    self.api_version += 1
+    for layer in layers:
+      log("Loaded {0} {1} definitions from {2}".format(len(layer), layer.name, layer.path))
+      self.notify('gscript/definitionsLoaded', {'count': len(layer), 'source': layer.source, 'layer': layer.name})
+
+  def set_layers(self, items):
+    current = dict((layer.path, layer) for layer, _ in self.layers)
+    layers = []
+    for item in items or []:
+      path = item.get('path') if isinstance(item, dict) else None
+      if not path:
+        continue
+      layer = current.get(path)
+      if layer is None:
+        layer = current[path] = DefinitionLayer(item.get('name') or 'custom', path)
+      window = item.get('window')
+      if (layer, window) not in layers:
+        layers.append((layer, window))
+    if [(layer.path, window) for layer, window in layers] != [(layer.path, window) for layer, window in self.layers]:
+      self.layers = layers
+      self.api_version += 1
+
+  def reload_definitions(self, params):
+    if 'definitionLayers' in params:
+      self.set_layers(params['definitionLayers'])
+      if not params.get('definitionsPath'):
+        layers = self.watched_layers()
+        threading.Thread(target=check_layers, args=(layers, self.on_layers_changed, log), daemon=True).start()
+        return None
+    if params.get('definitionsPath'):
+      self.definitions_path = params['definitionsPath']
+    self.start_definitions_load()
+    return None
+
+  def set_workspace(self, folders):
+    if not folders:
+      self.workspace = None
+      return
+    cache_path = None
+    if self.cache_dir:
+      cache_path = os.path.join(self.cache_dir, 'workspace-{0}.json'.format(cache_key_for(folders)))
+    workspace = WorkspaceIndex(folders, cache_path=cache_path)
+    self.workspace = workspace
+    def scan():
+      start = time.time()
+      count = workspace.scan()
+      log("Indexed {0} scripts ({1} functions) in {2:.0f} ms".format(count, workspace.symbol_count(), (time.time() - start) * 1000))
+    threading.Thread(target=scan, daemon=True).start()
+
+  def did_change_workspace_folders(self, params):
+    event = params.get('event') or {}
+    folders = list(self.workspace.folders) if self.workspace else []
+    removed = set(uri_to_path(folder.get('uri', '')) for folder in event.get('removed') or [])
+    folders = [folder for folder in folders if folder not in removed]
+    for folder in event.get('added') or []:
+      path = uri_to_path(folder.get('uri', ''))
+      if path and path not in folders:
+        folders.append(path)
+    self.set_workspace(folders)
+    return None
+
+  def document(self, params):
+    uri = (params.get('textDocument') or {}).get('uri')
+    document = self.documents.get(uri)
+    if document is None:
+      raise RpcError(INVALID_PARAMS, "Unknown document: {0}".format(uri))
+    return document
+
+  def did_open(self, params):
+    item = params.get('textDocument') or {}
+    self.documents[item.get('uri')] = Document(item.get('uri'), item.get('text', ''), item.get('version', 0))
+    return None
+
+  def did_change(self, params):
+    document = self.document(params)
+    for change in params.get('contentChanges') or []:
+      document.apply_change(change)
+    document.version = (params.get('textDocument') or {}).get('version', document.version)
+    document.refresh_index()
+    return None
+
+  def did_close(self, params):
+    self.documents.pop((params.get('textDocument') or {}).get('uri'), None)
+    return None
+
+  def did_save(self, params):
+    path = uri_to_path((params.get('textDocument') or {}).get('uri', ''))
+    workspace = self.workspace
+    if workspace is not None and is_script(path) and workspace.contains(path):
+      workspace.update_file(path)
+    return None
+
+  def symbol_table(self, document, window=None):
+    layers = [document.index]
+    if self.workspace is not None:
+      layers.append(self.workspace.index)
+    layers.extend(layer.index for layer, owner in reversed(self.layers) if owner is None or owner == window)
+    layers.append(self.api_index)
+    return SymbolTable(tuple(layers))
+
+  def completion(self, params):
+    document = self.document(params)
+    offset = document.offset_at(params.get('position') or {})
+    start, _ = document.word_range(offset)
+    prefix = document.parse.text[start:offset]
+    limit = self.max_results_short if len(prefix) < 2 else self.max_results_long
+    key = (document.parse.generation, self.api_version, self.workspace.generation if self.workspace else None, request_window(params))
+    results = document.session.complete(self.symbol_table(document, request_window(params)), key, prefix, limit)
+    items = []
+    for name, info in results:
+      params_list = info.get('params', [])
+      if name.startswith('$'):
+        insert_text, kind = name, KIND_VARIABLE
+      elif not params_list:
+        insert_text, kind = '{0}() {{'.format(name), KIND_FUNCTION
+      else:
+        insert_text, kind = '{0}()'.format(name), KIND_FUNCTION
+      data = dict((key, info[key]) for key in ('params', 'returns', 'scope', 'is_custom', 'type', 'line', 'file') if key in info)
+      items.append({
+        'label': name,
+        'kind': kind,
+        'detail': annotation_for(info),
+        'documentation': info.get('description', '') or '',
+        'insertText': insert_text,
+        'insertTextFormat': INSERT_SNIPPET,
+        'data': data,
+      })
+    return {'isIncomplete': True, 'items': items}
+
+  def hover(self, params):
+    document = self.document(params)
+    offset = document.offset_at(params.get('position') or {})
+    start, end = document.word_range(offset)
+    word = document.parse.text[start:end]
+    if not word:
+      return None
+    found = self.symbol_table(document, request_window(params)).lookup(word)
+    if found is None:
+      return None
+    name, info = found
+    info = plain_info(info)
+    parts = ['```gscript\n{0}\n```'.format(signature_label(name, info))]
+    if info.get('description'):
+      parts.append(info['description'])
+    if info.get('example'):
+      parts.append('```gscript\n{0}\n```'.format(info['example'].strip()))
+    return {
+      'contents': {'kind': 'markdown', 'value': '\n\n'.join(parts)},
+      'range': {'start': document.position_at(start), 'end': document.position_at(end)},
+      'gscript': {'name': name, 'info': info},
+    }
+
+  def signature_help(self, params):
+    document = self.document(params)
+    offset = document.offset_at(params.get('position') or {})
+    text = document.parse.text
+    context = find_call_context(lambda a, b: text[a:b], offset)
+    if context is None:
+      return None
+    func_name, _, arg_index = context
+    info = self.symbol_table(document, request_window(params)).get(func_name)
+    if info is None or not info.get('params'):
+      return None
+    info = plain_info(info)
+    params_list = info['params']
+    active = arg_index if arg_index < len(params_list) else len(params_list) - 1
+    return {
+      'signatures': [{
+        'label': signature_label(func_name, info),
+        'documentation': info.get('description', '') or '',
+        'parameters': [{'label': param} for param in params_list],
+      }],
+      'activeSignature': 0,
+      'activeParameter': active,
+      'gscript': {'name': func_name, 'info': info, 'activeParameter': active},
+    }
+
+  def definition(self, params):
+    document = self.document(params)
+    offset = document.offset_at(params.get('position') or {})
+    start, end = document.word_range(offset)
+    word = document.parse.text[start:end]
+    if not word:
+      return None
+    info = document.index.get(word)
+    if info is not None:
+      position = {'line': info['line'], 'character': 0}
+      return [{'uri': document.uri, 'range': {'start': position, 'end': position}}]
+    if self.workspace is None:
+      return None
+    locations = []
+    for info in self.workspace.lookup_all(word):
+      if info.get('file') == document.path:
+        continue
+      position = {'line': info['line'], 'character': 0}
+      locations.append({'uri': path_to_uri(info['file']), 'range': {'start': position, 'end': position}})
+    return locations or None
+
+  def diagnostics(self, params):
+    document = self.document(params)
+    parse = document.parse
+    window = request_window(params)
+    check_unknown = len(self.api_index) > 0
+    key = (self.api_version, self.workspace.generation if self.workspace else None, window, check_unknown,
+      tuple(sorted((name, tuple(info['params'])) for name, info in parse.functions.items())))
+    results = document.diagnostics.check(parse.text, parse.matches, self.symbol_table(document, window).lookup, key, check_unknown)
+    return {'version': document.version, 'diagnostics': [list(result) for result in results]}
+
+  def semantic_tokens(self, params):
+    document = self.document(params)
+    parse = document.parse
+    begin = max(0, params.get('begin', 0))
+    end = min(len(parse.text), params.get('end', len(parse.text)))
+    table = self.symbol_table(document, request_window(params))
+    classes = {}
+    tokens = []
+    for offset, name in document.tokens.function_tokens(parse.text, parse.matches, begin, end):
+      key = fold(name)
+      annotation = classes.get(key)
+      if annotation is None:
+        info = table.get(name)
+        annotation = classes[key] = annotation_for(info) if info is not None else ''
+      if annotation:
+        tokens.append([offset, len(name), annotation])
+    return {'version': document.version, 'tokens': tokens}
+
+def main():
+  server = GScriptServer(sys.stdin.buffer, sys.stdout.buffer)
+  return server.serve()
+
+if __name__ == '__main__':
+  sys.exit(main())
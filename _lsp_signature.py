@@ -0,0 +1,98 @@
+import re
+
+try:
+  from ._lsp_syntax import COMMENT_BLOCK, COMMENT_LINE, STRING_DOUBLE, STRING_SINGLE, _context_end
+except (ImportError, SystemError, ValueError):
+  from _lsp_syntax import COMMENT_BLOCK, COMMENT_LINE, STRING_DOUBLE, STRING_SINGLE, _context_end
+
+SCAN_WINDOWS = (256, 2048, 16384)
+NOT_CALLS = frozenset(('if', 'elseif', 'for', 'while', 'switch', 'with', 'return', 'in', 'function', 'new'))
+
+_CONTEXT_START = re.compile(r"'|\"|//|/\*")
+_CONTEXT_SCOPES = {"'": STRING_SINGLE, '"': STRING_DOUBLE, '//': COMMENT_LINE, '/*': COMMENT_BLOCK}
+_STRUCTURE = re.compile(r'[()\[\]{},;]')
+_EXHAUSTED = object()
+
+def code_spans(code, pos=0):
+  spans = []
+  n = len(code)
+  search = _CONTEXT_START.search
+  while pos < n:
+    match = search(code, pos)
+    if match is None:
+      spans.append((pos, n))
+      break
+    if match.start() > pos:
+      spans.append((pos, match.start()))
+    pos = _context_end(code, _CONTEXT_SCOPES[match.group()], match.start())
+  return spans
+
+def _skip_space(code, end):
+  while end > 0 and code[end - 1] in ' \t\r\n':
+    end -= 1
+  return end
+
+def _word_start(code, end):
+  start = end
+  while start > 0 and (code[start - 1].isalnum() or code[start - 1] == '_'):
+    start -= 1
+  return start
+
+def _callee(code, paren):
+  end = _skip_space(code, paren)
+  start = _word_start(code, end)
+  name = code[start:end]
+  if not name or name[0].isdigit() or name in NOT_CALLS:
+    return None
+  before = _skip_space(code, start)
+  if code[_word_start(code, before):before] == 'function':
+    return None
+  return name
+
+def _scan(code, spans):
+  depth = 0
+  commas = 0
+  for start, end in reversed(spans):
+    positions = [m.start() for m in _STRUCTURE.finditer(code, start, end)]
+    for i in reversed(positions):
+      ch = code[i]
+      if ch in ')]}':
+        depth += 1
+      elif ch in '([{':
+        if depth:
+          depth -= 1
+        elif ch == '{':
+          return None
+        elif ch == '(':
+          name = _callee(code, i)
+          if name is not None:
+            return name, i, commas
+          commas = 0
+        else:
+          commas = 0
+      elif depth:
+        continue
+      elif ch == ',':
+        commas += 1
+      else:
+        return None
+  return _EXHAUSTED
+
+def find_call_context(read, pos, windows=SCAN_WINDOWS):
+  for size in windows:
+    start = max(0, pos - size)
+    code = read(start, pos)
+    offset = 0
+    if start > 0:
+      offset = code.find('\n') + 1
+      if offset == 0:
+        continue
+    result = _scan(code, code_spans(code, offset))
+    if result is None:
+      return None
+    if result is not _EXHAUSTED:
+      name, paren, commas = result
+      return name, start + paren, commas
+    if start == 0:
+      return None
+  return None
@@ -0,0 +1,147 @@
+import collections
+import functools
+import json
+import threading
+import time
+
+class RateCounter(object):
+  def __init__(self, window=10.0):
+    self.window = window
+    self.total = 0
+    self._times = collections.deque()
+    self._lock = threading.Lock()
+
+  def hit(self, now=None):
+    now = time.time() if now is None else now
+    with self._lock:
+      self.total += 1
+      self._times.append(now)
+      self._trim(now)
+
+  def rate(self, now=None):
+    now = time.time() if now is None else now
+    with self._lock:
+      self._trim(now)
+      return len(self._times) / self.window
+
+  def _trim(self, now):
+    times = self._times
+    limit = now - self.window
+    while times and times[0] < limit:
+      times.popleft()
+
+class LatencyHistogram(object):
+  __slots__ = ('count', 'total', 'max', '_samples')
+
+  def __init__(self, size=1024):
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+    self._samples = collections.deque(maxlen=size)
+
+  def add(self, seconds):
+    self.count += 1
+    self.total += seconds
+    if seconds > self.max:
+      self.max = seconds
+    self._samples.append(seconds)
+
+  def percentile(self, fraction):
+    samples = sorted(self._samples)
+    if not samples:
+      return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+class StatsRecorder(object):
+  def __init__(self):
+    self.enabled = True
+    self.started = time.time()
+    self.histograms = {}
+    self.counters = {}
+    self._trace = None
+    self.trace_path = None
+    self._lock = threading.Lock()
+
+  def reset(self):
+    with self._lock:
+      self.started = time.time()
+      self.histograms = {}
+      self.counters = {}
+
+  def record(self, name, seconds):
+    with self._lock:
+      histogram = self.histograms.get(name)
+      if histogram is None:
+        histogram = self.histograms[name] = LatencyHistogram()
+      histogram.add(seconds)
+      if self._trace is not None:
+        try:
+          self._trace.write(json.dumps({'t': round(time.time(), 4), 'event': name, 'ms': round(seconds * 1000, 3)}) + '\n')
+        except (OSError, ValueError):
+          self._trace = None
+
+  def count(self, name, n=1):
+    with self._lock:
+      self.counters[name] = self.counters.get(name, 0) + n
+
+  def set_trace(self, path):
+    with self._lock:
+      if path == self.trace_path:
+        return
+      if self._trace is not None:
+        try:
+          self._trace.close()
+        except (OSError, ValueError):
+          pass
+      self._trace = None
+      self.trace_path = path
+      if path:
+        try:
+          self._trace = open(path, 'a', encoding='utf-8')
+        except OSError as e:
+          print("[SublimeRC] Cannot open trace file {0}: {1}".format(path, e))
+
+  def timed(self, name):
+    def decorate(fn):
+      @functools.wraps(fn)
+      def wrapper(*args, **kwargs):
+        if not self.enabled:
+          return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+          return fn(*args, **kwargs)
+        finally:
+          self.record(name, time.perf_counter() - start)
+      return wrapper
+    return decorate
+
+def _rate(hits, misses):
+  total = hits + misses
+  return '{0:.1f}%'.format(hits * 100.0 / total) if total else '-'
+
+def format_report(recorder, caches=(), extra=()):
+  lines = ['SublimeRC performance stats (last {0:.0f} s)'.format(time.time() - recorder.started), '']
+  lines.append('{0:<34}{1:>8}{2:>10}{3:>10}{4:>10}'.format('Handler', 'calls', 'p50 ms', 'p95 ms', 'max ms'))
+  with recorder._lock:
+    histograms = sorted(recorder.histograms.items())
+    counters = sorted(recorder.counters.items())
+    for name, histogram in histograms:
+      lines.append('{0:<34}{1:>8}{2:>10.2f}{3:>10.2f}{4:>10.2f}'.format(
+        name, histogram.count, histogram.percentile(0.5) * 1000, histogram.percentile(0.95) * 1000, histogram.max * 1000))
+  if not histograms:
+    lines.append('(no events recorded)')
+  lines.append('')
+  lines.append('{0:<34}{1:>8}{2:>10}{3:>10}{4:>10}'.format('Cache', 'hits', 'misses', 'hit rate', 'entries'))
+  for name, hits, misses, entries in caches:
+    lines.append('{0:<34}{1:>8}{2:>10}{3:>10}{4:>10}'.format(name, hits, misses, _rate(hits, misses), entries))
+  if counters:
+    lines.append('')
+    for name, value in counters:
+      lines.append('{0:<34}{1:>8}'.format(name, value))
+  if extra:
+    lines.append('')
+    lines.extend(extra)
+  if recorder.trace_path:
+    lines.append('')
+    lines.append('Trace: {0}'.format(recorder.trace_path))
+  return '\n'.join(lines) + '\n'
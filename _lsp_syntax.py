@@ -0,0 +1,93 @@
+import re
+
+def _ci(word):
+  return ''.join('[{0}{1}]'.format(ch.lower(), ch.upper()) if ch.isalpha() else re.escape(ch) for ch in word)
+
+NUMERIC = r'\b(?:[0-9]+|0[xX][0-9a-fA-F]+)[Ll]?\b|\b(?:(?:[0-9]+[Ee][-]?[0-9]+|(?:[0-9]*\.[0-9]+|[0-9]+\.)(?:[Ee][-]?[0-9]+)?)[fFdD]?|[0-9]+[FfDd])'
+VARIABLE = r'\$[a-zA-Z_][a-zA-Z0-9_]*(?:::[a-zA-Z_][a-zA-Z0-9_]*)*'
+IDENTIFIER = r'[a-zA-Z_][a-zA-Z0-9_]*'
+
+_RULES = (
+  ('string.quoted.single.gscript', r"'"),
+  ('string.quoted.double.gscript', r'"'),
+  ('comment.line.double-slash.gscript', r'//'),
+  ('comment.block.gscript', r'/\*'),
+  ('constant.numeric.gscript', NUMERIC),
+  ('variable.parameter.gscript', VARIABLE),
+  ('storage.type.gscript', r'\b(?:class|extends|implements|import|instanceof|interface|native|package|volatile|throws)\b'),
+  ('keyword.control.gscript', r'\b(?:break|case|continue|default|do|else|elseif|for|function|if|in|return|switch|while|with|xor)\b'),
+  ('storage.modifier.gscript', r'\b(?:public|const|enum)\b'),
+  ('keyword.other.gscript', r'\b(?:new|datablock)\b'),
+  ('constant.language.gscript', r'\b(?:' + '|'.join(_ci(w) for w in ('true', 'false', 'nil', 'null', 'pi')) + r')\b'),
+  ('entity.name.class.gscript', r'\b(?:name)\b'),
+  ('variable.language.gscript', r'\b(?:' + '|'.join(_ci(w) for w in ('this', 'thiso', 'temp', 'server', 'serverr', 'client', 'clientr', 'player')) + r')\b'),
+  ('entity.name.function.gscript', r'\b' + IDENTIFIER + r'(?=\()'),
+  ('keyword.operator.gscript', r'[-~^@/%|=+*!?&<>]'),
+  ('keyword.operator.array.gscript', r'\[|\]'),
+  ('punctuation.gscript', r'[{}();:,.]'),
+)
+
+SCOPES = tuple(scope for scope, _ in _RULES)
+_GROUPS = dict(('g{0}'.format(i), scope) for i, scope in enumerate(SCOPES))
+_MAIN = re.compile('|'.join('(?P<g{0}>{1})'.format(i, pattern) for i, (_, pattern) in enumerate(_RULES)))
+
+STRING_SINGLE = SCOPES[0]
+STRING_DOUBLE = SCOPES[1]
+COMMENT_LINE = SCOPES[2]
+COMMENT_BLOCK = SCOPES[3]
+
+def scope_style(scope):
+  if "comment" in scope:
+    return 'comment'
+  elif "string" in scope:
+    return 'string'
+  elif "constant.numeric" in scope:
+    return 'number'
+  elif "constant" in scope:
+    return 'constant'
+  elif "variable.parameter" in scope:
+    return 'parameter'
+  elif "variable" in scope:
+    return 'variable'
+  elif "keyword" in scope or "storage" in scope:
+    return 'keyword'
+  elif "entity.name.function" in scope:
+    return 'function'
+  elif "keyword.operator" in scope or "punctuation" in scope:
+    return 'operator'
+  return None
+
+STYLE_FOR_SCOPE = dict((scope, scope_style(scope)) for scope in SCOPES)
+
+def _line_end(code, pos):
+  end = code.find('\n', pos)
+  return len(code) if end == -1 else end
+
+def _context_end(code, scope, start):
+  if scope == STRING_SINGLE:
+    line_end = _line_end(code, start + 1)
+    close = code.find("'", start + 1, line_end)
+    return line_end if close == -1 else close + 1
+  if scope == STRING_DOUBLE:
+    close = code.find('"', start + 1)
+    return len(code) if close == -1 else close + 1
+  if scope == COMMENT_LINE:
+    return _line_end(code, start + 2)
+  close = code.find('*/', start + 2)
+  return len(code) if close == -1 else close + 2
+
+def tokenize(code, pos=0, endpos=None):
+  n = len(code) if endpos is None else endpos
+  search = _MAIN.search
+  while pos < n:
+    match = search(code, pos, n)
+    if match is None:
+      return
+    scope = _GROUPS[match.lastgroup]
+    start = match.start()
+    if scope in (STRING_SINGLE, STRING_DOUBLE, COMMENT_LINE, COMMENT_BLOCK):
+      end = _context_end(code, scope, start)
+    else:
+      end = match.end()
+    yield start, end, scope
+    pos = end
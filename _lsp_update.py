@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+import zlib
+
+USER_AGENT = 'SublimeRC/1.0'
+
+def meta_path_for(json_path):
+  return os.path.splitext(json_path)[0] + '.meta.json'
+
+def load_meta(json_path):
+  try:
+    with open(meta_path_for(json_path), 'r', encoding='utf-8') as f:
+      meta = json.load(f)
+    return meta if isinstance(meta, dict) else {}
+  except (OSError, ValueError):
+    return {}
+
+def save_meta(json_path, meta):
+  write_atomic(meta_path_for(json_path), json.dumps(meta, indent=2).encode('utf-8'))
+
+def write_atomic(path, data):
+  directory = os.path.dirname(path)
+  if directory and not os.path.isdir(directory):
+    os.makedirs(directory)
+  temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+  try:
+    with open(temp_path, 'wb') as f:
+      f.write(data)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(temp_path, path)
+  except BaseException:
+    try:
+      os.remove(temp_path)
+    except OSError:
+      pass
+    raise
+
+def _decode_body(data, encoding):
+  encoding = (encoding or '').lower()
+  if encoding == 'gzip':
+    return gzip.decompress(data)
+  if encoding == 'deflate':
+    try:
+      return zlib.decompress(data)
+    except zlib.error:
+      return zlib.decompress(data, -zlib.MAX_WBITS)
+  return data
+
+def fetch(url, etag=None, last_modified=None, timeout=30):
+  headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate'}
+  if etag:
+    headers['If-None-Match'] = etag
+  if last_modified:
+    headers['If-Modified-Since'] = last_modified
+  req = urllib.request.Request(url, headers=headers)
+  try:
+    response = urllib.request.urlopen(req, timeout=timeout)
+  except urllib.error.HTTPError as e:
+    if e.code == 304:
+      return 304, None, e.headers
+    raise
+  try:
+    data = _decode_body(response.read(), response.headers.get('Content-Encoding'))
+    return response.getcode(), data, response.headers
+  finally:
+    response.close()
+
+def update_definitions(url, json_path, timeout=30):
+  meta = load_meta(json_path)
+  if not os.path.exists(json_path):
+    meta = {}
+  status, data, headers = fetch(url, meta.get('etag'), meta.get('last_modified'), timeout)
+  meta['checked_at'] = time.time()
+  if status == 304:
+    save_meta(json_path, meta)
+    return None, 0
+  definitions = json.loads(data.decode('utf-8'))
+  if not isinstance(definitions, dict):
+    raise ValueError("Definitions payload is not a JSON object")
+  write_atomic(json_path, data)
+  meta['etag'] = headers.get('ETag')
+  meta['last_modified'] = headers.get('Last-Modified')
+  save_meta(json_path, meta)
+  return definitions, len(data)
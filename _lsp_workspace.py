@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+  from ._lsp_document import DocumentParse
+  from ._lsp_index import SymbolIndex, fold
+  from ._lsp_records import FixedText, make_definition
+  from ._lsp_references import ReferenceIndex, deserialize_references, extract_references, serialize_references
+  from ._lsp_update import write_atomic
+except (ImportError, SystemError, ValueError):
+  from _lsp_document import DocumentParse
+  from _lsp_index import SymbolIndex, fold
+  from _lsp_records import FixedText, make_definition
+  from _lsp_references import ReferenceIndex, deserialize_references, extract_references, serialize_references
+  from _lsp_update import write_atomic
+
+SCRIPT_EXTENSIONS = ('.gs2', '.gs', '.gscript', '.gscript2')
+CACHE_VERSION = 3
+CACHE_SAVE_DELAY = 5.0
+
+def _default_workers():
+  try:
+    import multiprocessing
+    return min(8, multiprocessing.cpu_count() + 2)
+  except (ImportError, NotImplementedError):
+    return 4
+
+def is_script(path):
+  return path is not None and path.lower().endswith(SCRIPT_EXTENSIONS)
+
+def iter_script_files(folders):
+  for folder in folders:
+    for root, dirs, files in os.walk(folder):
+      dirs[:] = [d for d in dirs if not d.startswith('.')]
+      for filename in files:
+        if is_script(filename):
+          yield os.path.join(root, filename)
+
+def read_script(path):
+  with open(path, 'rb') as f:
+    return f.read().decode('utf-8', 'replace')
+
+def cache_key_for(folders):
+  return hashlib.sha1('\n'.join(sorted(folders)).encode('utf-8')).hexdigest()
+
+def _attach_file(functions, path):
+  texts = FixedText('User-defined function in {0}'.format(os.path.basename(path)))
+  path = sys.intern(path)
+  for info in functions.values():
+    info.file = path
+    info.texts = texts
+  return functions
+
+def extract_functions(path, text):
+  return _attach_file(DocumentParse(text).functions, path)
+
+def _cached_record(path, cached):
+  if isinstance(cached, dict) and isinstance(cached.get('functions'), dict):
+    refs = deserialize_references(cached.get('refs'))
+    if refs is not None:
+      functions = dict((name, make_definition(info)) for name, info in cached['functions'].items())
+      return _attach_file(functions, path), refs
+  return None, None
+
+def _scan_file(path, cached):
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return path, None, False
+  functions, refs = _cached_record(path, cached)
+  if functions is not None and cached.get('mtime') == stat.st_mtime and cached.get('size') == stat.st_size:
+    return path, dict(cached, functions=functions, refs=refs), True
+  try:
+    with open(path, 'rb') as f:
+      data = f.read()
+  except OSError:
+    return path, None, False
+  digest = hashlib.sha1(data).hexdigest()
+  if functions is not None and cached.get('hash') == digest:
+    return path, {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest, 'functions': functions, 'refs': refs}, True
+  try:
+    text = data.decode('utf-8', 'replace')
+    functions = extract_functions(path, text)
+    refs = extract_references(text)
+  except ValueError:
+    return path, None, False
+  return path, {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest, 'functions': functions, 'refs': refs}, False
+
+class WorkspaceIndex(object):
+  def __init__(self, folders, max_workers=None, cache_path=None):
+    self.folders = tuple(folders)
+    self.max_workers = max_workers or _default_workers()
+    self.cache_path = cache_path
+    self.files = {}
+    self.index = SymbolIndex()
+    self.references = ReferenceIndex()
+    self.generation = 0
+    self.ready = False
+    self.cache_hits = 0
+    self.cache_misses = 0
+    self._records = {}
+    self._by_key = {}
+    self._lock = threading.Lock()
+    self._save_timer = None
+
+  def contains(self, path):
+    if not is_script(path):
+      return False
+    path = os.path.abspath(path)
+    for folder in self.folders:
+      folder = os.path.abspath(folder)
+      if path == folder or path.startswith(folder.rstrip(os.sep) + os.sep):
+        return True
+    return False
+
+  def scan(self):
+    cache = self.load_cache()
+    paths = list(iter_script_files(self.folders))
+    records = {}
+    refs = {}
+    hits = misses = 0
+    with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+      for path, record, hit in pool.map(_scan_file, paths, [cache.get(path) for path in paths]):
+        if record is None:
+          continue
+        refs[path] = record.pop('refs')
+        records[path] = record
+        if hit:
+          hits += 1
+        else:
+          misses += 1
+    with self._lock:
+      self._records = records
+      self.files = dict((path, record['functions']) for path, record in records.items())
+    self.references.replace(refs)
+    self.cache_hits, self.cache_misses = hits, misses
+    self.rebuild()
+    self.ready = True
+    if misses or len(records) != len(cache):
+      self.save_cache()
+    return len(records)
+
+  def update_file(self, path):
+    self.update_files([path])
+
+  def update_files(self, paths):
+    changed = False
+    for path in paths:
+      _, record, _ = _scan_file(path, None)
+      if record is None:
+        self.references.remove_file(path)
+        with self._lock:
+          self._records.pop(path, None)
+          changed = self.files.pop(path, None) is not None or changed
+        continue
+      self.references.set_file(path, record.pop('refs'))
+      with self._lock:
+        self._records[path] = record
+        self.files[path] = record['functions']
+      changed = True
+    if changed:
+      self.rebuild()
+      self._schedule_save()
+
+  def remove_file(self, path):
+    self.references.remove_file(path)
+    with self._lock:
+      self._records.pop(path, None)
+      if self.files.pop(path, None) is None:
+        return
+    self.rebuild()
+    self._schedule_save()
+
+  def load_cache(self):
+    if not self.cache_path:
+      return {}
+    try:
+      with open(self.cache_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+      if data.get('version') != CACHE_VERSION or data.get('folders') != list(self.folders):
+        return {}
+      files = data.get('files')
+      return files if isinstance(files, dict) else {}
+    except (OSError, ValueError, AttributeError):
+      return {}
+
+  def save_cache(self):
+    if not self.cache_path:
+      return
+    with self._lock:
+      records = dict(self._records)
+    files = self.references.files
+    for path, record in records.items():
+      functions = dict((name, info.fields()) for name, info in record['functions'].items())
+      records[path] = dict(record, functions=functions, refs=serialize_references(files.get(path, {})))
+    data = {'version': CACHE_VERSION, 'folders': list(self.folders), 'files': records}
+    try:
+      write_atomic(self.cache_path, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+    except (OSError, TypeError, ValueError):
+      pass
+
+  def _schedule_save(self):
+    if not self.cache_path:
+      return
+    with self._lock:
+      if self._save_timer is not None:
+        self._save_timer.cancel()
+      self._save_timer = threading.Timer(CACHE_SAVE_DELAY, self.save_cache)
+      self._save_timer.daemon = True
+      self._save_timer.start()
+
+  def rebuild(self):
+    with self._lock:
+      items = sorted(self.files.items())
+    merged = {}
+    by_key = {}
+    for path, functions in items:
+      for name, info in functions.items():
+        merged.setdefault(name, info)
+        by_key.setdefault(fold(name), []).append(info)
+    index = SymbolIndex(merged)
+    index.prepare_fuzzy()
+    self._by_key = by_key
+    self.index = index
+    self.generation += 1
+
+  def find_references(self, word):
+    return self.references.lookup(word)
+
+  def lookup_all(self, word):
+    return list(self._by_key.get(fold(word), ()))
+
+  def symbol_count(self):
+    return len(self.index)
@@ -0,0 +1,84 @@
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_index import CompletionSession, SymbolIndex, SymbolTable
+
+def make_definitions(count, seed=1):
+  rng = random.Random(seed)
+  definitions = {}
+  while len(definitions) < count:
+    length = rng.randint(4, 18)
+    name = ''.join(rng.choice(string.ascii_letters) for _ in range(length))
+    definitions[name] = {'params': ['a', 'b'], 'returns': 'void', 'description': 'desc', 'scope': 'global'}
+  return definitions
+
+def linear_scan(definitions, prefix, max_results):
+  prefix_lower = prefix.lower()
+  result = []
+  for name, info in definitions.items():
+    if len(result) >= max_results:
+      break
+    if name.lower().startswith(prefix_lower):
+      result.append((name, info))
+  return result
+
+def indexed(index, prefix, max_results):
+  return list(index.iter_prefix(prefix, max_results))
+
+def fuzzy(table, query, max_results):
+  return table.fuzzy(query, max_results)
+
+def typing(table, words, max_results):
+  start = time.time()
+  keystrokes = 0
+  for word in words:
+    session = CompletionSession()
+    for end in range(2, len(word) + 1):
+      session.complete(table, None, word[:end], max_results)
+      keystrokes += 1
+  return (time.time() - start) / keystrokes
+
+def timeit(fn, prefixes, repeat):
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for prefix in prefixes:
+      fn(prefix)
+    elapsed = (time.perf_counter() - start) / len(prefixes)
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  definitions = make_definitions(count)
+  start = time.perf_counter()
+  index = SymbolIndex(definitions)
+  build = time.perf_counter() - start
+  rng = random.Random(2)
+  names = list(definitions)
+  prefixes = [rng.choice(names)[:rng.randint(1, 4)] for _ in range(200)]
+  scan = timeit(lambda p: linear_scan(definitions, p, 200), prefixes, 3)
+  fast = timeit(lambda p: indexed(index, p, 200), prefixes, 3)
+  table = SymbolTable((SymbolIndex(make_definitions(500, seed=3)), index))
+  table.fuzzy('warm', 1)
+  queries = []
+  for _ in range(100):
+    name = rng.choice(names).lower()
+    picks = sorted(rng.sample(range(len(name)), min(len(name), rng.randint(2, 4))))
+    queries.append(''.join(name[i] for i in picks))
+  ranked = timeit(lambda q: fuzzy(table, q, 200), queries, 3)
+  narrowed = typing(table, [rng.choice(names).lower()[:8] for _ in range(50)], 200)
+  print("symbols: {0}".format(count))
+  print("index build: {0:.2f} ms".format(build * 1000))
+  print("linear scan: {0:.3f} ms/keystroke".format(scan * 1000))
+  print("prefix index: {0:.3f} ms/keystroke".format(fast * 1000))
+  print("fuzzy top-200: {0:.3f} ms/keystroke".format(ranked * 1000))
+  print("fuzzy session (typing): {0:.3f} ms/keystroke".format(narrowed * 1000))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_syntax import tokenize
+
+EXAMPLE = '''function onCreated() {
+  temp.count = 0x1F + 3.5; // counter
+  player.chat = "Hello " @ player.account;
+  for (temp.i = 0; temp.i < 10; temp.i++) {
+    echo(format("%s: %d", $pref::name, temp.i));
+  }
+  /* done */
+}
+'''
+
+def main():
+  repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  start = time.perf_counter()
+  tokens = 0
+  for _ in range(repeat):
+    for _ in tokenize(EXAMPLE):
+      tokens += 1
+  elapsed = time.perf_counter() - start
+  print("example: {0} chars".format(len(EXAMPLE)))
+  print("tokenize: {0:.3f} ms/example ({1} tokens)".format(elapsed * 1000 / repeat, tokens // repeat))
+
+if __name__ == '__main__':
+  main()
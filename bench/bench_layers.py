@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from _lsp_layers import DefinitionLayer, check_layers
+from bench_plugin import make_definitions, summarize
+
+def write_json(path, definitions):
+  with open(path, 'w', encoding='utf-8') as f:
+    json.dump(definitions, f)
+
+def touch(path, definitions, serial):
+  definitions = dict(definitions)
+  definitions['projectHelper{0}'.format(serial)] = {'params': ['a'], 'description': 'edit {0}'.format(serial)}
+  write_json(path, definitions)
+  stat = os.stat(path)
+  os.utime(path, (stat.st_atime, stat.st_mtime + serial))
+
+def main():
+  parser = argparse.ArgumentParser(description="Time rebuilding one definition layer against reloading every layer")
+  parser.add_argument('--definitions', type=int, default=100000)
+  parser.add_argument('--user', type=int, default=2000)
+  parser.add_argument('--project', type=int, default=500)
+  parser.add_argument('--iterations', type=int, default=20)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='gscript-layers-')
+  try:
+    api_path = os.path.join(workdir, 'api_definitions.json')
+    user_path = os.path.join(workdir, 'user.json')
+    project_path = os.path.join(workdir, 'project.json')
+    write_json(api_path, make_definitions(args.definitions, args.seed))
+    write_json(user_path, make_definitions(args.user, args.seed + 1))
+    project = make_definitions(args.project, args.seed + 2)
+    write_json(project_path, project)
+    layers = [DefinitionLayer('upstream', api_path, bundled=True), DefinitionLayer('user', user_path), DefinitionLayer('project', project_path)]
+    check_layers(layers, lambda changed: None)
+
+    full = []
+    for _ in range(args.iterations):
+      start = time.perf_counter()
+      check_layers(layers, lambda changed: None, force=True)
+      full.append(time.perf_counter() - start)
+    single = []
+    rebuilt = set()
+    for serial in range(1, args.iterations + 1):
+      touch(project_path, project, serial)
+      start = time.perf_counter()
+      changed = check_layers(layers, lambda changed: None)
+      single.append(time.perf_counter() - start)
+      rebuilt.update(layer.name for layer in changed)
+    idle = []
+    for _ in range(args.iterations):
+      start = time.perf_counter()
+      check_layers(layers, lambda changed: None)
+      idle.append(time.perf_counter() - start)
+    report = {
+      'definitions': dict((layer.name, len(layer)) for layer in layers),
+      'reload_all': summarize(full),
+      'rebuild_project_layer': summarize(single),
+      'rebuilt_layers': sorted(rebuilt),
+      'unchanged_check': summarize(idle),
+    }
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+  print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+  main()
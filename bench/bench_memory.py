@@ -0,0 +1,97 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from _lsp_bundle import Bundle, write_bundle
+from _lsp_document import DocumentParse
+from _lsp_index import annotation_for
+from _lsp_records import compact_definitions
+from bench_plugin import make_definitions, make_script, summarize
+
+def retained(build):
+  gc.collect()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  value = build()
+  gc.collect()
+  size = tracemalloc.get_traced_memory()[0] - before
+  tracemalloc.stop()
+  return value, size
+
+def touch(definitions):
+  for info in definitions.values():
+    info.get('params')
+
+def lookups(definitions, names):
+  samples = []
+  for name in names:
+    start = time.perf_counter()
+    info = definitions[name]
+    info.get('params', [])
+    info.get('returns', 'void')
+    info.get('description', '')
+    annotation_for(info)
+    samples.append(time.perf_counter() - start)
+  return summarize(samples)
+
+def report_for(definitions, size, names):
+  return {'bytes': size, 'bytes_per_definition': size // max(1, len(definitions)), 'lookup': lookups(definitions, names)}
+
+def main():
+  parser = argparse.ArgumentParser(description="Compare memory and lookup cost of definition representations")
+  parser.add_argument('--definitions', type=int, default=100000)
+  parser.add_argument('--lines', type=int, default=200000)
+  parser.add_argument('--queries', type=int, default=20000)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  data = json.dumps(make_definitions(args.definitions, args.seed))
+  rng = random.Random(args.seed)
+  names = sorted(json.loads(data))
+  queries = [rng.choice(names) for _ in range(args.queries)]
+  report = {'definitions': args.definitions}
+
+  plain, size = retained(lambda: json.loads(data))
+  report['dicts'] = report_for(plain, size, queries)
+  records, size = retained(lambda: compact_definitions(json.loads(data)))
+  report['records'] = report_for(records, size, queries)
+  del records
+
+  workdir = tempfile.mkdtemp(prefix='gscript-memory-')
+  try:
+    path = os.path.join(workdir, 'api_definitions.bundle')
+    write_bundle(path, plain)
+    del plain
+    bundle = Bundle(path)
+    entries, size = retained(lambda: bundle.load()[0])
+    report['bundle_untouched_bytes'] = size
+    _, size = retained(lambda: touch(entries))
+    report['bundle'] = report_for(entries, report['bundle_untouched_bytes'] + size, queries)
+    del entries
+    bundle.close()
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+
+  text = make_script(args.lines, ['echo'], args.seed)
+  functions, size = retained(lambda: DocumentParse(text).functions)
+  report['document_functions'] = {'functions': len(functions), 'records_bytes': size}
+  legacy, size = retained(lambda: dict((name, dict(info.to_dict(), name=name, params=list(info['params'])))
+    for name, info in functions.items()))
+  report['document_functions']['dicts_bytes'] = size
+  print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,117 @@
+import argparse
+import csv
+import functools
+import http.server
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from _lsp_players import PlayerDirectory
+from bench_plugin import summarize
+
+def make_players(count, seed):
+  rng = random.Random(seed)
+  players = []
+  for i in range(count):
+    if rng.random() < 0.4:
+      account = 'Graal{0}'.format(1000000 + i)
+    else:
+      account = ''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(4, 10))) + str(i)
+    players.append({
+      'account': account,
+      'nick': ''.join(rng.choice(string.ascii_letters + ' ') for _ in range(rng.randint(3, 16))),
+      'level': rng.choice(('onlinestartlocal.nw', 'era_start.nw', 'house1.nw')),
+      'id': i + 1,
+      'badges': rng.choice(([], ['RC'], ['Staff'], ['RC', 'Staff'])),
+    })
+  return players
+
+def write_dumps(workdir, players):
+  json_path = os.path.join(workdir, 'players.json')
+  with open(json_path, 'w', encoding='utf-8') as f:
+    json.dump(players, f)
+  csv_path = os.path.join(workdir, 'players.csv')
+  with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(('account', 'nick', 'level', 'id', 'badges'))
+    for player in players:
+      writer.writerow((player['account'], player['nick'], player['level'], player['id'], ';'.join(player['badges'])))
+  return json_path, csv_path
+
+def timed_load(directory, **kwargs):
+  start = time.perf_counter()
+  directory.refresh(**kwargs)
+  return round((time.perf_counter() - start) * 1000, 2)
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+  def log_message(self, *args):
+    pass
+
+def serve(folder):
+  handler = functools.partial(QuietHandler, directory=folder)
+  server = http.server.HTTPServer(('127.0.0.1', 0), handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server
+
+def main():
+  parser = argparse.ArgumentParser(description="Time player dump loading and lookups")
+  parser.add_argument('--players', type=int, default=300000)
+  parser.add_argument('--queries', type=int, default=2000)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='gscript-players-')
+  try:
+    players = make_players(args.players, args.seed)
+    json_path, csv_path = write_dumps(workdir, players)
+    directory = PlayerDirectory()
+    report = {'players': args.players}
+    report['load_csv_ms'] = timed_load(directory, path=csv_path)
+    report['load_json_ms'] = timed_load(directory, path=json_path)
+    report['unchanged_file_ms'] = timed_load(directory, path=json_path)
+
+    rng = random.Random(args.seed)
+    accounts = [rng.choice(players)['account'] for _ in range(args.queries)]
+    samples = []
+    for account in accounts:
+      prefix = account[:rng.randint(1, 4)].lower()
+      start = time.perf_counter()
+      directory.completions(prefix)
+      samples.append(time.perf_counter() - start)
+    report['completions'] = summarize(samples)
+    samples = []
+    for account in accounts + [account + 'x' for account in accounts]:
+      start = time.perf_counter()
+      directory.info(account.upper())
+      samples.append(time.perf_counter() - start)
+    report['info'] = summarize(samples)
+
+    server = serve(workdir)
+    try:
+      url = 'http://127.0.0.1:{0}/players.json'.format(server.server_address[1])
+      remote = PlayerDirectory()
+      report['load_url_ms'] = timed_load(remote, url=url)
+      start = time.perf_counter()
+      changed = remote.refresh(url=url)
+      report['unchanged_url_ms'] = round((time.perf_counter() - start) * 1000, 2)
+      report['unchanged_url_reloaded'] = changed
+    finally:
+      server.shutdown()
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+  print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,307 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+PACKAGE = 'SublimeRC'
+
+sys.path.insert(0, BENCH_DIR)
+
+import sublime_stub
+
+WORDS = ('get', 'set', 'player', 'level', 'npc', 'attr', 'chat', 'weapon', 'gui', 'control', 'find', 'add',
+  'remove', 'update', 'ani', 'sound', 'image', 'text', 'draw', 'join', 'trigger', 'server', 'client', 'timer')
+SCOPES = ('global', 'clientside', 'serverside')
+EXAMPLE = '''function onCreated() {
+  temp.count = 0x1F + 3.5; // counter
+  player.chat = "Hello " @ player.account;
+  echo(format("%s: %d", $pref::name, temp.count));
+}'''
+
+def make_name(rng):
+  parts = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+  name = parts[0] + ''.join(part.capitalize() for part in parts[1:])
+  return name + ''.join(rng.choice(string.digits) for _ in range(rng.randint(0, 3)))
+
+def make_definitions(count, seed=1):
+  rng = random.Random(seed)
+  definitions = {}
+  while len(definitions) < count:
+    name = make_name(rng)
+    if name in definitions:
+      name += rng.choice(string.ascii_uppercase)
+    definitions[name] = {
+      'params': ['arg{0}'.format(i) for i in range(rng.randint(0, 4))],
+      'returns': rng.choice(('void', 'int', 'string', 'object')),
+      'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+      'example': EXAMPLE if rng.random() < 0.5 else '',
+      'scope': rng.choice(SCOPES),
+    }
+  return definitions
+
+def make_script(lines, names, seed=1):
+  rng = random.Random(seed)
+  out = []
+  while len(out) < lines:
+    out.append('function {0}{1}(a, b) {{'.format(make_name(rng), len(out)))
+    for _ in range(rng.randint(3, 12)):
+      name = rng.choice(names)
+      out.append('  temp.x = {0}("text, with comma", temp.y, {1}); // note'.format(name, rng.randint(0, 99)))
+    out.append('}')
+    if len(out) > lines // 2 and '//#CLIENTSIDE' not in out:
+      out.append('//#CLIENTSIDE')
+  return '\n'.join(out[:lines]) + '\n'
+
+def summarize(samples):
+  samples = sorted(samples)
+  count = len(samples)
+  return {
+    'count': count,
+    'mean_ms': round(sum(samples) * 1000 / count, 4),
+    'p50_ms': round(samples[count // 2] * 1000, 4),
+    'p95_ms': round(samples[min(count - 1, int(count * 0.95))] * 1000, 4),
+    'max_ms': round(samples[-1] * 1000, 4),
+  }
+
+def measure(fn, args_list):
+  samples = []
+  for args in args_list:
+    start = time.perf_counter()
+    fn(*args)
+    samples.append(time.perf_counter() - start)
+  return summarize(samples)
+
+def load_plugin(packages_path, cache_path):
+  sublime_stub.install(packages_path, cache_path)
+  package = types.ModuleType(PACKAGE)
+  package.__path__ = [ROOT]
+  sys.modules[PACKAGE] = package
+  return importlib.import_module(PACKAGE + '._lsp')
+
+def bench_definitions(lsp, packages_path, count, iterations, seed):
+  listener_cls = lsp.GScriptLspListener
+  definitions = make_definitions(count, seed)
+  target = os.path.join(packages_path, PACKAGE, 'api_definitions.json')
+  if not os.path.isdir(os.path.dirname(target)):
+    os.makedirs(os.path.dirname(target))
+  with open(target, 'w', encoding='utf-8') as f:
+    json.dump(definitions, f)
+  bundle_path = lsp.bundle_path_for(target)
+  if os.path.exists(bundle_path):
+    os.remove(bundle_path)
+  result = {'definitions': count}
+  start = time.perf_counter()
+  listener_cls.reload_api_definitions()
+  result['load_json_ms'] = round((time.perf_counter() - start) * 1000, 2)
+  start = time.perf_counter()
+  listener_cls.reload_api_definitions()
+  result['load_bundle_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+  rng = random.Random(seed)
+  names = sorted(definitions)
+  view = sublime_stub.View(make_script(200, names, seed))
+  listener = listener_cls(view)
+  point = view.size()
+  words = [rng.choice(names) for _ in range(iterations)]
+
+  prefixes = [(word[:rng.randint(1, 4)], [point]) for word in words]
+  result['on_query_completions'] = measure(listener.on_query_completions, prefixes)
+  typed = []
+  for word in words[:max(1, iterations // 8)]:
+    typed.extend((word[:end], [point]) for end in range(1, min(len(word), 8) + 1))
+  result['on_query_completions_typing'] = measure(listener.on_query_completions, typed)
+
+  result['hover_lookup'] = measure(lambda word: listener.symbol_table().get(word), [(word,) for word in words])
+  lsp._popup_cache.clear()
+  hover_view = sublime_stub.View('\n'.join('  {0}(1);'.format(word) for word in words))
+  hover_listener = listener_cls(hover_view)
+  hover_points = [(hover_view.text_point(row, 3), lsp.sublime.HOVER_TEXT) for row in range(len(words))]
+  def hover(point, zone):
+    hover_listener.on_hover(point, zone)
+    sublime_stub.drain()
+  result['on_hover'] = measure(hover, hover_points)
+
+  calls = [name for name in words if definitions[name]['params']] or words
+  hint_text = '\n'.join('  {0}(a, "b, c", [d, e], f);'.format(name) for name in calls)
+  hint_view = sublime_stub.View(hint_text)
+  hint_listener = listener_cls(hint_view)
+  def hint(point):
+    hint_view.sel().clear()
+    hint_view.sel().add(point)
+    hint_listener.show_param_hint()
+  points = []
+  for row, name in enumerate(calls):
+    base = hint_view.text_point(row, 2 + len(name) + 1)
+    points.extend([(base,), (base + 4,), (base + 12,)])
+  result['show_param_hint'] = measure(hint, points)
+  result['popup_calls'] = hint_view.popup_calls
+  return result
+
+def bench_script(lsp, lines, names, seed):
+  listener_cls = lsp.GScriptLspListener
+  text = make_script(lines, names, seed)
+  view = sublime_stub.View(text)
+  listener = listener_cls(view)
+  def drain():
+    while listener.state.job is not None:
+      listener._parse_slice(listener.state.job)
+  drain()
+  repeat = max(1, 20000 // lines)
+  result = {'lines': lines, 'chars': len(text), 'functions': len(listener.document_functions)}
+  def parse():
+    listener.parse_document_functions()
+    drain()
+  result['parse_document_functions'] = measure(parse, [()] * repeat)
+
+  rng = random.Random(seed)
+  edits = []
+  for _ in range(200):
+    point = rng.randint(0, len(text) - 1)
+    edits.append(([(point, point, 'x')],))
+    edits.append(([(point, point + 1, '')],))
+  result['apply_text_changes'] = measure(listener.apply_text_changes, edits)
+
+  lookup = listener.symbol_table().lookup
+  matches = list(listener.document.matches)
+  def diagnostics_full():
+    listener._diagnostics.__init__()
+    listener._diagnostics.check(text, matches, lookup, 'bench')
+  result['diagnostics_full'] = measure(diagnostics_full, [()] * max(1, repeat // 4))
+  listener._diagnostics.check(text, matches, lookup, 'bench')
+  edited = []
+  for _ in range(50):
+    point = text.find('temp.y', rng.randint(0, len(text) - 1))
+    if point != -1:
+      edited.append((text[:point] + 'temp.z' + text[point + 6:],))
+  result['diagnostics_incremental'] = measure(lambda changed: listener._diagnostics.check(changed, matches, lookup, 'bench'), edited)
+
+  def scroll(begin):
+    view.viewport = (begin, min(len(text), begin + 4000))
+    listener.refresh_semantic()
+  steps = [(begin,) for begin in range(0, len(text), 1200)][:2000]
+  listener._semantic_covered = None
+  result['semantic_scroll'] = measure(scroll, steps)
+  result['semantic_scroll_cached'] = measure(scroll, steps)
+
+  def highlight():
+    lsp._highlight_cache.clear()
+    lsp.syntax_highlight_gscript(text, view)
+  result['syntax_highlight_gscript'] = measure(highlight, [()] * max(1, repeat // 4))
+  return result
+
+def run_frames(keystroke, keys):
+  frames = []
+  typing = []
+  while sublime_stub._timeouts:
+    start = time.perf_counter()
+    sublime_stub._timeouts.pop(0)()
+    frames.append(time.perf_counter() - start)
+    if keys:
+      start = time.perf_counter()
+      keystroke(*keys.pop())
+      typing.append(time.perf_counter() - start)
+  return frames, typing
+
+def bench_large_file(lsp, lines, names, seed):
+  listener_cls = lsp.GScriptLspListener
+  settings = sublime_stub.load_settings("SublimeRC.sublime-settings")
+  settings.set("diagnostics_enabled", False)
+  settings.set("semantic_highlighting", False)
+  text = make_script(lines, names, seed)
+  result = {'lines': lines, 'chars': len(text)}
+  start = time.perf_counter()
+  lsp.DocumentParse(text)
+  result['blocking_parse_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+  del sublime_stub._timeouts[:]
+  view = sublime_stub.View(text)
+  start = time.perf_counter()
+  listener = listener_cls(view)
+  result['open_ms'] = round((time.perf_counter() - start) * 1000, 2)
+  result['large_file_mode'] = listener.state.large
+  rng = random.Random(seed)
+  point = text.find('temp.y') + 6
+  def keystroke(prefix):
+    listener.on_query_completions(prefix, [point])
+    view.sel().clear()
+    view.sel().add(point)
+    listener.show_param_hint()
+  keys = [(rng.choice(names)[:rng.randint(1, 4)],) for _ in range(1000)]
+  frames, typing = run_frames(keystroke, keys)
+  result['parse_frames'] = summarize(frames)
+  result['typing_while_parsing'] = summarize(typing)
+  result['functions'] = len(listener.document_functions)
+
+  samples = []
+  for _ in range(500):
+    pos = rng.randint(0, view.size() - 1)
+    view.set_text(view._text[:pos] + 'x' + view._text[pos:])
+    start = time.perf_counter()
+    listener.apply_text_changes([(pos, pos, 'x')])
+    keystroke('x')
+    samples.append(time.perf_counter() - start)
+  del sublime_stub._timeouts[:]
+  result['typing'] = summarize(samples)
+
+  listener.parse_document_functions()
+  frames, typing = run_frames(keystroke, [('get',)] * 1000)
+  result['reparse_frames'] = summarize(frames)
+  result['typing_while_reparsing'] = summarize(typing)
+  settings.erase("diagnostics_enabled")
+  settings.erase("semantic_highlighting")
+  return result
+
+def main():
+  parser = argparse.ArgumentParser(description="Headless benchmarks for the GScript plugin")
+  parser.add_argument('--definitions', default='1000,10000,100000')
+  parser.add_argument('--lines', default='1000,10000,100000')
+  parser.add_argument('--large-lines', default='100000')
+  parser.add_argument('--iterations', type=int, default=200)
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--output', default='-')
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='gscript-bench-')
+  try:
+    packages_path = os.path.join(workdir, 'Packages')
+    report = {
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'seed': args.seed,
+      'definitions': [],
+      'scripts': [],
+      'large_files': [],
+    }
+    names = []
+    with contextlib.redirect_stdout(sys.stderr):
+      lsp = load_plugin(packages_path, os.path.join(workdir, 'Cache'))
+      for count in [int(v) for v in args.definitions.split(',') if v]:
+        report['definitions'].append(bench_definitions(lsp, packages_path, count, args.iterations, args.seed))
+        names = sorted(lsp.GScriptLspListener.api_definitions)
+      for lines in [int(v) for v in args.lines.split(',') if v]:
+        report['scripts'].append(bench_script(lsp, lines, names or ['echo'], args.seed))
+      for lines in [int(v) for v in args.large_lines.split(',') if v]:
+        report['large_files'].append(bench_large_file(lsp, lines, names or ['echo'], args.seed))
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+
+  data = json.dumps(report, indent=2, sort_keys=True)
+  if args.output == '-':
+    print(data)
+  else:
+    with open(args.output, 'w', encoding='utf-8') as f:
+      f.write(data + '\n')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from _lsp_workspace import WorkspaceIndex
+from bench_plugin import make_script, summarize
+
+def make_tree(root, files, lines, seed):
+  rng = random.Random(seed)
+  shared = ['sharedCall{0}'.format(i) for i in range(200)]
+  for i in range(files):
+    folder = os.path.join(root, 'dir{0}'.format(i % 50))
+    if not os.path.isdir(folder):
+      os.makedirs(folder)
+    text = make_script(lines, shared + ['echo', 'format'], seed + i)
+    text += '$pref::counter{0} = sharedCall{1}($pref::total);\n'.format(rng.randint(0, 9), rng.randint(0, 199))
+    with open(os.path.join(folder, 'script{0}.gs2'.format(i)), 'w', encoding='utf-8') as f:
+      f.write(text)
+  return shared
+
+def main():
+  parser = argparse.ArgumentParser(description="Build the workspace reference index and time lookups")
+  parser.add_argument('--files', type=int, default=5000)
+  parser.add_argument('--lines', type=int, default=200)
+  parser.add_argument('--queries', type=int, default=500)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  workdir = tempfile.mkdtemp(prefix='gscript-refs-')
+  try:
+    tree = os.path.join(workdir, 'scripts')
+    shared = make_tree(tree, args.files, args.lines, args.seed)
+    cache_path = os.path.join(workdir, 'workspace.json')
+    report = {'files': args.files, 'lines_per_file': args.lines}
+
+    workspace = WorkspaceIndex([tree], cache_path=cache_path)
+    start = time.perf_counter()
+    workspace.scan()
+    report['cold_scan_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    workspace = WorkspaceIndex([tree], cache_path=cache_path)
+    start = time.perf_counter()
+    workspace.scan()
+    report['cached_scan_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    report['identifiers'] = len(workspace.references)
+
+    rng = random.Random(args.seed)
+    words = [rng.choice(shared) for _ in range(args.queries)] + ['$pref::total', 'echo']
+    samples = []
+    hits = 0
+    for word in words:
+      start = time.perf_counter()
+      hits += len(workspace.find_references(word))
+      samples.append(time.perf_counter() - start)
+    report['find_references'] = summarize(samples)
+    report['mean_hits'] = hits // len(words)
+
+    paths = sorted(workspace.files)
+    samples = []
+    for path in [rng.choice(paths) for _ in range(20)]:
+      with open(path, 'a', encoding='utf-8') as f:
+        f.write('sharedCall0(1);\n')
+      start = time.perf_counter()
+      workspace.update_file(path)
+      samples.append(time.perf_counter() - start)
+    report['update_file'] = summarize(samples)
+  finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+  print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+  main()
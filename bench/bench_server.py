@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from _lsp_rpc import LanguageClient, path_to_uri
+from bench_plugin import make_definitions, summarize
+
+SCRIPT = '''function onCreated() {
+  temp.total = addPlayerLevel(1, "a, b", [2, 3],
+}
+
+function helperCall(a, b) {
+  return a + b;
+}
+//#CLIENTSIDE
+function onPlayerEnters() {
+  helperCall(1, 2);
+}
+'''
+
+class Failure(Exception):
+  pass
+
+def expect(condition, message):
+  if not condition:
+    raise Failure(message)
+
+def timed_request(client, samples, method, params):
+  start = time.perf_counter()
+  result = client.request_sync(method, params, timeout=30)
+  samples.setdefault(method, []).append(time.perf_counter() - start)
+  return result
+
+def position(text, needle, offset=0):
+  point = text.index(needle) + offset
+  line = text.count('\n', 0, point)
+  return {'line': line, 'character': point - (text.rfind('\n', 0, point) + 1)}
+
+def run(client, workdir, count, iterations):
+  definitions = make_definitions(count)
+  definitions['addPlayerLevel'] = {'params': ['level', 'label', 'items', 'flags'], 'returns': 'int', 'description': 'Adds levels', 'scope': 'serverside'}
+  json_path = os.path.join(workdir, 'api_definitions.json')
+  with open(json_path, 'w', encoding='utf-8') as f:
+    json.dump(definitions, f)
+  script_dir = os.path.join(workdir, 'scripts')
+  os.makedirs(script_dir)
+  with open(os.path.join(script_dir, 'shared.gs2'), 'w', encoding='utf-8') as f:
+    f.write('function sharedHelper(x) {\n  return x;\n}\n')
+
+  samples = {}
+  start = time.perf_counter()
+  result = timed_request(client, samples, 'initialize', {
+    'processId': os.getpid(),
+    'capabilities': {'general': {'positionEncodings': ['utf-32']}},
+    'workspaceFolders': [{'uri': path_to_uri(script_dir), 'name': 'scripts'}],
+    'initializationOptions': {'definitionsPath': json_path},
+  })
+  capabilities = result['capabilities']
+  expect(capabilities.get('positionEncoding') == 'utf-32', "server did not accept utf-32 positions")
+  expect(capabilities.get('hoverProvider') and capabilities.get('definitionProvider'), "missing capabilities")
+  client.notify('initialized', {})
+  deadline = time.time() + 60
+  while not client.definitions_loaded and time.time() < deadline:
+    time.sleep(0.01)
+  expect(client.definitions_loaded, "definitions were not loaded")
+  load_ms = (time.perf_counter() - start) * 1000
+
+  uri = 'buffer:1'
+  text = SCRIPT
+  client.notify('textDocument/didOpen', {'textDocument': {'uri': uri, 'languageId': 'gscript', 'version': 1, 'text': text}})
+  doc = {'uri': uri}
+
+  hint = timed_request(client, samples, 'textDocument/signatureHelp', {'textDocument': doc, 'position': position(text, '[2, 3],', 7)})
+  expect(hint and hint['activeParameter'] == 3, "wrong active parameter: {0}".format(hint and hint['activeParameter']))
+  expect(hint['signatures'][0]['label'] == 'addPlayerLevel(level, label, items, flags)', "wrong signature label")
+
+  hover = timed_request(client, samples, 'textDocument/hover', {'textDocument': doc, 'position': position(text, 'addPlayerLevel', 3)})
+  expect(hover and hover['gscript']['name'] == 'addPlayerLevel', "hover did not resolve addPlayerLevel")
+
+  location = timed_request(client, samples, 'textDocument/definition', {'textDocument': doc, 'position': position(text, 'helperCall(1', 2)})
+  expect(location and location[0]['range']['start']['line'] == 4, "definition of helperCall not found")
+
+  insert_at = position(text, '}\n\nfunction helperCall')
+  client.notify('textDocument/didChange', {'textDocument': {'uri': uri, 'version': 2}, 'contentChanges': [
+    {'range': {'start': insert_at, 'end': insert_at}, 'text': '  helperCall(1, 2);\n  sharedHe'},
+  ]})
+  text = text.replace('}\n\nfunction helperCall', '  helperCall(1, 2);\n  sharedHe}\n\nfunction helperCall', 1)
+  completion = timed_request(client, samples, 'textDocument/completion', {'textDocument': doc, 'position': position(text, 'sharedHe', 8)})
+  labels = [item['label'] for item in completion['items']]
+  deadline = time.time() + 10
+  while 'sharedHelper' not in labels and time.time() < deadline:
+    time.sleep(0.05)
+    labels = [item['label'] for item in client.request_sync('textDocument/completion', {'textDocument': doc, 'position': position(text, 'sharedHe', 8)})['items']]
+  expect('sharedHelper' in labels, "workspace function missing from completions")
+
+  names = sorted(definitions)
+  for i in range(iterations):
+    name = names[(i * 7919) % len(names)]
+    line = 'x = {0}('.format(name[:3 + i % 4])
+    client.notify('textDocument/didChange', {'textDocument': {'uri': uri, 'version': 3 + i}, 'contentChanges': [
+      {'range': {'start': {'line': 0, 'character': 0}, 'end': {'line': 0, 'character': 0}}, 'text': line + '\n'}]})
+    timed_request(client, samples, 'textDocument/completion', {'textDocument': doc, 'position': {'line': 0, 'character': len(line) - 1}})
+    timed_request(client, samples, 'textDocument/hover', {'textDocument': doc, 'position': {'line': 0, 'character': 5}})
+    timed_request(client, samples, 'textDocument/signatureHelp', {'textDocument': doc, 'position': {'line': 0, 'character': len(line)}})
+
+  client.notify('textDocument/didClose', {'textDocument': doc})
+  timed_request(client, samples, 'shutdown', None)
+  client.notify('exit', None)
+  code = client.process.wait(10)
+  expect(code == 0, "server exited with {0}".format(code))
+  report = {'definitions': count, 'startup_ms': round(load_ms, 2)}
+  for method, values in sorted(samples.items()):
+    report[method] = summarize(values)
+  return report
+
+def main():
+  parser = argparse.ArgumentParser(description="Drive _lsp_server.py over stdio and time each request")
+  parser.add_argument('--definitions', type=int, default=10000)
+  parser.add_argument('--iterations', type=int, default=200)
+  parser.add_argument('--python', default=sys.executable)
+  args = parser.parse_args()
+  workdir = tempfile.mkdtemp(prefix='gscript-server-')
+  def on_notification(method, params):
+    if method == 'gscript/definitionsLoaded':
+      client.definitions_loaded = True
+  client = LanguageClient([args.python, os.path.join(ROOT, '_lsp_server.py')], on_notification=on_notification,
+    log=lambda line: sys.stderr.write(line + '\n'))
+  client.definitions_loaded = False
+  try:
+    report = run(client, workdir, args.definitions, args.iterations)
+  except Failure as e:
+    sys.stderr.write("FAILED: {0}\n".format(e))
+    return 1
+  finally:
+    if client.is_alive():
+      client.process.kill()
+    shutil.rmtree(workdir, ignore_errors=True)
+  print(json.dumps(report, indent=2, sort_keys=True))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
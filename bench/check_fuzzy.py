@@ -0,0 +1,100 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_index import CompletionSession, SymbolIndex, SymbolTable, fold, fuzzy_score
+
+WORDS = ('player', 'npc', 'text', 'client', 'timer', 'find', 'get', 'path', 'set', 'level', 'weapon', 'chat', 'account',
+  'guild', 'item', 'show', 'hide', 'image', 'ani', 'sound', 'gui', 'control', 'server', 'flag', 'temp')
+QUERIES = ('ptx', 'cltm', 'fnd', 'gpa', 'pl', 'st', 'shim', 'gctl', 'wpn', 'sndp', 'acct', 'lvl', 'gdflag', 'xyz', 'ti', 'pxt')
+
+def make_names(count, rng):
+  names = set()
+  while len(names) < count:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 4))]
+    name = words[0] + ''.join(word.capitalize() for word in words[1:])
+    if rng.random() < 0.3:
+      name += str(rng.randint(0, 99))
+    if rng.random() < 0.1:
+      name = rng.choice(('$pref::', 'this.', '_')) + name
+    names.add(name)
+  return sorted(names)
+
+def make_table(names, rng):
+  layers = []
+  for size in (len(names) // 20, len(names) // 5, len(names)):
+    layers.append(SymbolIndex(dict((name, {'layer': len(layers)}) for name in rng.sample(names, size))))
+  for layer in layers:
+    layer.prepare_fuzzy()
+  return SymbolTable(layers)
+
+def exhaustive_scores(table, query, limit):
+  seen = set()
+  scores = []
+  for layer in table.layers:
+    for i in range(len(layer)):
+      name = layer.name_at(i)
+      key = fold(name)
+      if key in seen:
+        continue
+      seen.add(key)
+      score = fuzzy_score(query, name)
+      if score is not None:
+        scores.append(score)
+  return sorted(scores, reverse=True)[:limit]
+
+def verify(table, query, limit, results):
+  expected = exhaustive_scores(table, query, limit)
+  actual = [fuzzy_score(query, name) for name, _ in results]
+  if actual != expected:
+    return "scores {0} != exhaustive {1}".format(actual[:10], expected[:10])
+  for name, info in results:
+    if table.get(name) is not info:
+      return "{0} does not resolve to its highest layer".format(name)
+  return None
+
+def main():
+  parser = argparse.ArgumentParser(description="Compare fuzzy completion results with an exhaustive ranking")
+  parser.add_argument('--names', type=int, default=50000)
+  parser.add_argument('--limit', type=int, default=50)
+  parser.add_argument('--random-queries', type=int, default=40)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  rng = random.Random(args.seed)
+  names = make_names(args.names, rng)
+  table = make_table(names, rng)
+  queries = list(QUERIES)
+  for _ in range(args.random_queries):
+    name = fold(rng.choice(names))
+    picks = sorted(rng.sample(range(len(name)), min(len(name), rng.randint(2, 5))))
+    queries.append(''.join(name[i] for i in picks))
+
+  failures = 0
+  elapsed = 0.0
+  for query in queries:
+    start = time.perf_counter()
+    results, _ = table.fuzzy_search(query, args.limit)
+    elapsed += time.perf_counter() - start
+    problem = verify(table, query, args.limit, results)
+    if problem is not None:
+      failures += 1
+      print("FAIL {0!r}: {1}".format(query, problem))
+  for query in QUERIES:
+    session = CompletionSession()
+    for end in range(1, len(query) + 1):
+      results = session.complete(table, 0, query[:end], args.limit)
+      problem = verify(table, query[:end], args.limit, results) if end > 1 else None
+      if problem is not None:
+        failures += 1
+        print("FAIL narrowed {0!r}: {1}".format(query[:end], problem))
+  print("{0} queries over {1} names, {2:.2f} ms per search, {3} failures".format(
+    len(queries), len(names), elapsed * 1000 / len(queries), failures))
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
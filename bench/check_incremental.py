@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_document import DocumentParse
+
+PIECES = ('function ', 'foo', 'bar2', '(', ')', 'a, b', '\n', ' ', '{', '}', 'public ', '//#CLIENTSIDE', 'echo(1);', 'x', ',',
+  'private ', 'function bar(x)\n{\n}\n', '\n\n', '// function fake()\n', '"function str()"', 'function onCreated() {\n  echo("hi");\n}\n')
+
+def random_text(rng, count):
+  return ''.join(rng.choice(PIECES) for _ in range(count))
+
+def position(text, pt):
+  row = text.count('\n', 0, pt)
+  return row, pt - (text.rfind('\n', 0, pt) + 1)
+
+def random_batch(rng, text):
+  changes = []
+  for _ in range(rng.randint(1, 3)):
+    a = rng.randint(0, len(text))
+    b = rng.randint(a, min(len(text), a + rng.randint(0, 20)))
+    inserted = random_text(rng, rng.randint(0, 3))
+    change = (a, b, inserted)
+    if rng.random() < 0.5:
+      change += position(text, a) + position(text, b)
+    changes.append(change)
+    text = text[:a] + inserted + text[b:]
+  return changes, text
+
+def snapshot(doc):
+  functions = dict((name, info.to_dict()) for name, info in doc.functions.items())
+  return doc.text, doc.line_starts, doc.matches, doc.clientside_marker, functions
+
+def main():
+  parser = argparse.ArgumentParser(description="Replay random edits through DocumentParse.apply_changes and compare with full parses")
+  parser.add_argument('--documents', type=int, default=600)
+  parser.add_argument('--edits', type=int, default=30)
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  rng = random.Random(args.seed)
+  failures = 0
+  for document in range(args.documents):
+    doc = DocumentParse(random_text(rng, rng.randint(0, 80)))
+    for edit in range(args.edits):
+      changes, expected = random_batch(rng, doc.text)
+      if not doc.apply_changes(changes):
+        print("FAIL document {0} edit {1}: positions rejected for {2!r}".format(document, edit, changes))
+        failures += 1
+        break
+      if snapshot(doc) != snapshot(DocumentParse(expected)):
+        print("FAIL document {0} edit {1}: incremental parse differs after {2!r}".format(document, edit, changes))
+        failures += 1
+        break
+  print("{0} documents x {1} edit batches, {2} failures".format(args.documents, args.edits, failures))
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,75 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_signature import find_call_context
+
+CARET = '|'
+LONG_ARGS = 'x, ' * 3000
+
+CASES = [
+  ('open call', 'echo(|', ('echo', 0)),
+  ('second argument', 'echo(a, |', ('echo', 1)),
+  ('space before paren', 'echo (a, |', ('echo', 1)),
+  ('method call', 'player.chat.echo(a, b, |', ('echo', 2)),
+  ('nested open call', 'echo(format("%s", |', ('format', 1)),
+  ('nested closed call', 'echo(format("%s", a), |', ('echo', 1)),
+  ('deeply nested', 'a(b(c(1), d(2, 3)), e(|', ('e', 0)),
+  ('comma in double quotes', 'echo("a, b", |', ('echo', 1)),
+  ('comma in single quotes', "echo('a,b', |", ('echo', 1)),
+  ('paren in string', 'echo("(", ")", |', ('echo', 2)),
+  ('escaped quote in string', 'echo("a\\", b", |', ('echo', 1)),
+  ('comma in array', 'echo({1, 2, 3}, |', ('echo', 1)),
+  ('comma in brackets', 'echo(list[1, 2], |', ('echo', 1)),
+  ('inside array literal', 'echo({1, |', None),
+  ('comma in line comment', 'echo(a, // x, (y\n  b, |', ('echo', 2)),
+  ('comma in block comment', 'echo(a /* , ( */, |', ('echo', 1)),
+  ('multi-line call', 'echo(a,\n  b,\n  |', ('echo', 2)),
+  ('multi-line nested', 'echo(\n  format(\n    "%s",\n    |', ('format', 1)),
+  ('long call', 'echo(' + LONG_ARGS + CARET, ('echo', 3000)),
+  ('if condition', 'if (|', None),
+  ('if condition call', 'if (echo(a, |', ('echo', 1)),
+  ('while condition', 'while (a, |', None),
+  ('elseif condition', '} elseif (|', None),
+  ('for header', 'for (temp.i = 0; |', None),
+  ('switch subject', 'switch (|', None),
+  ('return paren', 'return (a, |', None),
+  ('after block open', 'while (a) {\n  |', None),
+  ('after statement', 'echo(a);\nb|', None),
+  ('semicolon in call', 'echo(a; |', None),
+  ('call after statement', 'foo(a);\necho(|', ('echo', 0)),
+  ('call after block', 'if (a) {\n  foo();\n}\necho(1, |', ('echo', 1)),
+  ('declaration', 'function foo(a, |', None),
+  ('declaration first parameter', 'function foo(|', None),
+  ('public declaration', 'public function foo(a, |', None),
+  ('declaration split over lines', 'function\n  foo(a, |', None),
+  ('call inside function body', 'function foo(a, b) {\n  echo(|', ('echo', 0)),
+  ('call named like keyword prefix', 'functional(a, |', ('functional', 1)),
+  ('no call', 'temp.a = 1 + |', None),
+  ('closed call', 'echo(a)|', None),
+]
+
+def context_for(source):
+  pos = source.index(CARET)
+  text = source[:pos] + source[pos + 1:]
+  result = find_call_context(lambda a, b: text[a:b], pos)
+  if result is None:
+    return None
+  name, paren, commas = result
+  if text[paren] != '(':
+    return ('bad paren', paren)
+  return name, commas
+
+def main():
+  failures = 0
+  for label, source, expected in CASES:
+    actual = context_for(source)
+    if actual != expected:
+      failures += 1
+      print("FAIL {0}: expected {1!r}, got {2!r}".format(label, expected, actual))
+  print("{0} cases, {1} failures".format(len(CASES), failures))
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
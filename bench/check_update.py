@@ -0,0 +1,151 @@
+import gzip
+import http.server
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _lsp_update import load_meta, meta_path_for, update_definitions
+
+FIRST = {'echo': {'params': ['msg'], 'returns': 'void'}, 'format': {'params': ['fmt', '...'], 'returns': 'string'}}
+SECOND = dict(FIRST, sendtonc={'params': ['text'], 'scope': 'serverside'})
+ETAG = '"defs-1"'
+LAST_MODIFIED = 'Sat, 17 Oct 2026 10:00:00 GMT'
+
+def encode(definitions):
+  return json.dumps(definitions, sort_keys=True).encode('utf-8')
+
+class ScriptedHandler(http.server.BaseHTTPRequestHandler):
+  def do_GET(self):
+    server = self.server
+    server.requests.append(dict(self.headers.items()))
+    status, headers, body, length = server.responses.pop(0)
+    self.send_response(status)
+    for key, value in headers.items():
+      self.send_header(key, value)
+    if status != 304:
+      self.send_header('Content-Length', str(len(body) if length is None else length))
+    self.send_header('Connection', 'close')
+    self.end_headers()
+    self.wfile.write(body)
+    self.wfile.flush()
+    self.close_connection = True
+
+  def log_message(self, format, *args):
+    pass
+
+def respond(server, status, body=b'', headers=None, length=None):
+  server.responses.append((status, headers or {}, body, length))
+
+def read(path):
+  with open(path, 'rb') as f:
+    return f.read()
+
+def leftovers(workdir):
+  return sorted(name for name in os.listdir(workdir) if name.endswith('.tmp'))
+
+def expect_failure(server, url, json_path, workdir, label):
+  before = read(json_path)
+  meta = load_meta(json_path)
+  try:
+    update_definitions(url, json_path, timeout=5)
+  except Exception:
+    pass
+  else:
+    return "{0}: update did not fail".format(label)
+  if read(json_path) != before:
+    return "{0}: previous definitions were overwritten".format(label)
+  if load_meta(json_path).get('etag') != meta.get('etag') or load_meta(json_path).get('last_modified') != meta.get('last_modified'):
+    return "{0}: validators changed".format(label)
+  if leftovers(workdir):
+    return "{0}: temporary files left behind: {1}".format(label, leftovers(workdir))
+  return None
+
+def run(server, url, workdir):
+  json_path = os.path.join(workdir, 'api_definitions.json')
+  problems = []
+
+  respond(server, 200, gzip.compress(encode(FIRST)), {'Content-Encoding': 'gzip', 'ETag': ETAG, 'Last-Modified': LAST_MODIFIED})
+  definitions, size = update_definitions(url, json_path, timeout=5)
+  request = server.requests[-1]
+  if 'gzip' not in request.get('Accept-Encoding', ''):
+    problems.append("gzip 200: request did not accept gzip")
+  if 'If-None-Match' in request or 'If-Modified-Since' in request:
+    problems.append("gzip 200: first request was conditional")
+  if definitions != FIRST or size != len(encode(FIRST)):
+    problems.append("gzip 200: returned {0!r}, {1}".format(definitions, size))
+  if read(json_path) != encode(FIRST):
+    problems.append("gzip 200: saved file is not the decoded payload")
+  meta = load_meta(json_path)
+  if meta.get('etag') != ETAG or meta.get('last_modified') != LAST_MODIFIED:
+    problems.append("gzip 200: validators not saved: {0!r}".format(meta))
+
+  stamp = os.stat(json_path).st_mtime
+  respond(server, 304)
+  result = update_definitions(url, json_path, timeout=5)
+  request = server.requests[-1]
+  if request.get('If-None-Match') != ETAG or request.get('If-Modified-Since') != LAST_MODIFIED:
+    problems.append("304: request did not send the saved validators: {0!r}".format(request))
+  if result != (None, 0):
+    problems.append("304: returned {0!r}".format(result))
+  if read(json_path) != encode(FIRST) or os.stat(json_path).st_mtime != stamp:
+    problems.append("304: definitions file was touched")
+  if load_meta(json_path).get('etag') != ETAG or load_meta(json_path).get('checked_at', 0) < meta.get('checked_at', 0):
+    problems.append("304: metadata not kept up to date")
+
+  body = gzip.compress(encode(SECOND))
+  respond(server, 200, body[:len(body) // 2], {'Content-Encoding': 'gzip', 'ETag': '"defs-2"'}, length=len(body))
+  problems.append(expect_failure(server, url, json_path, workdir, "truncated transfer"))
+  respond(server, 200, body[:len(body) // 2], {'Content-Encoding': 'gzip', 'ETag': '"defs-2"'})
+  problems.append(expect_failure(server, url, json_path, workdir, "truncated gzip stream"))
+  respond(server, 200, encode(SECOND)[:-5], {'ETag': '"defs-2"'})
+  problems.append(expect_failure(server, url, json_path, workdir, "truncated JSON"))
+  respond(server, 200, b'[1, 2, 3]', {'ETag': '"defs-2"'})
+  problems.append(expect_failure(server, url, json_path, workdir, "non-object payload"))
+  respond(server, 500, b'error')
+  problems.append(expect_failure(server, url, json_path, workdir, "server error"))
+
+  respond(server, 200, zlib.compress(encode(SECOND)), {'Content-Encoding': 'deflate', 'Last-Modified': LAST_MODIFIED})
+  definitions, _ = update_definitions(url, json_path, timeout=5)
+  if definitions != SECOND or read(json_path) != encode(SECOND):
+    problems.append("deflate 200: definitions not replaced")
+  if load_meta(json_path).get('etag') is not None:
+    problems.append("deflate 200: stale ETag kept after a response without one")
+
+  os.remove(json_path)
+  respond(server, 200, encode(FIRST), {'ETag': ETAG})
+  update_definitions(url, json_path, timeout=5)
+  request = server.requests[-1]
+  if 'If-None-Match' in request or 'If-Modified-Since' in request:
+    problems.append("missing file: request was conditional")
+  if read(json_path) != encode(FIRST):
+    problems.append("missing file: definitions not restored")
+  if not os.path.exists(meta_path_for(json_path)):
+    problems.append("missing file: metadata not saved")
+  return [problem for problem in problems if problem is not None]
+
+def main():
+  server = http.server.HTTPServer(('127.0.0.1', 0), ScriptedHandler)
+  server.requests = []
+  server.responses = []
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  workdir = tempfile.mkdtemp(prefix='gscript-update-')
+  try:
+    problems = run(server, 'http://127.0.0.1:{0}/definitions'.format(server.server_address[1]), workdir)
+  finally:
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(workdir, ignore_errors=True)
+  for problem in problems:
+    print("FAIL {0}".format(problem))
+  print("{0} requests, {1} failures".format(len(server.requests), len(problems)))
+  return 1 if problems else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,314 @@
+import sys
+import types
+
+_timeouts = []
+_settings = {}
+
+class Region(object):
+  __slots__ = ('a', 'b')
+
+  def __init__(self, a, b=None):
+    self.a = a
+    self.b = a if b is None else b
+
+  def begin(self):
+    return min(self.a, self.b)
+
+  def end(self):
+    return max(self.a, self.b)
+
+  def size(self):
+    return self.end() - self.begin()
+
+  def empty(self):
+    return self.a == self.b
+
+  def __eq__(self, other):
+    return isinstance(other, Region) and (self.a, self.b) == (other.a, other.b)
+
+  def __hash__(self):
+    return hash((self.a, self.b))
+
+class Settings(dict):
+  def get(self, key, default=None):
+    return dict.get(self, key, default)
+
+  def set(self, key, value):
+    self[key] = value
+
+  def has(self, key):
+    return key in self
+
+  def erase(self, key):
+    self.pop(key, None)
+
+  def add_on_change(self, tag, callback):
+    pass
+
+  def clear_on_change(self, tag):
+    pass
+
+class Selection(list):
+  def clear(self):
+    del self[:]
+
+  def add(self, region):
+    self.append(region if isinstance(region, Region) else Region(region))
+
+class CompletionItem(object):
+  def __init__(self, trigger, annotation='', completion='', completion_format=0, kind=None, details=''):
+    self.trigger = trigger
+    self.annotation = annotation
+    self.completion = completion
+    self.kind = kind
+    self.details = details
+
+  @classmethod
+  def snippet_completion(cls, trigger, snippet, annotation='', kind=None, details=''):
+    return cls(trigger, annotation, snippet, 1, kind, details)
+
+class CompletionList(object):
+  def __init__(self, completions=None, flags=0):
+    self.completions = completions
+    self.flags = flags
+
+  def set_completions(self, completions, flags=0):
+    self.completions = completions
+    self.flags = flags
+
+class Buffer(object):
+  _next_id = 0
+
+  def __init__(self):
+    Buffer._next_id += 1
+    self._id = Buffer._next_id
+    self._views = []
+
+  def id(self):
+    return self._id
+
+  def views(self):
+    return list(self._views)
+
+  def primary_view(self):
+    return self._views[0]
+
+  def file_name(self):
+    return None
+
+class View(object):
+  _next_id = 0
+
+  def __init__(self, text='', syntax='Packages/SublimeRC/gscript.sublime-syntax'):
+    View._next_id += 1
+    self._id = View._next_id
+    self._buffer = Buffer()
+    self._buffer._views.append(self)
+    self._text = text
+    self._settings = Settings({'syntax': syntax, 'color_scheme': 'Monokai.sublime-color-scheme', 'font_size': 12})
+    self._sel = Selection([Region(0)])
+    self._change_count = 0
+    self._popup = None
+    self.popup_calls = 0
+    self.regions = {}
+    self.viewport = None
+
+  def id(self):
+    return self._id
+
+  def buffer_id(self):
+    return self._buffer.id()
+
+  def buffer(self):
+    return self._buffer
+
+  def is_valid(self):
+    return True
+
+  def is_primary(self):
+    return True
+
+  def is_loading(self):
+    return False
+
+  def is_dirty(self):
+    return False
+
+  def window(self):
+    return None
+
+  def file_name(self):
+    return None
+
+  def settings(self):
+    return self._settings
+
+  def size(self):
+    return len(self._text)
+
+  def change_count(self):
+    return self._change_count
+
+  def set_text(self, text):
+    self._text = text
+    self._change_count += 1
+
+  def substr(self, region):
+    if isinstance(region, int):
+      return self._text[region:region + 1]
+    return self._text[region.begin():region.end()]
+
+  def line(self, region):
+    point = region if isinstance(region, int) else region.begin()
+    start = self._text.rfind('\n', 0, point) + 1
+    end = self._text.find('\n', point)
+    return Region(start, len(self._text) if end == -1 else end)
+
+  def full_line(self, region):
+    line = self.line(region)
+    return Region(line.begin(), min(len(self._text), line.end() + 1))
+
+  def rowcol(self, point):
+    return self._text.count('\n', 0, point), point - (self._text.rfind('\n', 0, point) + 1)
+
+  def text_point(self, row, col):
+    point = 0
+    for _ in range(row):
+      newline = self._text.find('\n', point)
+      if newline == -1:
+        return len(self._text)
+      point = newline + 1
+    return point + col
+
+  def visible_region(self):
+    if self.viewport is not None:
+      return Region(*self.viewport)
+    return Region(0, min(len(self._text), 4000))
+
+  def sel(self):
+    return self._sel
+
+  def match_selector(self, point, selector):
+    return True
+
+  def scope_name(self, point):
+    return 'source.gscript '
+
+  def style(self):
+    return {'foreground': '#f8f8f2', 'background': '#272822'}
+
+  def style_for_scope(self, scope):
+    return {'foreground': '#a6e22e'}
+
+  def show_popup(self, content, flags=0, location=-1, max_width=320, max_height=240, on_navigate=None, on_hide=None):
+    self._popup = content
+    self.popup_calls += 1
+
+  def update_popup(self, content):
+    self._popup = content
+    self.popup_calls += 1
+
+  def hide_popup(self):
+    self._popup = None
+
+  def is_popup_visible(self):
+    return self._popup is not None
+
+  def add_regions(self, key, regions, scope='', icon='', flags=0, *args, **kwargs):
+    self.regions[key] = list(regions)
+
+  def get_regions(self, key):
+    return self.regions.get(key, [])
+
+  def erase_regions(self, key):
+    self.regions.pop(key, None)
+
+  def set_status(self, key, value):
+    pass
+
+  def erase_status(self, key):
+    pass
+
+  def show_at_center(self, point):
+    pass
+
+  def run_command(self, cmd, args=None):
+    pass
+
+def load_settings(name):
+  return _settings.setdefault(name, Settings())
+
+def set_timeout(callback, delay=0):
+  _timeouts.append(callback)
+
+def drain():
+  while _timeouts:
+    _timeouts.pop(0)()
+
+class ViewEventListener(object):
+  def __init__(self, view):
+    self.view = view
+
+class EventListener(object):
+  pass
+
+class TextChangeListener(object):
+  def __init__(self):
+    self.buffer = None
+
+  def attach(self, buffer):
+    self.buffer = buffer
+
+  def detach(self):
+    self.buffer = None
+
+  def is_attached(self):
+    return self.buffer is not None
+
+class _Command(object):
+  def __init__(self, target=None):
+    self.view = self.window = target
+
+_CONSTANTS = (
+  'HIDE_ON_MOUSE_MOVE_AWAY', 'COOPERATE_WITH_AUTO_COMPLETE', 'DRAW_NO_FILL', 'DRAW_NO_OUTLINE',
+  'DRAW_SOLID_UNDERLINE', 'DRAW_SQUIGGLY_UNDERLINE', 'DRAW_STIPPLED_UNDERLINE', 'DRAW_EMPTY', 'HIDDEN',
+  'PERSISTENT', 'ENCODED_POSITION', 'TRANSIENT', 'INHIBIT_WORD_COMPLETIONS', 'INHIBIT_EXPLICIT_COMPLETIONS',
+  'DYNAMIC_COMPLETIONS', 'MONOSPACE_FONT', 'NO_UNDO',
+)
+
+def install(packages_path, cache_path):
+  sublime = types.ModuleType('sublime')
+  for i, name in enumerate(_CONSTANTS):
+    setattr(sublime, name, 1 << i)
+  sublime.HOVER_TEXT, sublime.HOVER_GUTTER, sublime.HOVER_MARGIN = 1, 2, 3
+  sublime.KIND_FUNCTION = (1, 'f', 'Function')
+  sublime.KIND_VARIABLE = (2, 'v', 'Variable')
+  sublime.Region = Region
+  sublime.View = View
+  sublime.CompletionItem = CompletionItem
+  sublime.CompletionList = CompletionList
+  sublime.load_settings = load_settings
+  sublime.save_settings = lambda name: None
+  sublime.set_timeout = set_timeout
+  sublime.set_timeout_async = set_timeout
+  sublime.cancel_timeout = lambda handle: None
+  sublime.status_message = lambda message: None
+  sublime.error_message = lambda message: None
+  sublime.packages_path = lambda: packages_path
+  sublime.installed_packages_path = lambda: packages_path + '-installed'
+  sublime.cache_path = lambda: cache_path
+  sublime.version = lambda: '4180'
+  sublime.active_window = lambda: None
+  sublime.windows = lambda: []
+  sublime_plugin = types.ModuleType('sublime_plugin')
+  sublime_plugin.ViewEventListener = ViewEventListener
+  sublime_plugin.EventListener = EventListener
+  sublime_plugin.TextChangeListener = TextChangeListener
+  sublime_plugin.TextCommand = _Command
+  sublime_plugin.WindowCommand = _Command
+  sublime_plugin.ApplicationCommand = _Command
+  sublime_plugin.ListInputHandler = object
+  sublime_plugin.TextInputHandler = object
+  sys.modules['sublime'] = sublime
+  sys.modules['sublime_plugin'] = sublime_plugin
+  return sublime, sublime_plugin